@@ -1,7 +1,7 @@
 from smolagents import CodeAgent, InferenceClientModel
-from smolagents import LiteLLMModel
+from llm import get_model
 
-model = LiteLLMModel(model_id="anthropic/claude-sonnet-4-20250514", temperature=0.2)
+model = get_model()
 
 
 # Create an agent with no tools
@@ -1,8 +1,8 @@
 from smolagents import CodeAgent, InferenceClientModel
-from smolagents import LiteLLMModel
+from llm import get_model
 
 # Initialize with default tools (requires smolagents[toolkit])
-model = LiteLLMModel(model_id="anthropic/claude-sonnet-4-20250514", temperature=0.2)
+model = get_model()
 agent = CodeAgent(
     tools=[],  # Empty list since we'll use default tools
     model=model,
@@ -0,0 +1,151 @@
+"""Pool of pre-built manager agents, checked out for one run at a time.
+
+smolagents agents keep the memory of their current run, so a manager (and its
+managed agents) must never serve two runs at once. The pool builds up to
+``size`` complete agent trees on demand (or ahead of time with ``warm_up``),
+hands one out per run, resets it when it comes back, and records how long runs
+waited for an agent and how busy the pool is. A tree whose code timed out and
+is still running (see ``code_executor.py``) is interrupted and discarded
+instead, and a new one is built in the background.
+"""
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from job_queue import AGENT_CONCURRENCY
+
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", str(AGENT_CONCURRENCY)))
+
+
+def reset_agent(agent):
+    """Clear the run state of an agent and of its managed agents"""
+    agent.memory.reset()
+    agent.monitor.reset()
+    agent.state.clear()
+    executor = getattr(agent, "python_executor", None)
+    if executor is not None and hasattr(executor, "state"):
+        executor.state = {"__name__": "__main__"}
+    for managed_agent in getattr(agent, "managed_agents", {}).values():
+        reset_agent(managed_agent)
+
+
+def agent_tree(agent):
+    yield agent
+    for managed_agent in getattr(agent, "managed_agents", {}).values():
+        yield from agent_tree(managed_agent)
+
+
+def is_busy(agent):
+    """Whether code of an agent of the tree is still running after its step timed out"""
+    return any(
+        getattr(getattr(each, "python_executor", None), "busy", False) for each in agent_tree(agent)
+    )
+
+
+class AgentPool:
+    """Pool of up to ``size`` agents, built by ``factory`` when first needed"""
+
+    def __init__(self, factory, size=AGENT_POOL_SIZE):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self.created_at = time.perf_counter()
+        self.created = 0
+        self.build_seconds = 0.0
+        self.checkouts = 0
+        self.in_use = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.busy_seconds = 0.0
+        self.discarded = 0
+
+    def _build(self):
+        """Build one more agent if the pool is not full yet, else return None"""
+        with self._lock:
+            if self.created >= self.size:
+                return None
+            self.created += 1
+        start = time.perf_counter()
+        try:
+            agent = self.factory()
+        except Exception:
+            with self._lock:
+                self.created -= 1
+            raise
+        with self._lock:
+            self.build_seconds += time.perf_counter() - start
+        return agent
+
+    def warm_up(self):
+        """Build the agents that do not exist yet, so no run has to wait for one"""
+        while True:
+            agent = self._build()
+            if agent is None:
+                return
+            self._idle.put(agent)
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow an agent for one run; it is reset and returned on exit"""
+        requested = time.perf_counter()
+        try:
+            agent = self._idle.get_nowait()
+        except queue.Empty:
+            agent = self._build() or self._idle.get(timeout=timeout)
+        acquired = time.perf_counter()
+        with self._lock:
+            wait = acquired - requested
+            self.checkouts += 1
+            self.in_use += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        try:
+            yield agent
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                self.busy_seconds += time.perf_counter() - acquired
+            if is_busy(agent):
+                self._discard(agent)
+            else:
+                reset_agent(agent)
+                self._idle.put(agent)
+
+    def _discard(self, agent):
+        """Retire a tree that timed-out code still runs in: it would share its memory and its
+        budget callbacks with the next run"""
+        print("♻️  Discarding an agent whose timed-out code is still running")
+        for each in agent_tree(agent):
+            # Managed agents still running stop at their next step
+            each.interrupt()
+        with self._lock:
+            self.created -= 1
+            self.discarded += 1
+        threading.Thread(target=self._replace, name="agent-pool-build", daemon=True).start()
+
+    def _replace(self):
+        try:
+            agent = self._build()
+        except Exception as e:
+            print(f"⚠️  Could not rebuild a discarded agent: {e}")
+            return
+        if agent is not None:
+            self._idle.put(agent)
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.created_at
+            return {
+                "size": self.size,
+                "created": self.created,
+                "build_seconds": self.build_seconds,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "discarded": self.discarded,
+                "average_wait": self.total_wait / self.checkouts if self.checkouts else 0.0,
+                "max_wait": self.max_wait,
+                "utilization": self.busy_seconds / (self.size * elapsed) if elapsed else 0.0,
+            }
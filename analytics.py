@@ -0,0 +1,320 @@
+"""Pre-aggregating analytical tools over the local health database.
+
+Each tool does the heavy lifting in SQLite (index range scans and the rollup
+tables) and pandas/numpy, and returns a compact JSON summary bounded by
+``ANALYTICS_MAX_ROWS`` series rows and ``ANALYTICS_MAX_BYTES`` bytes, so raw
+records never have to travel through the agents' prompts.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from smolagents import tool
+
+from local_sql import get_engine
+
+ANALYTICS_MAX_ROWS = int(os.getenv("ANALYTICS_MAX_ROWS", "120"))
+ANALYTICS_MAX_BYTES = int(os.getenv("ANALYTICS_MAX_BYTES", "8000"))
+
+# Buckets from finest to coarsest, with the pandas period used to regroup daily rollups
+BUCKETS = {"hour": None, "day": None, "week": "W-SUN", "month": "M"}
+
+SLEEP_STAGE_NAMES = {
+    "HKCategoryValueSleepAnalysisAsleepCore": "core",
+    "HKCategoryValueSleepAnalysisAsleepDeep": "deep",
+    "HKCategoryValueSleepAnalysisAsleepREM": "rem",
+    "HKCategoryValueSleepAnalysisAsleepUnspecified": "asleep",
+    "HKCategoryValueSleepAnalysisAsleep": "asleep",
+    "HKCategoryValueSleepAnalysisAwake": "awake",
+    "HKCategoryValueSleepAnalysisInBed": "in_bed",
+}
+
+
+def _query(sql, **params):
+    with get_engine().connect() as connection:
+        return pd.read_sql_query(sql, connection.connection.dbapi_connection, params=params)
+
+
+def _round(value, digits=2):
+    return None if value is None or pd.isna(value) else round(float(value), digits)
+
+
+def _compact(payload):
+    """Serialize a summary within the row/byte caps by halving its ``series`` and its per-key
+    breakdowns, largest first; the JSON itself is never cut"""
+    series = payload.get("series")
+    if series is not None and len(series) > ANALYTICS_MAX_ROWS:
+        payload["series"] = series[-ANALYTICS_MAX_ROWS:]
+        payload["series_truncated_to_latest"] = ANALYTICS_MAX_ROWS
+    text = json.dumps(payload, default=str, separators=(",", ":"))
+    while len(text) > ANALYTICS_MAX_BYTES:
+        shortenable = [
+            key
+            for key, value in payload.items()
+            if (key == "series" or isinstance(value, dict)) and len(value) > 1
+        ]
+        if not shortenable:
+            return json.dumps(
+                {
+                    "error": "The summary does not fit the size limit, "
+                    "ask for a shorter period or a coarser bucket",
+                    "truncated": True,
+                }
+            )
+        key = max(shortenable, key=lambda key: len(json.dumps(payload[key], default=str)))
+        if key == "series":
+            payload["series"] = payload["series"][1::2]
+            payload["series_downsampled"] = True
+        else:
+            # Breakdowns are ordered by importance: keep their first half
+            entries = list(payload[key].items())
+            payload[key] = dict(entries[: len(entries) // 2])
+            payload[f"{key}_truncated_to_first"] = len(payload[key])
+        text = json.dumps(payload, default=str, separators=(",", ":"))
+    return text
+
+
+def _rollups(record_type, start_date, end_date, period="day"):
+    return _query(
+        "SELECT bucket, count, sum, minimum, maximum FROM recordrollup "
+        "WHERE type = :type AND period = :period AND bucket >= :start AND bucket < :end "
+        "ORDER BY bucket",
+        type=record_type,
+        period=period,
+        start=start_date,
+        end=end_date,
+    )
+
+
+def _regroup(frame, bucket):
+    frame = frame.assign(bucket=pd.to_datetime(frame["bucket"]).dt.to_period(BUCKETS[bucket]))
+    grouped = frame.groupby("bucket").agg(
+        count=("count", "sum"),
+        sum=("sum", "sum"),
+        minimum=("minimum", "min"),
+        maximum=("maximum", "max"),
+    )
+    grouped.index = grouped.index.start_time.strftime("%Y-%m-%d")
+    return grouped.reset_index()
+
+
+@tool
+def time_bucket_stats(record_type: str, start_date: str, end_date: str, bucket: str = "day") -> str:
+    """Count, mean, min, max and sum of a numeric record type per time bucket, from pre-computed rollups.
+
+    Args:
+        record_type: HealthKit record type, e.g. 'HKQuantityTypeIdentifierRestingHeartRate'.
+        start_date: Inclusive start date, 'YYYY-MM-DD'.
+        end_date: Exclusive end date, 'YYYY-MM-DD'.
+        bucket: One of 'hour', 'day', 'week', 'month'. Coarsened automatically if there are too many buckets.
+
+    Returns:
+        A JSON summary with overall statistics and one row per bucket.
+    """
+    if bucket not in BUCKETS:
+        return f"Error: bucket must be one of {list(BUCKETS)}"
+    frame = _rollups(record_type, start_date, end_date, "hour" if bucket == "hour" else "day")
+    if frame.empty:
+        return _compact({"record_type": record_type, "count": 0})
+    # Coarsen the buckets until the series fits in ANALYTICS_MAX_ROWS
+    if bucket == "hour" and len(frame) > ANALYTICS_MAX_ROWS:
+        bucket, frame = "day", _rollups(record_type, start_date, end_date)
+    if bucket == "day" and len(frame) > ANALYTICS_MAX_ROWS:
+        bucket = "week"
+    grouped = frame if BUCKETS[bucket] is None else _regroup(frame, bucket)
+    if bucket == "week" and len(grouped) > ANALYTICS_MAX_ROWS:
+        bucket, grouped = "month", _regroup(frame, "month")
+    grouped = grouped.assign(mean=grouped["sum"] / grouped["count"])
+    return _compact(
+        {
+            "record_type": record_type,
+            "bucket": bucket,
+            "count": int(frame["count"].sum()),
+            "mean": _round(frame["sum"].sum() / frame["count"].sum()),
+            "minimum": _round(frame["minimum"].min()),
+            "maximum": _round(frame["maximum"].max()),
+            "series": [
+                [
+                    row.bucket,
+                    int(row.count),
+                    _round(row.mean),
+                    _round(row.minimum),
+                    _round(row.maximum),
+                    _round(row.sum),
+                ]
+                for row in grouped.itertuples(index=False)
+            ],
+            "series_columns": ["bucket", "count", "mean", "minimum", "maximum", "sum"],
+        }
+    )
+
+
+@tool
+def value_percentiles(record_type: str, start_date: str, end_date: str) -> str:
+    """Distribution (percentiles, mean, standard deviation) of a numeric record type over a period.
+
+    Args:
+        record_type: HealthKit record type, e.g. 'HKQuantityTypeIdentifierHeartRate'.
+        start_date: Inclusive start date, 'YYYY-MM-DD'.
+        end_date: Exclusive end date, 'YYYY-MM-DD'.
+
+    Returns:
+        A JSON summary with count, mean, std and the 5/25/50/75/95th percentiles.
+    """
+    values = _query(
+        "SELECT value_numeric FROM record WHERE type = :type AND start_date >= :start "
+        "AND start_date < :end AND value_numeric IS NOT NULL",
+        type=record_type,
+        start=start_date,
+        end=end_date,
+    )["value_numeric"].to_numpy()
+    if values.size == 0:
+        return _compact({"record_type": record_type, "count": 0})
+    percentiles = np.percentile(values, [5, 25, 50, 75, 95])
+    return _compact(
+        {
+            "record_type": record_type,
+            "count": int(values.size),
+            "mean": _round(values.mean()),
+            "std": _round(values.std()),
+            "percentiles": dict(zip(["p5", "p25", "p50", "p75", "p95"], map(_round, percentiles))),
+        }
+    )
+
+
+@tool
+def resting_heart_rate_trend(start_date: str, end_date: str) -> str:
+    """Weekly resting heart rate and its linear trend (bpm per month) over a period.
+
+    Args:
+        start_date: Inclusive start date, 'YYYY-MM-DD'.
+        end_date: Exclusive end date, 'YYYY-MM-DD'.
+
+    Returns:
+        A JSON summary with the overall mean, first/last week, trend slope and weekly series.
+    """
+    daily = _rollups("HKQuantityTypeIdentifierRestingHeartRate", start_date, end_date)
+    if daily.empty:
+        return _compact({"count": 0})
+    weekly = _regroup(daily, "week")
+    weekly = weekly.assign(mean=weekly["sum"] / weekly["count"])
+    days = (pd.to_datetime(daily["bucket"]) - pd.Timestamp(start_date)).dt.days.to_numpy()
+    daily_mean = (daily["sum"] / daily["count"]).to_numpy()
+    slope = np.polyfit(days, daily_mean, 1)[0] * 30 if len(daily) > 1 else 0.0
+    return _compact(
+        {
+            "days_with_data": int(len(daily)),
+            "mean_bpm": _round(daily["sum"].sum() / daily["count"].sum()),
+            "first_week_bpm": _round(weekly["mean"].iloc[0]),
+            "last_week_bpm": _round(weekly["mean"].iloc[-1]),
+            "lowest_week": [
+                weekly.loc[weekly["mean"].idxmin(), "bucket"],
+                _round(weekly["mean"].min()),
+            ],
+            "highest_week": [
+                weekly.loc[weekly["mean"].idxmax(), "bucket"],
+                _round(weekly["mean"].max()),
+            ],
+            "trend_bpm_per_month": _round(slope, 3),
+            "series": [[row.bucket, _round(row.mean)] for row in weekly.itertuples(index=False)],
+            "series_columns": ["week", "mean_bpm"],
+        }
+    )
+
+
+@tool
+def sleep_stage_totals(start_date: str, end_date: str) -> str:
+    """Nightly sleep duration by stage (core, deep, REM, awake) over a period.
+
+    Args:
+        start_date: Inclusive start date, 'YYYY-MM-DD'.
+        end_date: Exclusive end date, 'YYYY-MM-DD'.
+
+    Returns:
+        A JSON summary with the average minutes per stage per night and a per-night series.
+    """
+    frame = _query(
+        "SELECT date(start_date, '-12 hours') AS night, value AS stage, "
+        "SUM((julianday(end_date) - julianday(start_date)) * 1440) AS minutes FROM record "
+        "WHERE type = 'HKCategoryTypeIdentifierSleepAnalysis' AND start_date >= :start "
+        "AND start_date < :end GROUP BY night, stage",
+        start=start_date,
+        end=end_date,
+    )
+    if frame.empty:
+        return _compact({"nights": 0})
+    frame["stage"] = frame["stage"].map(SLEEP_STAGE_NAMES).fillna("other")
+    nights = frame.pivot_table(
+        index="night", columns="stage", values="minutes", aggfunc="sum"
+    ).fillna(0)
+    asleep_columns = [
+        column for column in nights.columns if column in ("core", "deep", "rem", "asleep")
+    ]
+    nights["total_asleep"] = nights[asleep_columns].sum(axis=1)
+    return _compact(
+        {
+            "nights": int(len(nights)),
+            "average_minutes_per_night": {
+                column: _round(nights[column].mean(), 1) for column in nights.columns
+            },
+            "shortest_night_minutes": _round(nights["total_asleep"].min(), 1),
+            "longest_night_minutes": _round(nights["total_asleep"].max(), 1),
+            "series_columns": ["night", *nights.columns],
+            "series": [
+                [night, *(_round(value, 1) for value in row)]
+                for night, row in zip(nights.index, nights.to_numpy())
+            ],
+        }
+    )
+
+
+@tool
+def workout_summary(start_date: str, end_date: str) -> str:
+    """Workout counts, durations, energy and distance per activity type over a period.
+
+    Args:
+        start_date: Inclusive start date, 'YYYY-MM-DD'.
+        end_date: Exclusive end date, 'YYYY-MM-DD'.
+
+    Returns:
+        A JSON summary with one entry per activity type and a monthly workout count series.
+    """
+    frame = _query(
+        "SELECT workout_activity_type, start_date, duration, total_energy_burned, total_distance "
+        "FROM workout WHERE start_date >= :start AND start_date < :end",
+        start=start_date,
+        end=end_date,
+    )
+    if frame.empty:
+        return _compact({"workouts": 0})
+    frame["activity"] = frame["workout_activity_type"].str.replace("HKWorkoutActivityType", "")
+    per_type = frame.groupby("activity").agg(
+        count=("duration", "size"),
+        total_minutes=("duration", "sum"),
+        average_minutes=("duration", "mean"),
+        total_energy=("total_energy_burned", "sum"),
+        total_distance=("total_distance", "sum"),
+    )
+    monthly = frame.groupby(frame["start_date"].str[:7]).size()
+    return _compact(
+        {
+            "workouts": int(len(frame)),
+            "per_activity": {
+                activity: {key: _round(value, 1) for key, value in row.items()}
+                for activity, row in per_type.sort_values("count", ascending=False).iterrows()
+            },
+            "series_columns": ["month", "workouts"],
+            "series": [[month, int(count)] for month, count in monthly.items()],
+        }
+    )
+
+
+ANALYTICS_TOOLS = [
+    time_bucket_stats,
+    value_percentiles,
+    resting_heart_rate_trend,
+    sleep_stage_totals,
+    workout_summary,
+]
@@ -0,0 +1,179 @@
+"""Persistent cache of final answers produced by the manager agent.
+
+Entries are keyed on the normalized question, the response mode and a version
+stamp of the health database, so importing new data invalidates them. Old
+entries expire after a TTL and the least recently used ones are evicted past
+``max_entries``. Near-identical questions can optionally be matched by
+embedding similarity (set ``ANSWER_CACHE_EMBEDDING_MODEL`` to a LiteLLM
+embedding model).
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+ANSWER_CACHE_PATH = os.getenv(
+    "ANSWER_CACHE_PATH", os.path.join(os.path.dirname(__file__), "answer_cache.db")
+)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500"))
+ANSWER_CACHE_EMBEDDING_MODEL = os.getenv("ANSWER_CACHE_EMBEDDING_MODEL", "")
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def litellm_embedding(model):
+    """Return an ``embed(text) -> list[float]`` function backed by LiteLLM"""
+
+    def embed(text):
+        import litellm
+
+        return litellm.embedding(model=model, input=[text]).data[0]["embedding"]
+
+    return embed
+
+
+class AnswerCache:
+    """SQLite-backed TTL/LRU cache of agent answers"""
+
+    def __init__(
+        self,
+        path=ANSWER_CACHE_PATH,
+        ttl=ANSWER_CACHE_TTL,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        embed=None,
+        similarity=ANSWER_CACHE_SIMILARITY,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embed = embed
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answer (
+                key TEXT PRIMARY KEY,
+                mode TEXT NOT NULL,
+                data_version TEXT NOT NULL,
+                question TEXT NOT NULL,
+                embedding TEXT,
+                answer TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_answer_mode_version ON answer (mode, data_version)"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(question, mode, data_version):
+        raw = "\x00".join([mode, str(data_version), normalize_question(question)])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, question, mode, data_version):
+        """Return the cached answer or None, counting the hit or miss"""
+        key = self.make_key(question, mode, data_version)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT answer FROM answer WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+        if row is None and self.embed is not None:
+            # A network call: computed outside the lock so other lookups do not wait for it
+            vector = self.embed(normalize_question(question))
+            with self._lock:
+                key, row = self._similar(vector, mode, data_version, now)
+                self.semantic_hits += row is not None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE answer SET used_at = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def _similar(self, vector, mode, data_version, now):
+        best_key, best_row, best_score = None, None, self.similarity
+        candidates = self._connection.execute(
+            "SELECT key, embedding, answer FROM answer "
+            "WHERE mode = ? AND data_version = ? AND created_at > ? AND embedding IS NOT NULL",
+            (mode, str(data_version), now - self.ttl),
+        )
+        for key, embedding, answer in candidates:
+            score = _cosine(vector, json.loads(embedding))
+            if score >= best_score:
+                best_key, best_row, best_score = key, (answer,), score
+        return best_key, best_row
+
+    def put(self, question, mode, data_version, answer):
+        key = self.make_key(question, mode, data_version)
+        normalized = normalize_question(question)
+        embedding = json.dumps(self.embed(normalized)) if self.embed is not None else None
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO answer VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, mode, str(data_version), normalized, embedding, answer, now, now),
+            )
+            self._evict(now)
+            self._connection.commit()
+
+    def _evict(self, now):
+        self._connection.execute("DELETE FROM answer WHERE created_at <= ?", (now - self.ttl,))
+        self._connection.execute(
+            "DELETE FROM answer WHERE key NOT IN "
+            "(SELECT key FROM answer ORDER BY used_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def invalidate(self, data_version=None):
+        """Drop every entry, or only the ones not built from ``data_version``"""
+        with self._lock:
+            if data_version is None:
+                self._connection.execute("DELETE FROM answer")
+            else:
+                self._connection.execute(
+                    "DELETE FROM answer WHERE data_version != ?", (str(data_version),)
+                )
+            self._connection.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_answer_cache():
+    """Build the cache from the ANSWER_CACHE_* environment settings"""
+    embed = None
+    if ANSWER_CACHE_EMBEDDING_MODEL:
+        embed = litellm_embedding(ANSWER_CACHE_EMBEDDING_MODEL)
+    return AnswerCache(embed=embed)
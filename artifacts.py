@@ -0,0 +1,283 @@
+"""Registry of files (charts) generated during agent runs.
+
+Every run gets its own output directory under ``ARTIFACTS_DIR``. The visual
+agent asks for save paths with its ``artifact_path`` tool, which resolves them
+inside the directory of the run of the current context (agent code keeps it,
+see ``code_executor.py``). When the run ends its files are registered against
+the run and the browser session, so the UI finds a session's latest chart
+with a dictionary lookup instead of globbing the working directory, and
+concurrent users never see each other's charts. Old run directories are
+removed by age and total size, on a background thread and at most once per
+``ARTIFACTS_CLEANUP_INTERVAL``, since a cleanup stats every file under the root.
+
+Images are served over HTTP by ``artifact_routes`` at content-hash URLs with
+immutable cache headers, next to a downscaled WebP preview used for inline
+display, so chat messages carry a link instead of the base64-encoded file.
+"""
+import contextvars
+import hashlib
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", os.path.join(os.path.dirname(__file__), "artifacts"))
+ARTIFACTS_MAX_AGE = float(os.getenv("ARTIFACTS_MAX_AGE", str(7 * 24 * 3600)))
+ARTIFACTS_MAX_BYTES = int(os.getenv("ARTIFACTS_MAX_BYTES", str(500 * 1024 * 1024)))
+ARTIFACTS_CLEANUP_INTERVAL = float(os.getenv("ARTIFACTS_CLEANUP_INTERVAL", "600"))
+
+ARTIFACTS_URL_PREFIX = os.getenv("ARTIFACTS_URL_PREFIX", "/artifacts")
+ARTIFACT_PREVIEW_WIDTH = int(os.getenv("ARTIFACT_PREVIEW_WIDTH", "960"))
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".svg", ".webp")
+PREVIEW_SUFFIX = ".preview.webp"
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+class Artifact:
+    """One file produced by a run"""
+
+    def __init__(self, run_id, session_id, path):
+        self.run_id = run_id
+        self.session_id = session_id
+        self.path = path
+        self.name = os.path.basename(path)
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.created_at = stat.st_mtime
+        self.digest = None
+        self.preview_name = None
+
+    @property
+    def is_image(self):
+        return self.name.lower().endswith(IMAGE_EXTENSIONS)
+
+    def publish(self, preview_width=ARTIFACT_PREVIEW_WIDTH):
+        """Hash the file and write its downscaled preview next to it"""
+        self.digest = file_digest(self.path)
+        if self.is_image:
+            self.preview_name = make_preview(self.path, preview_width)
+        return self
+
+    @property
+    def url(self):
+        return f"{ARTIFACTS_URL_PREFIX}/{self.run_id}/{self.digest}/{self.name}"
+
+    @property
+    def preview_url(self):
+        name = self.preview_name or self.name
+        return f"{ARTIFACTS_URL_PREFIX}/{self.run_id}/{self.digest}/{name}"
+
+    @property
+    def preview_path(self):
+        return os.path.join(os.path.dirname(self.path), self.preview_name or self.name)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def make_preview(path, width=ARTIFACT_PREVIEW_WIDTH):
+    """Write a WebP copy of an image at most ``width`` pixels wide; returns its file name"""
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            image.thumbnail((width, width * 4))
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            preview_name = os.path.basename(path) + PREVIEW_SUFFIX
+            image.save(os.path.join(os.path.dirname(path), preview_name), "WEBP", quality=85)
+            return preview_name
+    except Exception as e:
+        # SVGs and unreadable files are served as they are
+        print(f"⚠️  No preview for {path}: {e}")
+        return None
+
+
+class ArtifactRegistry:
+    """Per-run output directories and an index of their files by run and session"""
+
+    def __init__(
+        self,
+        root=ARTIFACTS_DIR,
+        max_age=ARTIFACTS_MAX_AGE,
+        max_bytes=ARTIFACTS_MAX_BYTES,
+        cleanup_interval=ARTIFACTS_CLEANUP_INTERVAL,
+    ):
+        self.root = root
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.cleanup_interval = cleanup_interval
+        self._last_cleanup = None  # monotonic time the last cleanup started
+        self._cleaning = False
+        self.runs = {}  # run_id -> [Artifact], oldest first
+        self.latest_by_session = {}  # session_id -> latest image Artifact
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def run_dir(self, run_id):
+        return os.path.join(self.root, run_id)
+
+    @contextmanager
+    def run(self, run_id, session_id=None):
+        """Make ``run_id`` the current run in this context; its files are registered on exit"""
+        os.makedirs(self.run_dir(run_id), exist_ok=True)
+        token = _current_run.set((self, run_id))
+        try:
+            yield run_id
+        finally:
+            _current_run.reset(token)
+            self.register_run(run_id, session_id)
+            self.schedule_cleanup()
+
+    def register_run(self, run_id, session_id=None):
+        """Index the files saved in the run directory"""
+        directory = self.run_dir(run_id)
+        if not os.path.isdir(directory):
+            return []
+        artifacts = sorted(
+            (
+                Artifact(run_id, session_id, entry.path).publish()
+                for entry in os.scandir(directory)
+                if entry.is_file() and not entry.name.endswith(PREVIEW_SUFFIX)
+            ),
+            key=lambda artifact: artifact.created_at,
+        )
+        with self._lock:
+            self.runs[run_id] = artifacts
+            images = [artifact for artifact in artifacts if artifact.is_image]
+            if images and session_id is not None:
+                self.latest_by_session[session_id] = images[-1]
+        return artifacts
+
+    def for_run(self, run_id):
+        with self._lock:
+            return list(self.runs.get(run_id, []))
+
+    def lookup(self, run_id, name):
+        """The registered artifact of ``run_id`` served as ``name`` (its file or its preview)"""
+        for artifact in self.for_run(run_id):
+            if name in (artifact.name, artifact.preview_name):
+                return artifact
+        return None
+
+    def latest_image(self, run_id):
+        images = [artifact for artifact in self.for_run(run_id) if artifact.is_image]
+        return images[-1] if images else None
+
+    def latest_for_session(self, session_id):
+        with self._lock:
+            return self.latest_by_session.get(session_id)
+
+    def schedule_cleanup(self):
+        """Start a cleanup on a background thread unless one ran within the cleanup interval"""
+        started = time.monotonic()
+        with self._lock:
+            if self._cleaning or (
+                self._last_cleanup is not None
+                and started - self._last_cleanup < self.cleanup_interval
+            ):
+                return False
+            self._cleaning = True
+            self._last_cleanup = started
+        threading.Thread(target=self._background_cleanup, daemon=True).start()
+        return True
+
+    def _background_cleanup(self):
+        try:
+            self.cleanup()
+        except Exception as e:
+            print(f"⚠️  Artifact cleanup failed: {e}")
+        finally:
+            with self._lock:
+                self._cleaning = False
+
+    def cleanup(self, now=None):
+        """Remove run directories older than max_age, then the oldest ones past max_bytes"""
+        now = now or time.time()
+        runs = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir():
+                files = [file for file in os.scandir(entry.path) if file.is_file()]
+                size = sum(file.stat().st_size for file in files)
+                modified = max(
+                    [file.stat().st_mtime for file in files], default=entry.stat().st_mtime
+                )
+                runs.append((modified, size, entry.name))
+        runs.sort()
+        total = sum(size for _, size, _ in runs)
+        removed = []
+        for modified, size, run_id in runs:
+            if now - modified <= self.max_age and total <= self.max_bytes:
+                break
+            shutil.rmtree(self.run_dir(run_id), ignore_errors=True)
+            total -= size
+            removed.append(run_id)
+        if removed:
+            with self._lock:
+                for run_id in removed:
+                    self.runs.pop(run_id, None)
+                self.latest_by_session = {
+                    session_id: artifact
+                    for session_id, artifact in self.latest_by_session.items()
+                    if artifact.run_id not in removed
+                }
+        return removed
+
+    def stats(self):
+        with self._lock:
+            artifacts = [artifact for run in self.runs.values() for artifact in run]
+            return {
+                "runs": len(self.runs),
+                "artifacts": len(artifacts),
+                "bytes": sum(artifact.size for artifact in artifacts),
+                "sessions": len(self.latest_by_session),
+            }
+
+
+artifact_registry = ArtifactRegistry()
+
+
+def current_run_dir():
+    """Output directory of the current run (a shared scratch directory outside runs)"""
+    run = _current_run.get()
+    if run is None:
+        directory = os.path.join(ARTIFACTS_DIR, "scratch")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+    registry, run_id = run
+    return registry.run_dir(run_id)
+
+
+def artifact_routes(registry=artifact_registry):
+    """FastAPI router serving published artifacts, to mount at ARTIFACTS_URL_PREFIX"""
+    from fastapi import APIRouter, HTTPException, Request, Response
+    from fastapi.responses import FileResponse
+
+    router = APIRouter()
+
+    @router.get("/{run_id}/{digest}/{name}")
+    def get_artifact(run_id: str, digest: str, name: str, request: Request):
+        # Only files registered to a run are served, and only at the digest of their content
+        artifact = registry.lookup(run_id, name)
+        if artifact is None or artifact.digest != digest:
+            raise HTTPException(status_code=404)
+        path = artifact.path if name == artifact.name else artifact.preview_path
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404)
+        headers = {
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{artifact.digest}"',
+        }
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        return FileResponse(path, headers=headers)
+
+    return router
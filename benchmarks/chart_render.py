@@ -0,0 +1,104 @@
+"""Render time of the deterministic chart tools.
+
+Builds a synthetic database, feeds each renderer the data the agents would pass
+it (analytical tool summaries and raw query rows) and reports the cold first
+render and the warm p50/max per chart. Exits non-zero if a warm render takes a
+second or more.
+
+Usage (from the repository root):
+    python -m benchmarks.chart_render [--db /tmp/chart_render.db] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_db import build_synthetic_db
+
+BUDGET_SECONDS = 1.0
+
+
+def chart_cases():
+    from analytics import sleep_stage_totals, time_bucket_stats, workout_summary
+    from charts import (
+        activity_rings_chart,
+        heart_rate_chart,
+        hrv_trend_chart,
+        sleep_hypnogram,
+        workout_distribution_chart,
+    )
+    from local_sql import run_query
+
+    heart_rate = time_bucket_stats(
+        record_type="HKQuantityTypeIdentifierHeartRate",
+        start_date="2024-01-01",
+        end_date="2024-04-01",
+    )
+    sleep_night = run_query(
+        "SELECT start_date, end_date, value FROM record "
+        "WHERE type = 'HKCategoryTypeIdentifierSleepAnalysis' "
+        "AND start_date BETWEEN '2024-03-01 12:00' AND '2024-03-02 12:00'"
+    )
+    sleep_totals = sleep_stage_totals(start_date="2024-01-01", end_date="2024-04-01")
+    activity = run_query("SELECT * FROM activitysummary WHERE date_components >= '2024-01-01'")
+    workouts = workout_summary(start_date="2024-01-01", end_date="2025-01-01")
+    hrv = run_query(
+        "SELECT start_date, value_numeric FROM record "
+        "WHERE type = 'HKQuantityTypeIdentifierHeartRateVariabilitySDNN' "
+        "AND start_date >= '2024-01-01'"
+    )
+    return {
+        "heart rate (daily buckets)": lambda: heart_rate_chart(data=heart_rate),
+        "sleep hypnogram": lambda: sleep_hypnogram(data=sleep_night),
+        "sleep nightly totals": lambda: sleep_hypnogram(data=sleep_totals),
+        "activity rings": lambda: activity_rings_chart(data=activity),
+        "workout distribution": lambda: workout_distribution_chart(data=workouts),
+        "hrv trend": lambda: hrv_trend_chart(data=hrv),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "chart_render.db"))
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    build_synthetic_db(args.db, records=args.records)
+    os.environ.setdefault("ARTIFACTS_DIR", tempfile.mkdtemp(prefix="chart_render_"))
+
+    import local_sql
+
+    local_sql.HEALTH_DB_PATH = args.db
+
+    slow = []
+    for label, render in chart_cases().items():
+        start = time.perf_counter()
+        result = render()
+        cold = time.perf_counter() - start
+        if result.startswith("Error"):
+            print(f"{label:<28} {result}")
+            slow.append(label)
+            continue
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - start)
+        p50 = statistics.median(timings)
+        print(
+            f"{label:<28} cold={cold * 1000:7.1f} ms  p50={p50 * 1000:7.1f} ms  "
+            f"max={max(timings) * 1000:7.1f} ms"
+        )
+        if p50 >= BUDGET_SECONDS:
+            slow.append(label)
+
+    if slow:
+        print(f"\n{len(slow)} chart(s) failed or exceeded {BUDGET_SECONDS:.0f}s: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
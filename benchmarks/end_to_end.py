@@ -0,0 +1,321 @@
+"""End-to-end throughput of the chat pipeline without paying for LLM or MCP calls.
+
+Drives concurrent chat sessions through ``main.chat_with_agent`` (job queue,
+agent pool, manager and managed agents, tools, charts and artifacts) with the
+LLM replaced by a deterministic ``ScriptedModel`` and the SQL backend set to the
+local SQLite database, filled with a synthetic health database. The scripted
+agents follow the usual paths: a short answer the router sends to the manager
+delegates to the SQL agent, one it sends to the SQL agent runs it directly and
+a single-metric lookup is answered by a canned tool (set ``ROUTING=0`` to send
+everything to the manager). A detailed report also runs the SQL agent through
+``run_parallel``, looks up reference norms and renders a chart. With
+``--looping-every`` some runs never finish on their own and end with a
+best-effort answer once their budget is spent. Each scripted model call sleeps
+``--llm-latency`` seconds to stand in for the API, and streamed calls then emit
+their output in 4-character tokens ``--token-latency`` seconds apart. Reports
+requests/sec, end-to-end latency and time-to-first-answer-token percentiles,
+memory, budget hits, routes and the time per stage from the run traces, and
+exits non-zero on errors or when p95 exceeds ``--max-p95``.
+
+Usage (from the repository root):
+    python -m benchmarks.end_to_end [--records 100000] [--sessions 8] [--requests 5]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+QUESTIONS = (
+    "How is my heart health, compared to people in my age group?",
+    "How has my heart rate changed this year?",
+    "Is my resting heart rate normal?",
+    "What was my highest blood oxygen reading?",
+)
+
+SQL_SCRIPT = (
+    'print(get_table_schema(tables="record, healthdata"))',
+    "stats = time_bucket_stats(record_type='HKQuantityTypeIdentifierHeartRate', "
+    "start_date='2024-01-01', end_date='2024-04-01')\n"
+    "profile = health_data_real_mcp_execute_sql_query("
+    "sql_query='SELECT date_of_birth, biological_sex FROM healthdata')\n"
+    "print(stats[:300], profile)",
+    "final_answer(stats)",
+)
+MANAGER_SCRIPTS = {
+    "Short Answer": (
+        "health = sql_query_agent_health(task='Daily heart rate statistics for 2024-01-01 to "
+        "2024-04-01 as the JSON summary of time_bucket_stats')\nprint(health[:300])",
+        "final_answer('Your average heart rate was in the normal range. ' + health[-200:])",
+    ),
+    "Detailed Report": (
+        "results = run_parallel(tasks={'sql_query_agent_health': 'Daily heart rate statistics "
+        "for 2024-01-01 to 2024-04-01 as the JSON summary of time_bucket_stats'})\n"
+        "print(str(results)[:300])",
+        "health = results['sql_query_agent_health']\n"
+        "print(heart_rate_chart(data=health[health.index('{'):]))\n"
+        "print(lookup_reference_norms(metric='resting_heart_rate', age=40, "
+        "biological_sex='HKBiologicalSexFemale', value=62))",
+        "final_answer('## Heart health report\\nYour heart rate compares well with your age "
+        "group. ' + health[-200:])",
+    ),
+}
+
+
+def _text(message):
+    content = message["content"] if isinstance(message, dict) else message.content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _role(message):
+    role = message["role"] if isinstance(message, dict) else message.role
+    return getattr(role, "value", role)
+
+
+# Asks for the same data again and again, printing all of it each time
+LOOPING_SCRIPT = (
+    "health = sql_query_agent_health(task='Daily heart rate statistics for 2024-01-01 to "
+    "2024-04-01 as the JSON summary of time_bucket_stats')\nprint(health)"
+)
+# Marks the questions the scripted manager never finishes, so they run into their budget
+LOOPING = "(looping)"
+
+
+def scripted_model(latency, token_latency):
+    """A smolagents Model answering from MANAGER_SCRIPTS / SQL_SCRIPT by agent, mode and step"""
+    from smolagents import ChatMessage, ChatMessageStreamDelta, Model
+    from smolagents.monitoring import TokenUsage
+
+    class ScriptedModel(Model):
+        def __init__(self):
+            super().__init__(model_id="scripted")
+            self.calls = 0
+            self._lock = threading.Lock()
+
+        def _reply(self, messages):
+            system, task = _text(messages[0]), _text(messages[1])
+            step = sum(_role(message) == "assistant" for message in messages)
+            if "got stuck" in system:
+                # The best-effort answer asked for once a run is out of budget
+                script = ("Best-effort answer from the data gathered so far.",)
+                step = 0
+            elif "SQL explorer" in system:
+                script = SQL_SCRIPT
+            elif LOOPING in task:
+                script = (LOOPING_SCRIPT,)
+            elif "benchmark comparisons" in task:
+                script = MANAGER_SCRIPTS["Detailed Report"]
+            else:
+                script = MANAGER_SCRIPTS["Short Answer"]
+            code = script[min(step, len(script) - 1)]
+            content = (
+                code
+                if "got stuck" in system
+                else f"Thought: scripted step {step}.\n<code>\n{code}\n</code>"
+            )
+            time.sleep(latency)
+            with self._lock:
+                self.calls += 1
+            input_chars = sum(len(_text(message)) for message in messages)
+            usage = TokenUsage(input_tokens=input_chars // 4, output_tokens=len(content) // 4)
+            return content, usage
+
+        def generate(self, messages, stop_sequences=None, **kwargs):
+            content, usage = self._reply(messages)
+            return ChatMessage(role="assistant", content=content, token_usage=usage)
+
+        def generate_stream(self, messages, stop_sequences=None, **kwargs):
+            content, usage = self._reply(messages)
+            for start in range(0, len(content), 4):
+                time.sleep(token_latency)
+                yield ChatMessageStreamDelta(content=content[start : start + 4])
+            yield ChatMessageStreamDelta(content="", token_usage=usage)
+
+    return ScriptedModel()
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return float("nan")
+
+
+async def session(main, index, requests, looping_every, latencies, first_tokens, errors):
+    for request in range(requests):
+        mode = ("Short Answer", "Detailed Report")[(index + request) % 2]
+        # A unique question per request, so the answer cache never short-circuits the pipeline
+        question = f"{QUESTIONS[request % len(QUESTIONS)]} (session {index}, request {request})"
+        if looping_every and (index * requests + request) % looping_every == looping_every - 1:
+            question += f" {LOOPING}"
+        start, first_token = time.perf_counter(), None
+        history = []
+        async for history, _ in main.chat_with_agent(question, [], mode, f"bench-{index}"):
+            # What the user sees first of the answer itself, as opposed to progress cards
+            if first_token is None and (history[-1]["content"] or "").endswith(main.STREAM_CURSOR):
+                first_token = time.perf_counter() - start
+        latencies.append(time.perf_counter() - start)
+        if first_token is not None:
+            first_tokens.append(first_token)
+        if "Analysis Error" in (history[-1]["content"] or ""):
+            errors.append(history[-1]["content"])
+
+
+async def drive(main, sessions, requests, looping_every, latencies, first_tokens, errors):
+    await asyncio.gather(
+        *(
+            session(main, index, requests, looping_every, latencies, first_tokens, errors)
+            for index in range(sessions)
+        )
+    )
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "end_to_end.db"))
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5, help="requests per session")
+    parser.add_argument("--concurrency", type=int, default=4, help="AGENT_CONCURRENCY")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per model call")
+    parser.add_argument(
+        "--token-latency", type=float, default=0.002, help="seconds per streamed token"
+    )
+    parser.add_argument(
+        "--looping-every",
+        type=int,
+        default=0,
+        help="every Nth request never finishes on its own and runs into its budget",
+    )
+    parser.add_argument("--max-p95", type=float, default=None, help="latency budget in seconds")
+    parser.add_argument("--verbose", action="store_true", help="keep the agents' output")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="end_to_end_")
+    # Before any app module is imported: they read their settings at import time
+    os.environ.update(
+        HEALTH_SQL_BACKEND="local",
+        HEALTH_DB_PATH=args.db,
+        AGENT_CONCURRENCY=str(args.concurrency),
+        ANSWER_CACHE_PATH=os.path.join(workdir, "answer_cache.db"),
+        ARTIFACTS_DIR=os.path.join(workdir, "artifacts"),
+        TRACE_PATH=os.path.join(workdir, "spans.jsonl"),
+        LITELLM_LOCAL_MODEL_COST_MAP="True",
+    )
+    from benchmarks.synthetic_db import build_synthetic_db
+
+    build_synthetic_db(args.db, records=args.records)
+
+    import llm
+
+    model = scripted_model(args.llm_latency, args.token_latency)
+    llm.set_model(model)
+    # The app and the agents print every step; keep only the report
+    devnull = open(os.devnull, "w")
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+
+    start = time.perf_counter()
+    with output:
+        import main as app
+        from charts import warm_up
+
+        app.demo.agent_pool.warm_up()
+        warm_up()
+    startup = time.perf_counter() - start
+    rss_before = rss_mb()
+
+    latencies, first_tokens, errors = [], [], []
+    start = time.perf_counter()
+    with output:
+        asyncio.run(
+            drive(
+                app,
+                args.sessions,
+                args.requests,
+                args.looping_every,
+                latencies,
+                first_tokens,
+                errors,
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    total = len(latencies)
+    print(f"startup + {app.demo.agent_pool.size} agents: {startup:.2f}s")
+    print(
+        f"{total} requests from {args.sessions} sessions in {elapsed:.2f}s: "
+        f"{total / elapsed:.2f} req/s, {len(errors)} errors, {model.calls} model calls"
+    )
+    print(
+        f"latency p50={statistics.median(latencies):.2f}s  p95={percentile(latencies, 0.95):.2f}s  "
+        f"p99={percentile(latencies, 0.99):.2f}s  max={max(latencies):.2f}s"
+    )
+    from budget import budget_stats
+    from router import router_stats
+    from tracing import read_spans, trace_report
+
+    runs = [span for span in read_spans(os.environ["TRACE_PATH"]) if span["name"] == "run"]
+    generated = [
+        span["attributes"]["time_to_first_token_ms"] / 1000
+        for span in runs
+        if "time_to_first_token_ms" in span["attributes"]
+    ]
+    if generated:
+        print(
+            f"first answer token generated p50={statistics.median(generated):.2f}s  "
+            f"p95={percentile(generated, 0.95):.2f}s  ({len(generated)} of {len(runs)} runs)"
+        )
+    if first_tokens:
+        print(
+            f"first answer text shown     p50={statistics.median(first_tokens):.2f}s  "
+            f"p95={percentile(first_tokens, 0.95):.2f}s  ({len(first_tokens)} answers streamed "
+            "in the UI, the others completed between two polls)"
+        )
+    print(
+        f"memory: rss {rss_before:.0f} -> {rss_mb():.0f} MB, "
+        f"peak {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB"
+    )
+    print(f"agent pool: {app.demo.agent_pool.stats()}")
+    print(f"budgets: {budget_stats.stats()}")
+    print(f"routes: {router_stats.stats()}")
+    print(f"\n{'stage':<44} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total s':>8}")
+    report = trace_report(os.environ["TRACE_PATH"])
+    for stage, row in sorted(report.items(), key=lambda item: -item[1]["total_ms"])[:15]:
+        print(
+            f"{stage:<44} {row['count']:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+            f"{row['total_ms'] / 1000:>8.1f}"
+        )
+
+    failed_agents = [
+        span
+        for span in read_spans(os.environ["TRACE_PATH"])
+        if span["kind"] == "agent" and span["status"] == "ERROR"
+    ]
+    failures = []
+    if failed_agents:
+        error = failed_agents[0]["attributes"].get("error")
+        failures.append(f"{len(failed_agents)} agent span(s) ended with an error, first: {error}")
+    if errors:
+        failures.append(f"{len(errors)} request(s) failed, first: {errors[0].strip()[:300]}")
+    if args.max_p95 is not None and percentile(latencies, 0.95) > args.max_p95:
+        failures.append(f"p95 latency above {args.max_p95:.2f}s")
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Cost and latency of the model calls of each agent, and what they would cost on each tier.
+
+Reads the model spans of a trace file (see ``tracing.py``), groups them by
+agent and reports the model used, the number of calls, p50/p95 latency (and
+time waiting for a request slot), tokens, and the cost of those tokens on the
+model actually used and on every tier of ``llm.MODEL_TIERS``. Input tokens read
+from the prompt cache are priced at the cache-read rate (streamed calls do not
+report them). Prices come from LiteLLM's model cost map, or ``--price``. Pass
+several trace files to compare runs, e.g. with and without
+``LLM_TIER_SQL_QUERY_AGENT_HEALTH=large``.
+
+Usage (from the repository root):
+    python -m benchmarks.model_tiers [traces/spans.jsonl ...] [--price MODEL=IN,OUT]
+"""
+import argparse
+import os
+import statistics
+
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+# USD per million input/output tokens of models missing from LiteLLM's cost map
+FALLBACK_PRICES = {"anthropic/claude-sonnet-4-20250514": (3.0, 15.0, 0.3)}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def price_per_million(model, prices):
+    """(input, output, cache read) USD per million tokens of ``model``, or None if unknown"""
+    if model in prices:
+        return prices[model]
+    import litellm
+
+    info = litellm.model_cost.get(model) or litellm.model_cost.get(model.split("/", 1)[-1])
+    if info and info.get("input_cost_per_token"):
+        input_price = info["input_cost_per_token"] * 1e6
+        cache_price = info.get("cache_read_input_token_cost") or info["input_cost_per_token"]
+        return input_price, info["output_cost_per_token"] * 1e6, cache_price * 1e6
+    return FALLBACK_PRICES.get(model)
+
+
+def cost(spans, model, prices):
+    price = price_per_million(model, prices)
+    if price is None:
+        return None
+    input_price, output_price, cache_price = price
+    total = 0.0
+    for span in spans:
+        attributes = span["attributes"]
+        cached = attributes.get("cached_input_tokens") or 0
+        total += (attributes.get("input_tokens") or 0) - cached
+        total += cached * cache_price / input_price
+        total += (attributes.get("output_tokens") or 0) * output_price / input_price
+    return total * input_price / 1e6
+
+
+def report(path, prices):
+    from llm import MODEL_TIERS
+    from tracing import read_spans
+
+    agents = {}
+    for span in read_spans(path):
+        if span["kind"] == "model":
+            agents.setdefault(span["attributes"].get("agent") or "-", []).append(span)
+    tiers = list(MODEL_TIERS.items())
+    print(f"\n{path}")
+    header = (
+        f"{'agent':<24} {'model':<36} {'calls':>6} {'p50 ms':>8} {'p95 ms':>8} {'queue p95':>9} "
+        f"{'tokens in/out':>16} {'cost $':>8}"
+    )
+    print(header + "".join(f" {'on ' + tier + ' $':>10}" for tier, _ in tiers))
+    totals = {"cost": 0.0, **{tier: 0.0 for tier, _ in tiers}}
+    for agent, spans in sorted(agents.items(), key=lambda item: -len(item[1])):
+        models = sorted({span["attributes"].get("model") or "-" for span in spans})
+        durations = [span["duration_ms"] for span in spans]
+        queued = [span["attributes"].get("queue_ms") or 0.0 for span in spans]
+        tokens_in = sum(span["attributes"].get("input_tokens") or 0 for span in spans)
+        tokens_out = sum(span["attributes"].get("output_tokens") or 0 for span in spans)
+        by_model = {
+            model: [span for span in spans if span["attributes"].get("model") == model]
+            for model in models
+        }
+        actual = [cost(model_spans, model, prices) for model, model_spans in by_model.items()]
+        actual = None if None in actual else sum(actual)
+        on_tier = {tier: cost(spans, model, prices) for tier, model in tiers}
+        for key, value in [("cost", actual), *on_tier.items()]:
+            totals[key] = None if value is None or totals[key] is None else totals[key] + value
+        print(
+            f"{agent:<24} {', '.join(models):<36} {len(spans):>6} "
+            f"{statistics.median(durations):>8.0f} {percentile(durations, 0.95):>8.0f} "
+            f"{percentile(queued, 0.95):>9.0f} {f'{tokens_in}/{tokens_out}':>16} "
+            f"{_dollars(actual):>8}"
+            + "".join(f" {_dollars(on_tier[tier]):>10}" for tier, _ in tiers)
+        )
+    print(
+        f"{'total':<24} {'':<36} {'':>6} {'':>8} {'':>8} {'':>9} {'':>16} "
+        f"{_dollars(totals['cost']):>8}"
+        + "".join(f" {_dollars(totals[tier]):>10}" for tier, _ in tiers)
+    )
+
+
+def _dollars(value):
+    return "n/a" if value is None else f"{value:.4f}"
+
+
+def main():
+    from tracing import TRACE_PATH
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=[TRACE_PATH], help="trace files")
+    parser.add_argument(
+        "--price",
+        action="append",
+        default=[],
+        metavar="MODEL=IN,OUT[,CACHED]",
+        help="USD per million input, output and cached input tokens",
+    )
+    args = parser.parse_args()
+    prices = {}
+    for price in args.price:
+        model, values = price.split("=", 1)
+        values = [float(value) for value in values.split(",")]
+        prices[model] = (values[0], values[1], values[2] if len(values) > 2 else values[0])
+    for path in args.paths:
+        report(path, prices)
+
+
+if __name__ == "__main__":
+    main()
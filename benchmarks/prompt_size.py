@@ -0,0 +1,61 @@
+"""Token size of the SQL agent's system prompt, with the full schema and with the catalog.
+
+The system prompt is sent again on every step of a run, so its size is paid
+``steps`` times. The DDL from ``get_table_schema`` also stays in the run's
+memory once fetched, but only for the tables the question needs. Reports the
+prompt tokens for both backends with the full schema dump (before) and with the
+table catalog (after), and the size of the DDL returned for typical questions. Tokens are counted with LiteLLM's
+tokenizer for ``LLM_MODEL_ID``.
+
+Usage (from the repository root):
+    python -m benchmarks.prompt_size [--steps 5]
+"""
+import argparse
+
+QUESTIONS = (
+    "How is my heart health compared to people in my age group?",
+    "How well am I sleeping?",
+    "How can I improve my activity level?",
+    "What was my average heart rate during my runs last month?",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=5, help="agent steps per run")
+    args = parser.parse_args()
+
+    import litellm
+
+    import sql_agent
+    from llm import LLM_MODEL_ID
+    from schema_catalog import SCHEMA_PATH, get_table_schema, load_schema_catalog
+
+    def tokens(text):
+        return litellm.token_counter(model=LLM_MODEL_ID, text=text)
+
+    with open(SCHEMA_PATH) as file:
+        full_schema_notes = f"\n    The schema of the database is defined as follow:\n\n    {file.read()}"
+
+    print(f"{'backend':<8} {'before':>8} {'after':>8} {'saved':>7}   per run of {args.steps} steps")
+    for backend in ("mcp", "local"):
+        sql_agent.SQL_BACKEND = backend
+        catalog_notes = sql_agent.get_schema_notes()
+        after = sql_agent.get_schema_description()
+        before_tokens = tokens(after.replace(catalog_notes, full_schema_notes))
+        after_tokens = tokens(after)
+        print(
+            f"{backend:<8} {before_tokens:>8,} {after_tokens:>8,} "
+            f"{1 - after_tokens / before_tokens:>6.0%}   "
+            f"{before_tokens * args.steps:,} -> {after_tokens * args.steps:,} tokens"
+        )
+
+    catalog = load_schema_catalog()
+    print("\nDDL fetched on demand for typical questions:")
+    for question in QUESTIONS:
+        tables = catalog.relevant_tables(question)
+        print(f"  {tokens(get_table_schema(question=question)):>5,} tokens  {tables}  {question}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Query-plan regression check for representative agent queries.
+
+Builds a synthetic database, runs EXPLAIN QUERY PLAN on every query of the corpus
+and exits non-zero if any of them falls back to a full scan of a data table.
+
+Usage (from the repository root):
+    python -m benchmarks.query_plans [--db /tmp/query_plans.db] [--records 200000]
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+from benchmarks.synthetic_db import build_synthetic_db
+
+# Queries shaped like the ones the SQL agent writes for typical questions
+QUERIES = {
+    "heart rate over a period": """
+        SELECT start_date, value_numeric FROM record
+        WHERE type = 'HKQuantityTypeIdentifierHeartRate'
+          AND start_date BETWEEN '2024-01-01' AND '2024-02-01'
+    """,
+    "average heart rate": """
+        SELECT AVG(value_numeric) FROM record
+        WHERE type = 'HKQuantityTypeIdentifierHeartRate' AND start_date >= '2024-06-01'
+    """,
+    "average heart rate (text cast)": """
+        SELECT AVG(CAST(value AS REAL)) FROM record
+        WHERE type = 'HKQuantityTypeIdentifierHeartRate' AND start_date >= '2024-06-01'
+    """,
+    "daily steps": """
+        SELECT substr(start_date, 1, 10) AS day, SUM(value_numeric) FROM record
+        WHERE type = 'HKQuantityTypeIdentifierStepCount' AND start_date >= '2024-01-01'
+        GROUP BY day
+    """,
+    "latest resting heart rate": """
+        SELECT start_date, value FROM record
+        WHERE type = 'HKQuantityTypeIdentifierRestingHeartRate'
+        ORDER BY start_date DESC LIMIT 30
+    """,
+    "sleep stages": """
+        SELECT value, start_date, end_date FROM record
+        WHERE type = 'HKCategoryTypeIdentifierSleepAnalysis'
+          AND start_date >= '2024-09-01' AND start_date < '2024-10-01'
+    """,
+    "weekly resting heart rate from rollups": """
+        SELECT strftime('%Y-%W', bucket) AS week, SUM(sum) / SUM(count) FROM recordrollup
+        WHERE type = 'HKQuantityTypeIdentifierRestingHeartRate' AND period = 'day'
+          AND bucket >= '2024-01-01'
+        GROUP BY week
+    """,
+    "running workouts": """
+        SELECT start_date, duration, total_energy_burned FROM workout
+        WHERE workout_activity_type = 'HKWorkoutActivityTypeRunning'
+          AND start_date >= '2024-01-01'
+    """,
+    "workouts of a type": """
+        SELECT COUNT(*), SUM(duration) FROM workout
+        WHERE workout_activity_type = 'HKWorkoutActivityTypeCycling'
+    """,
+    "record metadata": """
+        SELECT key, value FROM metadataentry WHERE parent_type = 'record' AND parent_id = 42
+    """,
+    "motion context of heart rate samples": """
+        SELECT r.start_date, r.value_numeric, m.value FROM record r
+        JOIN metadataentry m
+          ON m.parent_type = 'record' AND m.parent_id = r.id
+         AND m.key = 'HKMetadataKeyHeartRateMotionContext'
+        WHERE r.type = 'HKQuantityTypeIdentifierHeartRate' AND r.start_date >= '2024-12-01'
+    """,
+    "activity summary range": """
+        SELECT * FROM activitysummary WHERE date_components BETWEEN '2024-01-01' AND '2024-01-31'
+    """,
+}
+
+# "SCAN <table>" without an index is a full table scan; subqueries and CTEs are fine
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def full_scans(connection, sql):
+    plan = connection.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    details = [row[-1] for row in plan]
+    return [detail for detail in details if FULL_SCAN.match(detail)], details
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="database to check (a fresh synthetic one by default)")
+    parser.add_argument("--records", type=int, default=200_000)
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.gettempdir(), "health_query_plans.db")
+    if not args.db or not os.path.exists(db_path):
+        build_synthetic_db(db_path, records=args.records)
+
+    connection = sqlite3.connect(db_path)
+    failures = 0
+    for name, sql in QUERIES.items():
+        scans, details = full_scans(connection, sql)
+        status = "FULL SCAN" if scans else "ok"
+        print(f"{status:<9} {name}: {' | '.join(details)}")
+        failures += bool(scans)
+    connection.close()
+
+    if failures:
+        print(f"❌ {failures} of {len(QUERIES)} queries fall back to a full scan")
+        sys.exit(1)
+    print(f"✅ All {len(QUERIES)} queries use an index")
+
+
+if __name__ == "__main__":
+    main()
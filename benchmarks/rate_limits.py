@@ -0,0 +1,233 @@
+"""Throughput and failures of model calls against a provider that enforces rate limits.
+
+Starts a local stand-in for the Anthropic messages API that, like the real
+one, refills token buckets of requests and input tokens per minute and rejects
+calls over the limit with a 429 and a Retry-After header. Client threads make
+model calls through ``llm.create_model`` models (so through the scheduler of
+``scheduler.py``): interactive short answers with small prompts at priority 0
+and detailed reports with larger prompts at priority 1. The same workload is
+run with each scheduler setup:
+
+- ``none``: no rate limit buckets and no retries, every 429 fails the call
+- ``reactive``: no buckets, 429s are retried with jittered backoff
+- ``scheduled``: the buckets admit calls within the limits, 429s are retried
+
+and for each one reports the elapsed time against the minimum the limits allow,
+achieved requests/min, calls that failed, 429s returned by the provider and
+latency and queue wait by priority. Exits non-zero if a ``scheduled`` call
+fails.
+
+Usage (from the repository root):
+    python -m benchmarks.rate_limits [--calls 450] [--rpm 300] [--itpm 400000]
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+MODEL_ID = "anthropic/claude-haiku-4-5-20251001"
+# Prompt characters of each kind of call; about 4 characters per token
+PROMPT_CHARS = {0: 2_000, 1: 8_000}
+MODES = ("none", "reactive", "scheduled")
+
+
+class Provider:
+    """Token buckets of the requests and input tokens per minute of one API key"""
+
+    def __init__(self, rpm, itpm, latency):
+        self.rpm = rpm
+        self.itpm = itpm
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = float(rpm)
+        self.tokens = float(itpm)
+        self.updated = time.monotonic()
+        self.accepted = 0
+        self.rejected = 0
+
+    def admit(self, tokens):
+        """None if the call is admitted, else the seconds to wait before retrying"""
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.updated
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+            self.tokens = min(self.itpm, self.tokens + elapsed * self.itpm / 60)
+            self.updated = now
+            if self.requests >= 1 and self.tokens >= tokens:
+                self.requests -= 1
+                self.tokens -= tokens
+                self.accepted += 1
+                return None
+            self.rejected += 1
+            wait = max((1 - self.requests) * 60 / self.rpm, (tokens - self.tokens) * 60 / self.itpm)
+            return max(1, math.ceil(wait))
+
+    def serve(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, headers=()):
+                body = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                tokens = len(json.dumps(body["messages"])) // 4
+                wait = provider.admit(tokens)
+                if wait is not None:
+                    error = {"type": "rate_limit_error", "message": "Rate limit exceeded"}
+                    self.reply(
+                        429, {"type": "error", "error": error}, [("retry-after", str(wait))]
+                    )
+                    return
+                time.sleep(provider.latency)
+                self.reply(
+                    200,
+                    {
+                        "id": "msg_benchmark",
+                        "type": "message",
+                        "role": "assistant",
+                        "model": body["model"],
+                        "content": [{"type": "text", "text": "Your resting heart rate is 58."}],
+                        "stop_reason": "end_turn",
+                        "usage": {"input_tokens": tokens, "output_tokens": 12},
+                    },
+                )
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def make_scheduler(mode, args):
+    from scheduler import ModelScheduler
+
+    buckets = (args.rpm, args.itpm, 0) if mode == "scheduled" else (0, 0, 0)
+    return ModelScheduler(*buckets, max_retries=0 if mode == "none" else args.max_retries)
+
+
+def run(mode, args):
+    import litellm
+    import llm
+    from scheduler import request_priority, set_scheduler
+    from smolagents.models import ChatMessage
+
+    # Every rejected call would print LiteLLM's help banner
+    litellm.suppress_debug_info = True
+    provider = Provider(args.rpm, args.itpm, args.latency)
+    server = provider.serve()
+    os.environ["ANTHROPIC_API_BASE"] = f"http://127.0.0.1:{server.server_port}"
+    scheduler = make_scheduler(mode, args)
+    set_scheduler(MODEL_ID, scheduler)
+    model = llm.create_model(MODEL_ID)
+
+    remaining = iter(range(args.calls))
+    lock = threading.Lock()
+    latencies = {0: [], 1: []}
+    failures = []
+
+    def client(number):
+        while True:
+            with lock:
+                call = next(remaining, None)
+            if call is None:
+                return
+            # One call in four is part of a detailed report
+            priority = 1 if call % 4 == 3 else 0
+            text = f"Question {call} from client {number}. " + "x" * PROMPT_CHARS[priority]
+            messages = [ChatMessage(role="user", content=[{"type": "text", "text": text}])]
+            start = time.perf_counter()
+            try:
+                with request_priority(priority):
+                    model.generate(messages)
+            except Exception as error:
+                with lock:
+                    failures.append(type(error).__name__)
+                continue
+            with lock:
+                latencies[priority].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    completed = sum(len(values) for values in latencies.values())
+    tokens = sum(
+        len(latencies[priority]) * PROMPT_CHARS[priority] // 4 for priority in PROMPT_CHARS
+    )
+    # Calls beyond the first minute's worth are admitted at the refill rate
+    minimum = max(
+        (completed - args.rpm) * 60 / args.rpm,
+        (tokens - args.itpm) * 60 / args.itpm,
+        0,
+    )
+    stats = scheduler.stats()
+    print(f"\n{mode}:")
+    print(
+        f"  {completed}/{args.calls} calls in {elapsed:.1f}s "
+        f"(limits allow {minimum:.1f}s), {completed / elapsed * 60:.0f} requests/min"
+    )
+    print(
+        f"  failed: {len(failures)}, provider 429s: {provider.rejected}, "
+        f"scheduler retries: {stats['retries']}"
+    )
+    for priority, values in latencies.items():
+        if not values:
+            continue
+        values = sorted(values)
+        wait = stats["average_wait_by_priority"].get(priority, 0.0)
+        print(
+            f"  priority {priority}: p50 {statistics.median(values):.2f}s, "
+            f"p95 {values[int(0.95 * (len(values) - 1))]:.2f}s, "
+            f"average queue wait {wait:.2f}s"
+        )
+    return len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=450)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--rpm", type=int, default=300, help="requests per minute")
+    parser.add_argument("--itpm", type=int, default=400_000, help="input tokens per minute")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per accepted call")
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--modes", default=",".join(MODES))
+    args = parser.parse_args()
+
+    os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+    print(
+        f"{args.calls} calls from {args.clients} clients, limits {args.rpm} requests/min "
+        f"and {args.itpm} input tokens/min"
+    )
+    failed = {mode: run(mode, args) for mode in args.modes.split(",")}
+    if failed.get("scheduled"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
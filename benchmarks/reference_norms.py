@@ -0,0 +1,51 @@
+"""Check the reference norms lookups against values rated by hand.
+
+Looks up the dataset with the ``lookup_reference_norms`` tool the manager uses
+and compares each rating with the expected category, including SpO2 given as
+the fraction HealthKit stores (0.97) and ages between the whole years of two
+age bands. Exits non-zero on any mismatch.
+
+Usage (from the repository root):
+    python -m benchmarks.reference_norms
+"""
+import json
+import sys
+
+# metric, age, biological sex, value, expected rating of each entry found
+CASES = [
+    ("oxygen_saturation", 40, "", 0.97, ["normal"]),
+    ("HKQuantityTypeIdentifierOxygenSaturation", 40, "", 0.93, ["low"]),
+    ("spo2", 40, "", 97, ["normal"]),
+    ("resting_heart_rate", 25.5, "HKBiologicalSexMale", 60, ["excellent", "normal_range"]),
+    ("resting_heart_rate", 26, "HKBiologicalSexMale", 60, ["excellent", "normal_range"]),
+    ("resting_heart_rate", 65.9, "female", 70, ["above_average", "normal_range"]),
+    ("vo2max", 29.5, "female", 38, ["excellent"]),
+    ("sleep_duration", 17.5, "", 8.5, ["recommended"]),
+    ("sleep_duration", 64.5, "", 9.5, ["may_be_appropriate_long"]),
+    ("daily_steps", 30, "", 8000, ["somewhat_active"]),
+    ("vo2max", 12, "male", 40, []),
+]
+
+
+def main():
+    from reference_norms import lookup_reference_norms
+
+    failures = 0
+    for metric, age, sex, value, expected in CASES:
+        result = lookup_reference_norms(metric=metric, age=age, biological_sex=sex, value=value)
+        ratings = (
+            [entry["user_rating"] for entry in json.loads(result)["reference"]]
+            if result.startswith("{")
+            else []
+        )
+        ok = ratings == expected
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {metric} age {age} {sex or '-'} {value}: {ratings}")
+    if failures:
+        print(f"{failures} of {len(CASES)} lookups did not match")
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Check that the agents' code runs in the context of its run.
+
+Builds the real manager agent tree with a scripted model and runs one question
+on a job-queue worker. The manager's code calls the visual agent, and the
+visual agent's code asks ``artifact_path`` where to save a file and renders a
+chart with a chart tool. Each agent's code runs on its executor's timeout
+thread, as it does in the app. The check fails unless the visual agent's step
+reached the job's progress events, and the path and the chart are in the run's
+own artifact directory and registered to the run.
+
+Usage (from the repository root):
+    python -m benchmarks.run_context [--verbose]
+"""
+import argparse
+import contextlib
+import os
+import re
+import sys
+import tempfile
+
+MANAGER_CODE = "report = visual_agent(task='CHECK-VISUAL: draw the chart')\nfinal_answer(report)"
+VISUAL_CODE = (
+    "path = artifact_path(filename='check.png')\n"
+    "print(heart_rate_chart(data=[{'date': '2024-01-01', 'value': 61}, "
+    "{'date': '2024-01-02', 'value': 64}]))\n"
+    "final_answer(path)"
+)
+RUN_ID = "run-context-check"
+
+
+def scripted_model():
+    """Writes MANAGER_CODE for the manager and VISUAL_CODE for the visual agent"""
+    from smolagents import ChatMessage, Model
+
+    def text(message):
+        content = message.content
+        if isinstance(content, list):
+            return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        return content or ""
+
+    class ScriptedModel(Model):
+        def generate(self, messages, stop_sequences=None, **kwargs):
+            code = VISUAL_CODE if "CHECK-VISUAL" in text(messages[1]) else MANAGER_CODE
+            content = f"Thought: check.\n<code>\n{code}\n</code>"
+            return ChatMessage(role="assistant", content=content)
+
+        def generate_stream(self, messages, stop_sequences=None, **kwargs):
+            raise NotImplementedError
+
+    return ScriptedModel(model_id="scripted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="keep the agents' output")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="run_context_")
+    # Before any app module is imported: they read their settings at import time
+    os.environ.update(
+        HEALTH_SQL_BACKEND="local",
+        HEALTH_DB_PATH=os.path.join(workdir, "health.db"),
+        ARTIFACTS_DIR=os.path.join(workdir, "artifacts"),
+        STREAM_ANSWERS="0",
+        LITELLM_LOCAL_MODEL_COST_MAP="True",
+    )
+    import llm
+
+    llm.set_model(scripted_model())
+    from artifacts import artifact_registry
+    from job_queue import FairJobQueue, install_progress_callbacks
+    from multi_agent import create_main_agent
+    from sql_agent import get_sql_tools
+
+    devnull = open(os.devnull, "w")
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+    with output:
+        manager = create_main_agent(get_sql_tools())
+        install_progress_callbacks(manager)
+
+        def run():
+            with artifact_registry.run(RUN_ID, "check"):
+                return manager.run("CHECK-MANAGER", max_steps=2)
+
+        job = FairJobQueue(workers=1).submit("check", run)
+        job.done.wait()
+    events = job.drain_events()
+
+    failures = []
+    if job.error is not None:
+        failures.append(f"the run failed: {job.error!r}")
+    agents = sorted({event["agent"] for event in events})
+    print(f"progress events from: {', '.join(agents) or 'none'}")
+    if "visual_agent" not in agents:
+        failures.append("the visual agent's steps did not reach the job's progress events")
+    run_dir = artifact_registry.run_dir(RUN_ID)
+    path = re.search(r"\S*check\.png", str(job.result))
+    print(f"artifact_path from agent code: {path and path.group()}")
+    if path is None or os.path.dirname(path.group()) != run_dir:
+        failures.append(f"artifact_path did not resolve inside the run directory {run_dir}")
+    registered = [artifact.name for artifact in artifact_registry.for_run(RUN_ID)]
+    print(f"registered to the run: {', '.join(registered) or 'nothing'}")
+    if "heart_rate.png" not in registered:
+        failures.append("the chart rendered by agent code was not registered to the run")
+    if failures:
+        print("\n".join(failures))
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Per-query latency of the local SQL backend versus the remote MCP tool.
+
+Usage (from the repository root):
+    python -m benchmarks.sql_backend --db health_data.db [--mcp] [--repeat 20]
+"""
+import argparse
+import statistics
+import time
+
+QUERIES = [
+    "SELECT COUNT(*) FROM record",
+    "SELECT type, COUNT(*) FROM record GROUP BY type ORDER BY 2 DESC LIMIT 20",
+    "SELECT AVG(CAST(value AS REAL)) FROM record "
+    "WHERE type = 'HKQuantityTypeIdentifierHeartRate'",
+    "SELECT date(start_date), AVG(CAST(value AS REAL)) FROM record "
+    "WHERE type = 'HKQuantityTypeIdentifierRestingHeartRate' "
+    "AND start_date >= '2024-01-01' GROUP BY 1",
+    "SELECT workout_activity_type, COUNT(*), SUM(duration) FROM workout GROUP BY 1",
+]
+
+
+def measure(call, repeat):
+    timings = []
+    for sql in QUERIES:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call(sql)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    p50 = statistics.median(timings)
+    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    print(f"{label:<8} n={len(timings):<5} p50={p50:9.2f} ms  p95={p95:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="local SQLite database (defaults to HEALTH_DB_PATH)")
+    parser.add_argument("--mcp", action="store_true", help="also benchmark the remote MCP tool")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    import local_sql
+
+    if args.db:
+        local_sql.HEALTH_DB_PATH = args.db
+    local_tool = local_sql.health_data_real_mcp_execute_sql_query
+    report("local", measure(lambda sql: local_tool(sql_query=sql), args.repeat))
+
+    if args.mcp:
+        from sql_agent import open_sql_tools
+
+        with open_sql_tools("mcp") as tools:
+            mcp_tool = next(t for t in tools if t.name == "health_data_real_mcp_execute_sql_query")
+            report("mcp", measure(lambda sql: mcp_tool(sql_query=sql), max(1, args.repeat // 5)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Import time of the app and the time to the first ready agent.
+
+Imports ``main`` in a fresh interpreter with ``-X importtime`` and reports the
+total import time, the slowest top-level packages, and whether any of the
+heavy agent dependencies were imported before the UI could start. Exits
+non-zero if one was, or if the import exceeds ``--max-seconds``. With
+``--first-agent`` it also times building the first manager agent.
+
+Usage (from the repository root):
+    python -m benchmarks.startup [--max-seconds 6] [--first-agent]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Only needed once a question is asked, so importing main must not pull them in
+DEFERRED_MODULES = ("litellm", "smolagents", "matplotlib", "pandas", "multi_agent", "charts")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import main
+print("IMPORT_SECONDS", time.perf_counter() - start)
+print("LOADED", ",".join(m for m in {deferred!r} if m in sys.modules))
+if {first_agent!r}:
+    start = time.perf_counter()
+    with main.demo.agent_pool.checkout():
+        pass
+    print("FIRST_AGENT_SECONDS", time.perf_counter() - start)
+"""
+
+
+def parse_importtime(stderr, module="main"):
+    """Cumulative microseconds of each import made directly by ``module``"""
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # Two spaces of indentation per nesting level; children are listed before their parent
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children[name.strip()] = int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                return children
+            children = {}
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--first-agent", action="store_true")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = {"HEALTH_SQL_BACKEND": "local", "LITELLM_LOCAL_MODEL_COST_MAP": "True", **os.environ}
+    probe = PROBE.format(deferred=DEFERRED_MODULES, first_agent=args.first_agent)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if completed.returncode != 0:
+        print(completed.stderr[-2000:])
+        sys.exit(completed.returncode)
+
+    # main prints its own progress too; keep only the probe's lines
+    results = {}
+    for line in completed.stdout.splitlines():
+        key, _, value = line.partition(" ")
+        if key in ("IMPORT_SECONDS", "LOADED", "FIRST_AGENT_SECONDS"):
+            results[key] = value
+    import_seconds = float(results["IMPORT_SECONDS"])
+    loaded = [name for name in results.get("LOADED", "").split(",") if name]
+
+    print(f"import main: {import_seconds:.2f}s")
+    print("slowest imports made by main:")
+    modules = parse_importtime(completed.stderr)
+    for module, microseconds in sorted(modules.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {module:<24} {microseconds / 1e6:6.2f}s")
+    if "FIRST_AGENT_SECONDS" in results:
+        print(f"first agent built in {float(results['FIRST_AGENT_SECONDS']):.2f}s")
+
+    failures = []
+    if loaded:
+        failures.append(f"deferred modules imported at startup: {', '.join(loaded)}")
+    if args.max_seconds is not None and import_seconds > args.max_seconds:
+        failures.append(f"import took {import_seconds:.2f}s (budget {args.max_seconds:.2f}s)")
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Deterministic synthetic health database for benchmarks and query-plan checks.
+
+Usage (from the repository root):
+    python -m benchmarks.synthetic_db /tmp/synthetic.db --records 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+from health_importer import HealthImporter, create_deferred_indexes, drop_deferred_indexes
+from local_sql import create_database
+from rollups import refresh_rollups
+
+START = datetime(2023, 1, 1)
+
+# (type, unit, mean, spread, share of the generated quantity records)
+QUANTITY_TYPES = [
+    ("HKQuantityTypeIdentifierHeartRate", "count/min", 75, 15, 0.55),
+    ("HKQuantityTypeIdentifierStepCount", "count", 400, 300, 0.2),
+    ("HKQuantityTypeIdentifierActiveEnergyBurned", "Cal", 25, 20, 0.15),
+    ("HKQuantityTypeIdentifierHeartRateVariabilitySDNN", "ms", 45, 15, 0.04),
+    ("HKQuantityTypeIdentifierRestingHeartRate", "count/min", 60, 5, 0.02),
+    ("HKQuantityTypeIdentifierVO2Max", "mL/min·kg", 42, 3, 0.01),
+    ("HKQuantityTypeIdentifierOxygenSaturation", "%", 0.97, 0.01, 0.03),
+]
+SLEEP_STAGES = [
+    ("HKCategoryValueSleepAnalysisAsleepCore", 0.55),
+    ("HKCategoryValueSleepAnalysisAsleepDeep", 0.15),
+    ("HKCategoryValueSleepAnalysisAsleepREM", 0.2),
+    ("HKCategoryValueSleepAnalysisAwake", 0.1),
+]
+WORKOUT_TYPES = [
+    "HKWorkoutActivityTypeRunning",
+    "HKWorkoutActivityTypeWalking",
+    "HKWorkoutActivityTypeCycling",
+    "HKWorkoutActivityTypeTraditionalStrengthTraining",
+]
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _attrib(record_type, unit, start, end, value, source="Apple Watch"):
+    return {
+        "type": record_type,
+        "unit": unit,
+        "value": value,
+        "sourceName": source,
+        "startDate": start.strftime(DATE_FORMAT),
+        "endDate": end.strftime(DATE_FORMAT),
+        "creationDate": end.strftime(DATE_FORMAT),
+    }
+
+
+def build_synthetic_db(db_path, records=100_000, days=730, seed=0):
+    """Create a database with ``records`` quantity records spread over ``days`` days"""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    create_database(db_path).dispose()
+    rng = random.Random(seed)
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = OFF")
+    drop_deferred_indexes(connection)
+    importer = HealthImporter(connection)
+    importer.health_data_id = importer.add(
+        "healthdata",
+        {},
+        locale="en_US",
+        export_date=(START + timedelta(days=days)).strftime(DATE_FORMAT),
+        date_of_birth="1988-04-12",
+        biological_sex="HKBiologicalSexFemale",
+        blood_type="HKBloodTypeNotSet",
+        fitzpatrick_skin_type="HKFitzpatrickSkinTypeNotSet",
+        cardio_fitness_medications_use="None",
+    )
+
+    span = days * 86400
+    weights = [share for *_, share in QUANTITY_TYPES]
+    for record_type, unit, mean, spread, _ in rng.choices(QUANTITY_TYPES, weights, k=records):
+        start = START + timedelta(seconds=rng.randrange(span))
+        value = f"{max(0.0, rng.gauss(mean, spread)):.2f}"
+        record_id = importer.add(
+            "record",
+            _attrib(record_type, unit, start, start + timedelta(minutes=1), value),
+            value_numeric=float(value),
+            health_data_id=importer.health_data_id,
+        )
+        if record_type == "HKQuantityTypeIdentifierHeartRate":
+            importer.add(
+                "metadataentry",
+                {"key": "HKMetadataKeyHeartRateMotionContext", "value": str(rng.randrange(3))},
+                parent_type="record",
+                parent_id=record_id,
+            )
+
+    for day in range(days):
+        night = START + timedelta(days=day, hours=23)
+        for stage, share in SLEEP_STAGES:
+            end = night + timedelta(minutes=int(480 * share))
+            importer.add(
+                "record",
+                _attrib("HKCategoryTypeIdentifierSleepAnalysis", None, night, end, stage),
+                health_data_id=importer.health_data_id,
+            )
+            night = end
+        importer.add(
+            "activitysummary",
+            {
+                "dateComponents": (START + timedelta(days=day)).strftime("%Y-%m-%d"),
+                "activeEnergyBurned": str(rng.randint(200, 900)),
+                "activeEnergyBurnedGoal": "500",
+                "appleExerciseTime": str(rng.randint(5, 90)),
+                "appleExerciseTimeGoal": "30",
+                "appleStandHours": str(rng.randint(6, 14)),
+                "appleStandHoursGoal": "12",
+            },
+            health_data_id=importer.health_data_id,
+        )
+        if rng.random() < 0.5:
+            start = START + timedelta(days=day, hours=7)
+            duration = rng.randint(20, 90)
+            importer.add(
+                "workout",
+                {
+                    "workoutActivityType": rng.choice(WORKOUT_TYPES),
+                    "duration": str(duration),
+                    "durationUnit": "min",
+                    "totalEnergyBurned": str(duration * 9),
+                    "totalEnergyBurnedUnit": "Cal",
+                    "sourceName": "Apple Watch",
+                    "startDate": start.strftime(DATE_FORMAT),
+                    "endDate": (start + timedelta(minutes=duration)).strftime(DATE_FORMAT),
+                },
+                health_data_id=importer.health_data_id,
+            )
+
+    importer.flush()
+    create_deferred_indexes(connection)
+    refresh_rollups(connection)
+    connection.execute("ANALYZE")
+    connection.commit()
+    connection.close()
+    return db_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=730)
+    args = parser.parse_args()
+    build_synthetic_db(args.db_path, records=args.records, days=args.days)
+    print(f"✅ Synthetic database written to {args.db_path}")
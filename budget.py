@@ -0,0 +1,222 @@
+"""Step, time and token budgets of a manager run, per response mode.
+
+A confused run can loop through many model calls, each one re-sending the
+whole memory. ``budget_scope`` gives a run the budget of its response mode: the
+manager is run with the mode's ``max_steps``, and a step callback installed on
+the manager and its managed agents adds up the tokens of every step in the run
+and checks the wall-clock deadline. Once a budget is spent the agents are
+interrupted at their next step, and ``best_effort_answer`` asks the manager for
+an answer from what it has gathered so far. The same callback compacts the
+memory of every agent: past the last ``BUDGET_KEEP_STEPS`` steps, model outputs
+and observations are cut down to a short summary, so the prompt of each step
+stays bounded however long the run is (variables defined by the code of those
+steps are still in the Python state). Budget hits are counted in
+``budget_stats``.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Recent steps of each agent kept in full in its memory
+BUDGET_KEEP_STEPS = int(os.getenv("BUDGET_KEEP_STEPS", "2"))
+# Characters of an older step's model output and observations kept in its summary
+BUDGET_SUMMARY_CHARS = int(os.getenv("BUDGET_SUMMARY_CHARS", "600"))
+
+_current_budget = contextvars.ContextVar("current_budget", default=None)
+
+
+class Budget:
+    """Limits of one run: manager steps, wall-clock seconds and tokens of all its agents"""
+
+    def __init__(self, max_steps, max_seconds, max_tokens):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+
+    @classmethod
+    def from_env(cls, prefix, max_steps, max_seconds, max_tokens):
+        return cls(
+            int(os.getenv(f"{prefix}_MAX_STEPS", str(max_steps))),
+            float(os.getenv(f"{prefix}_MAX_SECONDS", str(max_seconds))),
+            int(os.getenv(f"{prefix}_MAX_TOKENS", str(max_tokens))),
+        )
+
+    def __repr__(self):
+        return (
+            f"Budget(max_steps={self.max_steps}, max_seconds={self.max_seconds}, "
+            f"max_tokens={self.max_tokens})"
+        )
+
+
+RESPONSE_BUDGETS = {
+    "Short Answer": Budget.from_env("BUDGET_SHORT", 6, 90, 60_000),
+    "Detailed Report": Budget.from_env("BUDGET_DETAILED", 12, 300, 250_000),
+}
+
+
+class BudgetState:
+    """What a run has spent so far; shared by the agents of the run, possibly on several threads"""
+
+    def __init__(self, budget, agent):
+        self.budget = budget
+        self.agent = agent
+        self.started_at = time.perf_counter()
+        self.deadline = self.started_at + budget.max_seconds
+        self.tokens = 0
+        self.steps = 0
+        self.compacted = 0
+        # Names of the agents that ran at least one step
+        self.agents = set()
+        # The budget that ran out first: "steps", "time" or "tokens"
+        self.exhausted = None
+        self._lock = threading.Lock()
+
+    def record(self, memory_step, agent_name):
+        usage = getattr(memory_step, "token_usage", None)
+        with self._lock:
+            self.steps += 1
+            self.agents.add(agent_name)
+            self.tokens += usage.total_tokens if usage is not None else 0
+            if self.exhausted is None:
+                if self.tokens > self.budget.max_tokens:
+                    self.exhausted = "tokens"
+                elif time.perf_counter() > self.deadline:
+                    self.exhausted = "time"
+            return self.exhausted
+
+    def add(self, tokens=0, compacted=0):
+        with self._lock:
+            self.tokens += tokens
+            self.compacted += compacted
+
+    def set_exhausted(self, reason):
+        with self._lock:
+            self.exhausted = self.exhausted or reason
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+
+class BudgetStats:
+    """Process-wide counts of runs, budget hits by reason and compacted steps"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.hits = {"steps": 0, "time": 0, "tokens": 0}
+        self.compacted_steps = 0
+
+    def finish(self, state):
+        with self._lock:
+            self.runs += 1
+            if state.exhausted is not None:
+                # Every budget hit ends with a best-effort answer
+                self.hits[state.exhausted] += 1
+            self.compacted_steps += state.compacted
+
+    def stats(self):
+        with self._lock:
+            hits = sum(self.hits.values())
+            return {
+                "runs": self.runs,
+                "budget_hits": dict(self.hits),
+                "hit_rate": hits / self.runs if self.runs else 0.0,
+                "compacted_steps": self.compacted_steps,
+            }
+
+
+budget_stats = BudgetStats()
+
+
+def current_budget():
+    return _current_budget.get()
+
+
+@contextmanager
+def budget_scope(budget, agent):
+    """Track the spending of the run of ``agent`` (the manager) in the current context"""
+    state = BudgetState(budget, agent)
+    token = _current_budget.set(state)
+    try:
+        yield state
+    finally:
+        _current_budget.reset(token)
+
+
+def _summary(text, limit=BUDGET_SUMMARY_CHARS):
+    text = str(text)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}\n... [{len(text) - limit} more characters summarized away]"
+
+
+def compact_memory(agent, current=None, keep=BUDGET_KEEP_STEPS):
+    """Summarize the action steps of ``agent`` older than the last ``keep``, counting the
+    ``current`` step that is not in memory yet; returns how many were summarized"""
+    from smolagents.memory import ActionStep
+
+    steps = [step for step in agent.memory.steps if isinstance(step, ActionStep)]
+    if current is not None and current not in steps:
+        steps.append(current)
+    compacted = 0
+    for step in steps[:-keep] if keep else steps:
+        if getattr(step, "_compacted", False):
+            continue
+        # The full prompt of each step is kept for replays only, never sent again
+        step.model_input_messages = None
+        if step.model_output is not None:
+            step.model_output = _summary(step.model_output)
+        step.model_output_message = None
+        if step.observations is not None:
+            step.observations = _summary(step.observations)
+        step._compacted = True
+        compacted += 1
+    return compacted
+
+
+def enforce_budget(memory_step, agent=None):
+    """Step callback: count the step against the run's budget, stop the agent once it is spent
+    and compact the agent's memory"""
+    from smolagents.utils import AgentMaxStepsError
+
+    state = current_budget()
+    if state is None or agent is None:
+        return
+    exhausted = state.record(memory_step, agent.name or "manager")
+    if isinstance(memory_step.error, AgentMaxStepsError) and agent is state.agent:
+        # smolagents already asked the manager for a final answer from its memory
+        state.set_exhausted("steps")
+        return
+    state.add(compacted=compact_memory(agent, memory_step))
+    if exhausted is not None and not getattr(memory_step, "is_final_answer", False):
+        print(f"⏱️ DEBUG - {exhausted} budget spent, stopping {agent.name or 'manager'}")
+        agent.interrupt()
+
+
+def install_budget_callbacks(agent):
+    """Register enforce_budget on an agent and, recursively, on its managed agents"""
+    from smolagents.memory import ActionStep
+
+    if not getattr(agent, "_budget_callbacks_installed", False):
+        agent.step_callbacks.register(ActionStep, enforce_budget)
+        agent._budget_callbacks_installed = True
+    for managed_agent in getattr(agent, "managed_agents", {}).values():
+        install_budget_callbacks(managed_agent)
+
+
+def best_effort_answer(agent, task, state):
+    """The manager's answer from what its run gathered before the budget ran out"""
+    message = agent.provide_final_answer(task)
+    usage = getattr(message, "token_usage", None)
+    state.add(tokens=usage.total_tokens if usage is not None else 0)
+    note = {
+        "time": "took longer than the time allowed for this kind of answer",
+        "tokens": "used up the token budget for this kind of answer",
+        "steps": "used up the steps allowed for this kind of answer",
+    }[state.exhausted]
+    return f"*The analysis {note}; this answer is based on what was found so far.*\n\n" + str(
+        message.content
+    )
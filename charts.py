@@ -0,0 +1,340 @@
+"""Deterministic renderers for the common health charts.
+
+Each renderer is a tool taking the data directly (a list of rows, a JSON string,
+or the JSON summaries returned by the analytical tools) and saving a PNG in the
+current run's artifact directory, so standard charts cost no extra LLM calls
+and none of the visual agent's code-writing retries. Figures are built with the
+object-oriented matplotlib API (no pyplot global state, safe across worker
+threads) and fonts are loaded once per process.
+"""
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter, date2num
+from matplotlib.figure import Figure
+from smolagents import tool
+
+from artifacts import current_run_dir
+
+CHART_DPI = int(os.getenv("CHART_DPI", "150"))
+CHART_SIZE = (10, 5)
+
+# Heart rate zones as fractions of the maximum heart rate
+HEART_RATE_ZONES = [
+    ("Zone 1", 0.5, 0.6, "#dbeafe"),
+    ("Zone 2", 0.6, 0.7, "#d1fae5"),
+    ("Zone 3", 0.7, 0.8, "#fef3c7"),
+    ("Zone 4", 0.8, 0.9, "#fed7aa"),
+    ("Zone 5", 0.9, 1.0, "#fecaca"),
+]
+
+# Hypnogram rows, top to bottom
+SLEEP_STAGES = {"awake": 3, "rem": 2, "core": 1, "asleep": 1, "deep": 0}
+SLEEP_STAGE_COLORS = {
+    "awake": "#f97316",
+    "rem": "#38bdf8",
+    "core": "#6366f1",
+    "asleep": "#818cf8",
+    "deep": "#312e81",
+}
+
+ACTIVITY_RINGS = [
+    ("Move", "active_energy_burned", "active_energy_burned_goal", "#ef4444"),
+    ("Exercise", "apple_exercise_time", "apple_exercise_time_goal", "#84cc16"),
+    ("Stand", "apple_stand_hours", "apple_stand_hours_goal", "#06b6d4"),
+]
+
+DATE_COLUMNS = ("date", "start_date", "time", "timestamp", "bucket", "day", "week", "night")
+VALUE_COLUMNS = ("value", "value_numeric", "mean", "bpm", "mean_bpm", "average")
+
+
+@lru_cache(maxsize=1)
+def warm_up():
+    """Load fonts and the Agg canvas once, so the first real chart is not the slow one"""
+    figure = Figure(figsize=(1, 1))
+    figure.add_subplot().set_title("warm up")
+    figure.canvas.draw()
+    return True
+
+
+def _frame(data):
+    """Rows as a DataFrame, from records, a JSON string or an analytical tool summary"""
+    if isinstance(data, str):
+        data = json.loads(data)
+    if isinstance(data, dict) and "error" in data:
+        raise ValueError(data["error"])
+    if isinstance(data, dict) and "per_activity" in data:
+        return (
+            pd.DataFrame.from_dict(data["per_activity"], orient="index")
+            .rename_axis("activity")
+            .reset_index()
+        )
+    if isinstance(data, dict) and "series" in data and "series_columns" in data:
+        return pd.DataFrame(data["series"], columns=data["series_columns"])
+    frame = pd.DataFrame(data)
+    if frame.empty:
+        raise ValueError("No data to plot")
+    return frame
+
+
+def _column(frame, candidates, required=True):
+    columns = {column.lower(): column for column in frame.columns}
+    for candidate in candidates:
+        if candidate in columns:
+            return columns[candidate]
+    if required:
+        raise ValueError(
+            f"Expected one of the columns {list(candidates)}, got {list(frame.columns)}"
+        )
+    return None
+
+
+def _dates(values):
+    # HealthKit timestamps carry a UTC offset; plot them in local wall-clock time
+    return pd.to_datetime(values.astype(str).str.slice(0, 19))
+
+
+def _axes(figure, title, ylabel=None):
+    axes = figure.add_subplot()
+    axes.set_title(title, fontsize=14, fontweight="bold")
+    if ylabel:
+        axes.set_ylabel(ylabel)
+    axes.grid(alpha=0.3)
+    axes.spines[["top", "right"]].set_visible(False)
+    return axes
+
+
+def _date_axis(axes):
+    locator = AutoDateLocator()
+    axes.xaxis.set_major_locator(locator)
+    axes.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+
+
+def _save(figure, filename):
+    directory = current_run_dir()
+    stem, extension = os.path.splitext(filename)
+    path, index = os.path.join(directory, filename), 1
+    while os.path.exists(path):
+        index += 1
+        path = os.path.join(directory, f"{stem}_{index}{extension}")
+    figure.savefig(path, dpi=CHART_DPI)
+    return f"Chart saved as {path}"
+
+
+def _render(render, data, filename, **kwargs):
+    warm_up()
+    try:
+        figure = Figure(figsize=CHART_SIZE, layout="constrained")
+        render(figure, _frame(data), **kwargs)
+        return _save(figure, filename)
+    except Exception as e:
+        return f"Error rendering {filename}: {str(e)}"
+
+
+def _heart_rate(figure, frame, max_heart_rate, title):
+    frame = frame.assign(_time=_dates(frame[_column(frame, DATE_COLUMNS)])).sort_values("_time")
+    value = _column(frame, VALUE_COLUMNS + ("heart_rate",))
+    values = frame[value].astype(float)
+    axes = _axes(figure, title, "Heart rate (bpm)")
+    for name, low, high, color in HEART_RATE_ZONES:
+        axes.axhspan(low * max_heart_rate, high * max_heart_rate, color=color, label=name, zorder=0)
+    minimum = _column(frame, ("minimum", "min"), required=False)
+    maximum = _column(frame, ("maximum", "max"), required=False)
+    if minimum and maximum:
+        axes.fill_between(
+            frame["_time"],
+            frame[minimum],
+            frame[maximum],
+            color="#94a3b8",
+            alpha=0.3,
+            label="Range",
+        )
+        values = pd.concat([values, frame[minimum].astype(float), frame[maximum].astype(float)])
+    axes.plot(frame["_time"], frame[value], color="#dc2626", linewidth=1.5, label="Heart rate")
+    axes.set_ylim(
+        min(values.min(), 0.5 * max_heart_rate) - 5, max(values.max(), max_heart_rate) + 5
+    )
+    _date_axis(axes)
+    axes.legend(loc="upper left", ncols=4, fontsize=8)
+
+
+@tool
+def heart_rate_chart(data: object, max_heart_rate: float = 190.0, title: str = "Heart Rate") -> str:
+    """Line chart of heart rate over time with shaded training zones (50-100% of max heart rate).
+
+    Args:
+        data: Rows with a date/time column and a bpm column ('value', 'mean' or 'bpm'), optional 'minimum'/'maximum'; or a time_bucket_stats result.
+        max_heart_rate: Maximum heart rate used for the zones, e.g. 220 minus the user's age.
+        title: Chart title.
+    """
+    return _render(_heart_rate, data, "heart_rate.png", max_heart_rate=max_heart_rate, title=title)
+
+
+def _stage(value):
+    # HKCategoryValueSleepAnalysisAsleepCore -> core, ...AsleepUnspecified -> asleep
+    name = str(value).lower().replace("hkcategoryvaluesleepanalysis", "")
+    if name.startswith("asleep"):
+        name = name[len("asleep") :]
+        return name if name in SLEEP_STAGES else "asleep"
+    return name
+
+
+def _sleep(figure, frame, title):
+    if _column(frame, ("night",), required=False):
+        # Nightly totals (sleep_stage_totals): stacked hours per stage
+        night = _column(frame, ("night",))
+        axes = _axes(figure, title, "Hours")
+        bottom = np.zeros(len(frame))
+        dates = date2num(_dates(frame[night]))
+        for stage in ("deep", "core", "asleep", "rem", "awake"):
+            if stage in frame.columns:
+                hours = frame[stage].astype(float).to_numpy() / 60
+                # One stepped polygon per stage: hundreds of bar patches are slow to draw
+                axes.fill_between(
+                    dates,
+                    bottom,
+                    bottom + hours,
+                    step="mid",
+                    color=SLEEP_STAGE_COLORS[stage],
+                    label=stage,
+                )
+                bottom += hours
+        axes.xaxis_date()
+        _date_axis(axes)
+        axes.legend(loc="upper left", ncols=5, fontsize=8)
+        return
+    start = _dates(frame[_column(frame, ("start_date", "start"))])
+    end = _dates(frame[_column(frame, ("end_date", "end"))])
+    stages = frame[_column(frame, ("stage", "value"))].map(_stage)
+    axes = _axes(figure, title)
+    for stage, row in SLEEP_STAGES.items():
+        mask = (stages == stage).to_numpy()
+        if mask.any():
+            spans = zip(date2num(start[mask]), (end[mask] - start[mask]) / pd.Timedelta(days=1))
+            axes.broken_barh(list(spans), (row - 0.4, 0.8), color=SLEEP_STAGE_COLORS[stage])
+    axes.set_yticks(sorted(set(SLEEP_STAGES.values())), ["Deep", "Core", "REM", "Awake"])
+    axes.xaxis_date()
+    _date_axis(axes)
+
+
+@tool
+def sleep_hypnogram(data: object, title: str = "Sleep Stages") -> str:
+    """Hypnogram of sleep stages over time, or stacked nightly hours per stage for nightly totals.
+
+    Args:
+        data: Sleep analysis records with 'start_date', 'end_date' and 'value' (stage) columns; or a sleep_stage_totals result.
+        title: Chart title.
+    """
+    return _render(_sleep, data, "sleep_stages.png", title=title)
+
+
+def _activity(figure, frame, title):
+    dates = _dates(frame[_column(frame, ("date_components",) + DATE_COLUMNS)])
+    axes = _axes(figure, title, "% of daily goal")
+    plotted = False
+    for name, value, goal, color in ACTIVITY_RINGS:
+        if value in frame.columns and goal in frame.columns:
+            percent = (
+                100 * frame[value].astype(float) / frame[goal].astype(float).replace(0, np.nan)
+            )
+            axes.plot(dates, percent, color=color, linewidth=1, alpha=0.35)
+            axes.plot(dates, percent.rolling(7, min_periods=1).mean(), color=color, label=name)
+            plotted = True
+    if not plotted:
+        raise ValueError(
+            "Expected activity summary columns such as active_energy_burned and its goal"
+        )
+    axes.axhline(100, color="#0f172a", linestyle="--", linewidth=1, label="Goal")
+    _date_axis(axes)
+    axes.legend(loc="upper left", ncols=4, fontsize=8)
+
+
+@tool
+def activity_rings_chart(data: object, title: str = "Activity Rings") -> str:
+    """Daily Move, Exercise and Stand ring completion (% of goal) over time, with 7-day averages.
+
+    Args:
+        data: activitysummary rows with 'date_components' and the ring columns, e.g. 'active_energy_burned' and 'active_energy_burned_goal'.
+        title: Chart title.
+    """
+    return _render(_activity, data, "activity_rings.png", title=title)
+
+
+def _workouts(figure, frame, metric, title):
+    activity = _column(frame, ("activity", "workout_activity_type", "type"))
+    frame = frame.assign(
+        _activity=frame[activity].astype(str).str.replace("HKWorkoutActivityType", "")
+    )
+    if metric not in frame.columns:
+        # Raw workout rows: aggregate them here
+        if metric == "count":
+            totals = frame.groupby("_activity").size()
+        elif metric == "total_minutes" and "duration" in frame.columns:
+            totals = frame.groupby("_activity")["duration"].sum()
+        else:
+            raise ValueError(f"Unknown metric {metric!r}")
+    else:
+        totals = frame.set_index("_activity")[metric].astype(float)
+    totals = totals.sort_values()
+    axes = _axes(figure, title)
+    bars = axes.barh(totals.index, totals.to_numpy(), color="#8b5cf6")
+    axes.bar_label(bars, fmt="%.0f", padding=3, fontsize=8)
+    axes.set_xlabel(metric.replace("_", " ").capitalize())
+
+
+@tool
+def workout_distribution_chart(data: object, metric: str = "count", title: str = "Workouts") -> str:
+    """Horizontal bar chart of workouts per activity type.
+
+    Args:
+        data: workout rows (with 'workout_activity_type' and 'duration') or a workout_summary result.
+        metric: What to compare: 'count', 'total_minutes', 'average_minutes', 'total_energy' or 'total_distance'.
+        title: Chart title.
+    """
+    return _render(_workouts, data, "workouts.png", metric=metric, title=title)
+
+
+def _hrv(figure, frame, title):
+    frame = frame.assign(_time=_dates(frame[_column(frame, DATE_COLUMNS)])).sort_values("_time")
+    values = frame[_column(frame, VALUE_COLUMNS + ("sdnn", "hrv"))].astype(float)
+    axes = _axes(figure, title, "HRV SDNN (ms)")
+    axes.scatter(frame["_time"], values, s=8, color="#94a3b8", label="Measurements")
+    daily = values.groupby(frame["_time"].dt.normalize().to_numpy()).mean()
+    axes.plot(
+        daily.index, daily.rolling(7, min_periods=1).mean(), color="#0ea5e9", label="7-day average"
+    )
+    if len(daily) > 1:
+        days = (daily.index - daily.index[0]).days.to_numpy()
+        slope, intercept = np.polyfit(days, daily.to_numpy(), 1)
+        axes.plot(
+            daily.index,
+            intercept + slope * days,
+            color="#0f172a",
+            linestyle="--",
+            label=f"Trend ({slope * 30:+.1f} ms/month)",
+        )
+    _date_axis(axes)
+    axes.legend(loc="upper left", fontsize=8)
+
+
+@tool
+def hrv_trend_chart(data: object, title: str = "Heart Rate Variability") -> str:
+    """Heart rate variability (SDNN) measurements with a 7-day average and a linear trend line.
+
+    Args:
+        data: Rows with a date column ('start_date' or 'date') and a value column ('value' or 'mean'); or a time_bucket_stats result.
+        title: Chart title.
+    """
+    return _render(_hrv, data, "hrv_trend.png", title=title)
+
+
+CHART_TOOLS = [
+    heart_rate_chart,
+    sleep_hypnogram,
+    activity_rings_chart,
+    workout_distribution_chart,
+    hrv_trend_chart,
+]
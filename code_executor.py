@@ -0,0 +1,106 @@
+"""Local execution of the agents' code in the context of the run it belongs to.
+
+smolagents runs a CodeAgent's code on a fresh thread so that it can time it
+out, and that thread starts with an empty ``contextvars`` context. Everything
+the app keeps per run in context variables is lost there: the job that
+progress events are reported to, the run directory charts are saved in, the
+trace span new spans nest under and the run's budget, so managed agents (which
+are called from the manager's code) and tools lose them too.
+``ContextPythonExecutor`` runs the code on that thread in a copy of the
+caller's context instead. Build the executor of every CodeAgent with
+``code_executor``.
+
+The code of a step is timed out after ``CODE_TIMEOUT_SECONDS``, or
+``MANAGER_CODE_TIMEOUT_SECONDS`` for the manager, whose code waits for the
+managed agents it calls. Either is cut to what is left of the run's time
+budget, so a step that runs past the deadline fails and the budget callback
+ends the run with a best-effort answer. A timed-out thread cannot be killed:
+its code is stopped at its next operation instead, which only happens once a
+tool or managed agent call in progress returns. Until then the executor is
+``busy`` and the agent pool discards its agent tree rather than reusing it.
+"""
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from smolagents.local_python_executor import (
+    MAX_EXECUTION_TIME_SECONDS,
+    MAX_OPERATIONS,
+    CodeOutput,
+    ExecutionTimeoutError,
+    LocalPythonExecutor,
+    evaluate_python_code,
+)
+
+from budget import current_budget
+
+CODE_TIMEOUT_SECONDS = float(os.getenv("CODE_TIMEOUT_SECONDS", str(MAX_EXECUTION_TIME_SECONDS)))
+MANAGER_CODE_TIMEOUT_SECONDS = float(os.getenv("MANAGER_CODE_TIMEOUT_SECONDS", "300"))
+
+
+class ContextPythonExecutor(LocalPythonExecutor):
+    """LocalPythonExecutor whose code sees the context variables of the calling thread"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Code of the steps that timed out, possibly still running on its abandoned thread
+        self.abandoned = []
+
+    @property
+    def busy(self):
+        """Whether code that timed out is still running"""
+        self.abandoned = [future for future in self.abandoned if not future.done()]
+        return bool(self.abandoned)
+
+    def __call__(self, code_action):
+        timeout_seconds = self._timeout()
+        if timeout_seconds is None:
+            return super().__call__(code_action)
+        context = contextvars.copy_context()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="agent-code")
+        future = executor.submit(context.run, self._evaluate, code_action)
+        try:
+            output, is_final_answer = future.result(timeout=timeout_seconds)
+        except FuturesTimeoutError:
+            # Stop the code at its next operation, and let it finish on its own variables
+            self.state["_operations_count"]["counter"] = MAX_OPERATIONS
+            self.state = dict(self.state)
+            self.abandoned.append(future)
+            raise ExecutionTimeoutError(
+                "Code execution exceeded the maximum execution time of "
+                f"{timeout_seconds:.0f} seconds"
+            )
+        finally:
+            executor.shutdown(wait=False)
+        logs = str(self.state["_print_outputs"])
+        return CodeOutput(output=output, logs=logs, is_final_answer=is_final_answer)
+
+    def _timeout(self):
+        """The executor's timeout, cut to what is left of the run's time budget"""
+        budget = current_budget()
+        if budget is None:
+            return self.timeout_seconds
+        # At least a second, so that a step started past the deadline fails with a timeout
+        remaining = max(budget.deadline - time.perf_counter(), 1.0)
+        return remaining if self.timeout_seconds is None else min(self.timeout_seconds, remaining)
+
+    def _evaluate(self, code_action):
+        return evaluate_python_code(
+            code_action,
+            static_tools=self.static_tools,
+            custom_tools=self.custom_tools,
+            state=self.state,
+            authorized_imports=self.authorized_imports,
+            max_print_outputs_length=self.max_print_outputs_length,
+            # Already on its own thread
+            timeout_seconds=None,
+        )
+
+
+def code_executor(additional_authorized_imports=(), timeout_seconds=CODE_TIMEOUT_SECONDS):
+    """The executor of a CodeAgent; pass it the same imports as the agent"""
+    return ContextPythonExecutor(
+        list(additional_authorized_imports), timeout_seconds=timeout_seconds
+    )
@@ -0,0 +1,441 @@
+"""Streaming importer for Apple Health ``export.xml`` files.
+
+The export is parsed with ``iterparse`` and every top-level element is cleared as
+soon as it has been converted, so memory stays flat regardless of the file size.
+Rows are buffered per table and written with ``executemany``; for a full import
+non-unique indexes are dropped for the duration of the load and rebuilt once at
+the end, while an incremental one keeps them so it costs about as much as the
+new data.
+
+Usage:
+    python health_importer.py export.xml [--db health_data.db] [--incremental]
+"""
+import argparse
+import os
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Float, Integer
+from sqlmodel import SQLModel
+
+import system_info.models  # noqa: F401 - registers the tables on SQLModel.metadata
+from answer_cache import ANSWER_CACHE_PATH, AnswerCache
+from local_sql import HEALTH_DB_PATH, create_database, data_version
+from rollups import ensure_numeric_values, parse_numeric, refresh_rollups
+
+BATCH_SIZE = 50_000
+PROGRESS_EVERY = 500_000
+
+# Columns whose export attribute is not the plain camelCase of the column name
+ATTRIBUTE_OVERRIDES = {"source_url": "sourceURL"}
+
+# (date attribute, table, date column, kind attribute, kind column) used to skip
+# already imported top-level elements in incremental mode. The cutoff is kept per
+# kind (record type, workout activity type): each source syncs on its own schedule,
+# so one metric's latest date says nothing about another's. ActivitySummary rows
+# are deduplicated by their unique date
+INCREMENTAL_DATES = {
+    "Record": ("startDate", "record", "start_date", "type", "type"),
+    "Correlation": ("startDate", "correlation", "start_date", "type", "type"),
+    "Workout": (
+        "startDate", "workout", "start_date", "workoutActivityType", "workout_activity_type"
+    ),
+    "Audiogram": ("startDate", "audiogram", "start_date", "type", "type"),
+    "ClinicalRecord": ("receivedDate", "clinicalrecord", "received_date", "type", "type"),
+    "VisionPrescription": (
+        "dateIssued", "visionprescription", "date_issued", "type", "type"
+    ),
+}
+
+
+def _camel(name):
+    head, *tail = name.split("_")
+    return head + "".join(part.capitalize() for part in tail)
+
+
+def _as_date(value):
+    # "2024-01-31 07:15:02 -0800" -> "2024-01-31 07:15:02" (local time as recorded)
+    return value[:19] if value else None
+
+
+def _as_float(value):
+    return float(value) if value not in (None, "") else None
+
+
+def _as_int(value):
+    return int(float(value)) if value not in (None, "") else None
+
+
+def _as_bool(value):
+    return value.lower() in ("yes", "true", "1") if value else None
+
+
+def _as_str(value):
+    return value
+
+
+def _converter(column):
+    if isinstance(column.type, DateTime):
+        return _as_date
+    if isinstance(column.type, Boolean):
+        return _as_bool
+    if isinstance(column.type, Integer):
+        return _as_int
+    if isinstance(column.type, Float):
+        return _as_float
+    return _as_str
+
+
+class TableSpec:
+    """Column order and attribute converters for one table"""
+
+    def __init__(self, table):
+        self.name = table.name
+        self.columns = [column.name for column in table.columns]
+        self.fields = [
+            (
+                column.name,
+                ATTRIBUTE_OVERRIDES.get(column.name, _camel(column.name)),
+                _converter(column),
+            )
+            for column in table.columns
+        ]
+        placeholders = ", ".join("?" for _ in self.columns)
+        self.insert_sql = (
+            f"INSERT OR IGNORE INTO {self.name} ({', '.join(self.columns)}) "
+            f"VALUES ({placeholders})"
+        )
+
+    def row(self, attrib, fixed):
+        return tuple(
+            fixed[name] if name in fixed else convert(attrib.get(attr))
+            for name, attr, convert in self.fields
+        )
+
+
+class HealthImporter:
+    """Converts export elements into buffered rows and flushes them in batches"""
+
+    def __init__(self, connection, batch_size=BATCH_SIZE, since=None):
+        self.connection = connection
+        self.batch_size = batch_size
+        # {tag: {kind: latest imported date}}; elements at or before it are skipped
+        self.since = since or {}
+        self.specs = {
+            name: TableSpec(table) for name, table in SQLModel.metadata.tables.items()
+        }
+        self.buffers = {name: [] for name in self.specs}
+        self.buffered = 0
+        self.rows = 0
+        self.skipped = 0
+        self.next_ids = {
+            name: connection.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {name}").fetchone()[0]
+            for name, spec in self.specs.items()
+            if "id" in spec.columns
+        }
+        self.health_data_id = None
+        self.earliest_record = None
+        self.started = time.perf_counter()
+        self._last_report = 0
+
+    # -- buffering ---------------------------------------------------------
+
+    def _new_id(self, table):
+        new_id = self.next_ids[table]
+        self.next_ids[table] = new_id + 1
+        return new_id
+
+    def add(self, table, attrib, **fixed):
+        if "id" in self.specs[table].columns and "id" not in fixed:
+            fixed["id"] = self._new_id(table)
+        self.buffers[table].append(self.specs[table].row(attrib, fixed))
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+        return fixed.get("id")
+
+    def flush(self):
+        for table, rows in self.buffers.items():
+            if rows:
+                self.connection.executemany(self.specs[table].insert_sql, rows)
+                rows.clear()
+        self.connection.commit()
+        self.rows += self.buffered
+        self.buffered = 0
+        if self.rows - self._last_report >= PROGRESS_EVERY:
+            self._last_report = self.rows
+            print(f"📥 {self.rows:,} rows imported ({self.rate():,.0f} rows/s)")
+
+    def rate(self):
+        return self.rows / max(time.perf_counter() - self.started, 1e-9)
+
+    # -- element handlers --------------------------------------------------
+
+    def handle(self, elem):
+        tag = elem.tag
+        since = self.since.get(tag)
+        if since:
+            date_attribute, _, _, kind_attribute, _ = INCREMENTAL_DATES[tag]
+            since = since.get(elem.get(kind_attribute))
+        if since and (_as_date(elem.get(date_attribute)) or "") <= since:
+            self.skipped += 1
+            return
+        handler = getattr(self, f"_handle_{tag}", None)
+        if handler is not None:
+            handler(elem)
+
+    def _metadata(self, elem, parent_type, parent_id):
+        for entry in elem.iterfind("MetadataEntry"):
+            self.add(
+                "metadataentry",
+                entry.attrib,
+                parent_type=parent_type,
+                parent_id=parent_id,
+            )
+
+    def _handle_Record(self, elem):
+        record_id = self.add(
+            "record",
+            elem.attrib,
+            value_numeric=parse_numeric(elem.get("value")),
+            health_data_id=self.health_data_id,
+        )
+        start_date = _as_date(elem.get("startDate"))
+        if start_date and (self.earliest_record is None or start_date < self.earliest_record):
+            self.earliest_record = start_date
+        self._metadata(elem, "record", record_id)
+        hrv = elem.find("HeartRateVariabilityMetadataList")
+        if hrv is not None:
+            hrv_id = self.add("heartratevariabilitymetadatalist", hrv.attrib, record_id=record_id)
+            day = (elem.get("startDate") or "")[:10]
+            for reading in hrv.iterfind("InstantaneousBeatsPerMinute"):
+                self.add(
+                    "instantaneousbeatsperminute",
+                    reading.attrib,
+                    time=self._reading_time(day, reading.get("time"), elem),
+                    hrv_list_id=hrv_id,
+                )
+        return record_id
+
+    @staticmethod
+    def _reading_time(day, value, record):
+        # Readings only carry a wall-clock time ("9:41:07.12 PM"); anchor them on the record day
+        for fmt in ("%Y-%m-%d %I:%M:%S.%f %p", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"):
+            try:
+                return datetime.strptime(f"{day} {value}", fmt).strftime("%Y-%m-%d %H:%M:%S.%f")
+            except (TypeError, ValueError):
+                continue
+        return _as_date(record.get("startDate"))
+
+    def _handle_Correlation(self, elem):
+        correlation_id = self.add("correlation", elem.attrib, health_data_id=self.health_data_id)
+        self._metadata(elem, "correlation", correlation_id)
+        for record in elem.iterfind("Record"):
+            record_id = self._handle_Record(record)
+            self.add(
+                "correlationrecord",
+                {},
+                correlation_id=correlation_id,
+                record_id=record_id,
+            )
+
+    def _handle_Workout(self, elem):
+        workout_id = self.add("workout", elem.attrib, health_data_id=self.health_data_id)
+        self._metadata(elem, "workout", workout_id)
+        for event in elem.iterfind("WorkoutEvent"):
+            self.add("workoutevent", event.attrib, workout_id=workout_id)
+        for statistics in elem.iterfind("WorkoutStatistics"):
+            self.add("workoutstatistics", statistics.attrib, workout_id=workout_id)
+        route = elem.find("WorkoutRoute")
+        if route is not None:
+            file_reference = route.find("FileReference")
+            route_id = self.add(
+                "workoutroute",
+                route.attrib,
+                workout_id=workout_id,
+                file_path=file_reference.get("path") if file_reference is not None else None,
+            )
+            self._metadata(route, "workoutroute", route_id)
+
+    def _handle_ActivitySummary(self, elem):
+        self.add("activitysummary", elem.attrib, health_data_id=self.health_data_id)
+
+    def _handle_ClinicalRecord(self, elem):
+        self.add("clinicalrecord", elem.attrib, health_data_id=self.health_data_id)
+
+    def _handle_Audiogram(self, elem):
+        audiogram_id = self.add("audiogram", elem.attrib, health_data_id=self.health_data_id)
+        self._metadata(elem, "audiogram", audiogram_id)
+        for point in elem.iterfind("SensitivityPoint"):
+            self.add("sensitivitypoint", point.attrib, audiogram_id=audiogram_id)
+
+    def _handle_VisionPrescription(self, elem):
+        prescription_id = self.add(
+            "visionprescription", elem.attrib, health_data_id=self.health_data_id
+        )
+        self._metadata(elem, "visionprescription", prescription_id)
+        for tag, side in (("RightEye", "right"), ("LeftEye", "left")):
+            for eye in elem.iterfind(tag):
+                self.add(
+                    "eyeprescription",
+                    eye.attrib,
+                    eye_side=side,
+                    vision_prescription_id=prescription_id,
+                )
+        for attachment in elem.iterfind("Attachment"):
+            self.add("visionattachment", attachment.attrib, vision_prescription_id=prescription_id)
+
+
+def _deferred_indexes():
+    return [
+        index
+        for table in SQLModel.metadata.sorted_tables
+        for index in table.indexes
+        if not index.unique
+    ]
+
+
+def drop_deferred_indexes(connection):
+    """Drop the non-unique indexes before a bulk load"""
+    for index in _deferred_indexes():
+        connection.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+
+def create_deferred_indexes(connection):
+    """(Re)build the non-unique indexes and refresh the planner statistics"""
+    for index in _deferred_indexes():
+        columns = ", ".join(column.name for column in index.columns)
+        connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {index.name} ON {index.table.name} ({columns})"
+        )
+    connection.execute("ANALYZE")
+    connection.commit()
+
+
+def _latest_import_dates(connection):
+    """{tag: {kind: latest stored date}}"""
+    latest = {}
+    for tag, (_, table, column, _, kind) in INCREMENTAL_DATES.items():
+        rows = connection.execute(
+            f"SELECT {kind}, MAX({column}) FROM {table} GROUP BY {kind}"
+        ).fetchall()
+        latest[tag] = {name: value[:19] for name, value in rows if value}
+    return latest
+
+
+def _save_health_data(connection, importer, root_attrib, export_date, me):
+    existing = connection.execute(
+        "SELECT 1 FROM healthdata WHERE id = ?", (importer.health_data_id,)
+    ).fetchone()
+    attrib = {
+        "locale": root_attrib.get("locale", ""),
+        "export_date": _as_date(export_date) or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "date_of_birth": me.get("HKCharacteristicTypeIdentifierDateOfBirth", ""),
+        "biological_sex": me.get("HKCharacteristicTypeIdentifierBiologicalSex", ""),
+        "blood_type": me.get("HKCharacteristicTypeIdentifierBloodType", ""),
+        "fitzpatrick_skin_type": me.get("HKCharacteristicTypeIdentifierFitzpatrickSkinType", ""),
+        "cardio_fitness_medications_use": me.get(
+            "HKCharacteristicTypeIdentifierCardioFitnessMedicationsUse", ""
+        ),
+    }
+    if existing:
+        assignments = ", ".join(f"{name} = ?" for name in attrib)
+        connection.execute(
+            f"UPDATE healthdata SET {assignments} WHERE id = ?",
+            (*attrib.values(), importer.health_data_id),
+        )
+    else:
+        importer.add("healthdata", {}, id=importer.health_data_id, **attrib)
+
+
+def import_export(xml_path, db_path=None, batch_size=BATCH_SIZE, incremental=False):
+    """Stream an Apple Health export into the local database and return load statistics"""
+    db_path = db_path or HEALTH_DB_PATH
+    create_database(db_path).dispose()
+
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("PRAGMA temp_store = MEMORY")
+        connection.execute("PRAGMA cache_size = -200000")
+        ensure_numeric_values(connection)
+
+        since = _latest_import_dates(connection) if incremental else None
+        importer = HealthImporter(connection, batch_size=batch_size, since=since)
+        existing = connection.execute("SELECT MIN(id) FROM healthdata").fetchone()[0]
+        importer.health_data_id = existing or importer._new_id("healthdata")
+
+        if not incremental:
+            drop_deferred_indexes(connection)
+
+        root_attrib = {}
+        export_date = None
+        me = {}
+        depth = 0
+        root = None
+        try:
+            for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+                if event == "start":
+                    if depth == 0:
+                        root = elem
+                        root_attrib = dict(elem.attrib)
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth != 1:
+                    continue
+                if elem.tag == "ExportDate":
+                    export_date = elem.get("value")
+                elif elem.tag == "Me":
+                    me = dict(elem.attrib)
+                else:
+                    importer.handle(elem)
+                # Drop the converted element and its siblings so memory stays bounded
+                root.clear()
+            _save_health_data(connection, importer, root_attrib, export_date, me)
+            importer.flush()
+        finally:
+            # Even a failed load leaves the database with its indexes
+            finalize_started = time.perf_counter()
+            if not incremental:
+                create_deferred_indexes(connection)
+        if importer.earliest_record or not incremental:
+            refresh_rollups(connection, since=importer.earliest_record if incremental else None)
+    finally:
+        connection.close()
+    if os.path.exists(ANSWER_CACHE_PATH):
+        # Answers computed from the previous data are no longer valid
+        AnswerCache().invalidate(data_version(db_path))
+
+    elapsed = time.perf_counter() - importer.started
+    stats = {
+        "rows": importer.rows,
+        "skipped": importer.skipped,
+        "seconds": round(elapsed, 2),
+        "finalize_seconds": round(time.perf_counter() - finalize_started, 2),
+        "rows_per_second": round(importer.rows / max(elapsed, 1e-9)),
+    }
+    print(
+        f"✅ Imported {stats['rows']:,} rows in {stats['seconds']}s "
+        f"({stats['rows_per_second']:,} rows/s, indexes and rollups {stats['finalize_seconds']}s)"
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import an Apple Health export.xml")
+    parser.add_argument("xml_path", help="path to export.xml")
+    parser.add_argument("--db", default=HEALTH_DB_PATH, help="SQLite database to write")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only import entries newer than the latest record already in the database",
+    )
+    args = parser.parse_args()
+    if not os.path.exists(args.xml_path):
+        parser.error(f"{args.xml_path} does not exist")
+    import_export(args.xml_path, args.db, batch_size=args.batch_size, incremental=args.incremental)
@@ -0,0 +1,178 @@
+"""Bounded, fair execution of agent runs off the Gradio event loop.
+
+Agent runs take tens of seconds, so they are submitted as jobs to a fixed pool of
+worker threads instead of running inside the request handler. Pending jobs are
+kept per user and dispatched round-robin, so one user queueing many questions
+cannot starve the others. Step callbacks installed on the agents push real
+progress events to the job that is currently running on the worker thread.
+"""
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+AGENT_CONCURRENCY = int(os.getenv("AGENT_CONCURRENCY", "4"))
+AGENT_QUEUE_LIMIT = int(os.getenv("AGENT_QUEUE_LIMIT", "100"))
+
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when too many jobs are already waiting"""
+
+
+class AgentJob:
+    """One submitted agent run, with its progress events and outcome"""
+
+    def __init__(self, user_id, fn, args, kwargs):
+        self.user_id = user_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.events = queue.Queue()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.finished_at = None
+        # Set by streaming runs when the first token of the final answer is generated
+        self.first_token_at = None
+        # Set when a budget ran out and the answer is only the best the run could give
+        self.best_effort = False
+
+    def report(self, **event):
+        self.events.put(event)
+
+    def drain_events(self):
+        """Return the progress events received since the last call"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    @property
+    def wait_time(self):
+        return (self.started_at or time.perf_counter()) - self.submitted_at
+
+    def _run(self):
+        self.started_at = time.perf_counter()
+        token = _current_job.set(self)
+        try:
+            self.result = self.fn(*self.args, **self.kwargs)
+        except Exception as e:
+            self.error = e
+        finally:
+            _current_job.reset(token)
+            self.finished_at = time.perf_counter()
+            self.done.set()
+
+
+def current_job():
+    """The job running on the calling worker thread, if any"""
+    return _current_job.get()
+
+
+class FairJobQueue:
+    """Worker pool with per-user round-robin dispatch of pending jobs"""
+
+    def __init__(self, workers=AGENT_CONCURRENCY, max_pending=AGENT_QUEUE_LIMIT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = OrderedDict()  # user_id -> deque of jobs, in round-robin order
+        self._condition = threading.Condition()
+        self.running = 0
+        self.completed = 0
+        self._total_wait = 0.0
+        for index in range(workers):
+            threading.Thread(target=self._worker, name=f"agent-worker-{index}", daemon=True).start()
+
+    def submit(self, user_id, fn, *args, **kwargs):
+        job = AgentJob(user_id, fn, args, kwargs)
+        with self._condition:
+            if self.pending >= self.max_pending:
+                raise QueueFullError(
+                    f"{self.pending} analyses are already waiting, please try again shortly."
+                )
+            self._pending.setdefault(user_id, deque()).append(job)
+            self._condition.notify()
+        return job
+
+    @property
+    def pending(self):
+        return sum(len(jobs) for jobs in self._pending.values())
+
+    def position(self, job):
+        """Number of jobs that will be dispatched before ``job`` (0 once it started)"""
+        with self._condition:
+            queues = list(self._pending.values())
+            for index, user_jobs in enumerate(queues):
+                if job in user_jobs:
+                    rank = user_jobs.index(job)
+                    # Users ahead in the round-robin order get one more turn than the ones after
+                    before = sum(min(len(other), rank + 1) for other in queues[:index])
+                    after = sum(min(len(other), rank) for other in queues[index + 1 :])
+                    return rank + before + after
+            return 0
+
+    def _next_job(self):
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            user_id, user_jobs = next(iter(self._pending.items()))
+            job = user_jobs.popleft()
+            del self._pending[user_id]
+            if user_jobs:
+                # Move this user to the back of the round-robin order
+                self._pending[user_id] = user_jobs
+            self.running += 1
+            return job
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            job._run()
+            with self._condition:
+                self.running -= 1
+                self.completed += 1
+                self._total_wait += job.wait_time
+
+    def stats(self):
+        with self._condition:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "pending": self.pending,
+                "completed": self.completed,
+                "average_wait": self._total_wait / self.completed if self.completed else 0.0,
+            }
+
+
+def report_progress(memory_step, agent=None):
+    """Step callback forwarding agent steps to the job running on this thread"""
+    job = current_job()
+    if job is None:
+        return
+    tool_calls = getattr(memory_step, "tool_calls", None) or []
+    timing = getattr(memory_step, "timing", None)
+    job.report(
+        agent=getattr(agent, "name", None) or "manager",
+        step=getattr(memory_step, "step_number", None),
+        tools=[call.name for call in tool_calls],
+        duration=getattr(timing, "duration", None),
+    )
+
+
+def install_progress_callbacks(agent):
+    """Register report_progress on an agent and, recursively, on its managed agents"""
+    from smolagents.memory import ActionStep
+
+    if not getattr(agent, "_progress_callbacks_installed", False):
+        agent.step_callbacks.register(ActionStep, report_progress)
+        agent._progress_callbacks_installed = True
+    for managed_agent in getattr(agent, "managed_agents", {}).values():
+        install_progress_callbacks(managed_agent)
@@ -0,0 +1,184 @@
+"""Shared LLM clients for every agent.
+
+All agents used to build their own ``LiteLLMModel`` at import time, which also
+imported litellm (several seconds) before the UI could start, and all of them
+used the same large model. Models are now created once per tier, on first use:
+``get_model(agent)`` returns the model of the agent's tier (``AGENT_TIERS``,
+overridable with ``LLM_TIER_<AGENT>``), so one-step web searches and SQL
+lookups run on the small model. Every model shares one pooled HTTP client that
+keeps connections to the provider alive between calls, and every call is
+admitted (and retried when rate limited) by the scheduler of its model in
+``scheduler.py``. The static system prompts are marked for Anthropic prompt
+caching, so the steps after the first one read them from the cache.
+"""
+import os
+import threading
+
+LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "anthropic/claude-sonnet-4-20250514")
+LLM_SMALL_MODEL_ID = os.getenv("LLM_SMALL_MODEL_ID", "anthropic/claude-haiku-4-5-20251001")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
+# Model requests in flight at once to each model, across all agents
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+# Idle connections to the provider are kept open this long for the next request
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "120"))
+LLM_PROMPT_CACHING = os.getenv("LLM_PROMPT_CACHING", "1") == "1"
+
+MODEL_TIERS = {"large": LLM_MODEL_ID, "small": LLM_SMALL_MODEL_ID}
+# The tier of each agent; agents not listed use the large model
+AGENT_TIERS = {
+    "manager": "large",
+    "visual_agent": "large",
+    "sql_query_agent_health": "small",
+    "web_search_agent": "small",
+}
+
+_models = {}
+_override = None
+_model_lock = threading.Lock()
+_http_client = None
+# Prompt-cache reads reported at the end of the response streamed on this thread
+_stream_cache_reads = threading.local()
+
+
+def agent_tier(agent):
+    tier = os.getenv(f"LLM_TIER_{agent.upper()}", AGENT_TIERS.get(agent, "large"))
+    if tier not in MODEL_TIERS:
+        raise ValueError(
+            f"Unknown model tier {tier!r} for {agent} (expected one of {list(MODEL_TIERS)})"
+        )
+    return tier
+
+
+def get_http_client():
+    """The pooled HTTP client shared by every model, created on first use"""
+    connections = LLM_MAX_CONCURRENCY * len(set(MODEL_TIERS.values()))
+    global _http_client
+    if _http_client is None:
+        import httpx
+        from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+        _http_client = HTTPHandler(
+            client=httpx.Client(
+                timeout=LLM_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=connections,
+                    max_keepalive_connections=connections,
+                    keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+                ),
+            )
+        )
+    return _http_client
+
+
+def cached_input_tokens(usage):
+    """Input tokens read from the provider's prompt cache, from a litellm usage, or None"""
+    cached = getattr(usage, "cache_read_input_tokens", None)
+    if cached is None:
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    return cached if isinstance(cached, int) else None
+
+
+def _usage(message, cached=None):
+    """(input, output) tokens of a response as the rate limits count them: prompt-cache reads
+    do not count towards the input tokens per minute"""
+    usage = getattr(message, "token_usage", None)
+    if usage is None:
+        return None
+    if cached is None:
+        cached = cached_input_tokens(getattr(getattr(message, "raw", None), "usage", None))
+    return usage.input_tokens - (cached or 0), usage.output_tokens
+
+
+class _StreamUsageClient:
+    """litellm as a model's client, noting the prompt-cache reads of streamed responses, which
+    smolagents leaves out of the stream's token usage"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def completion(self, *args, **kwargs):
+        response = self._client.completion(*args, **kwargs)
+        return self._record(response) if kwargs.get("stream") else response
+
+    @staticmethod
+    def _record(chunks):
+        for chunk in chunks:
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                _stream_cache_reads.tokens = cached_input_tokens(usage)
+            yield chunk
+
+
+def _schedule(model):
+    """Admit the model's calls through its scheduler, which also retries rate limits"""
+    from scheduler import get_scheduler
+    from tracing import current_span
+
+    def admitted(attempt):
+        span = current_span()
+        if span is not None:
+            span.set(queue_ms=attempt.queue_seconds * 1000, retries=attempt.number or None)
+
+    generate = model.generate
+
+    def scheduled_generate(messages, *args, **kwargs):
+        for attempt in get_scheduler(model.model_id).attempts(messages):
+            with attempt:
+                admitted(attempt)
+                response = generate(messages, *args, **kwargs)
+                attempt.usage = _usage(response)
+        return response
+
+    generate_stream = model.generate_stream
+
+    def scheduled_generate_stream(messages, *args, **kwargs):
+        for attempt in get_scheduler(model.model_id).attempts(messages):
+            with attempt:
+                admitted(attempt)
+                _stream_cache_reads.tokens = None
+                for delta in generate_stream(messages, *args, **kwargs):
+                    attempt.usage = _usage(delta, _stream_cache_reads.tokens) or attempt.usage
+                    attempt.delivered = attempt.delivered or bool(delta.content)
+                    yield delta
+
+    model.generate = scheduled_generate
+    model.generate_stream = scheduled_generate_stream
+
+
+def create_model(model_id):
+    from smolagents import LiteLLMModel
+
+    kwargs = {}
+    if LLM_PROMPT_CACHING and model_id.startswith("anthropic/"):
+        # The system prompt is the same on every step of an agent. Memory is not cached:
+        # compaction rewrites older steps, which would invalidate the cached prefix
+        kwargs["cache_control_injection_points"] = [{"location": "message", "role": "system"}]
+    # Rate limits are retried by the scheduler, which knows about every agent's calls
+    model = LiteLLMModel(model_id=model_id, temperature=LLM_TEMPERATURE, retry=False, **kwargs)
+    # Forwarded to every litellm.completion call; the constructor's ``client`` is litellm itself
+    model.kwargs["client"] = get_http_client()
+    model.client = _StreamUsageClient(model.client)
+    _schedule(model)
+    return model
+
+
+def get_model(agent="manager"):
+    """The model of ``agent``'s tier, created on first use and shared by the agents of that tier"""
+    with _model_lock:
+        if _override is not None:
+            return _override
+        tier = agent_tier(agent)
+        if tier not in _models:
+            _models[tier] = create_model(MODEL_TIERS[tier])
+        return _models[tier]
+
+
+def set_model(model):
+    """Use ``model`` for every agent built from now on, e.g. a scripted model in benchmarks"""
+    global _override
+    with _model_lock:
+        _override = model
@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+from smolagents import tool
+from sqlalchemy.pool import QueuePool
+from sqlmodel import SQLModel, create_engine
+
+HEALTH_DB_PATH = os.getenv(
+    "HEALTH_DB_PATH", os.path.join(os.path.dirname(__file__), "health_data.db")
+)
+POOL_SIZE = int(os.getenv("HEALTH_DB_POOL_SIZE", "4"))
+# Hard caps on what a single query hands back to an agent prompt
+MAX_RESULT_ROWS = int(os.getenv("HEALTH_SQL_MAX_ROWS", "200"))
+MAX_RESULT_BYTES = int(os.getenv("HEALTH_SQL_MAX_BYTES", "20000"))
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(db_path=None, read_only=True):
+    """Return a pooled engine for the local health database (one per path/mode)"""
+    db_path = os.path.abspath(db_path or HEALTH_DB_PATH)
+    key = (db_path, read_only)
+    # Concurrent first requests must share one engine (and its pool), not race to build several
+    with _engines_lock:
+        if key not in _engines:
+            if read_only:
+                if not os.path.exists(db_path):
+                    raise FileNotFoundError(
+                        f"Local health database not found at {db_path}. "
+                        "Import an Apple Health export first or set HEALTH_DB_PATH."
+                    )
+                url = f"sqlite:///file:{db_path}?mode=ro&uri=true"
+            else:
+                url = f"sqlite:///{db_path}"
+            _engines[key] = create_engine(
+                url,
+                poolclass=QueuePool,
+                pool_size=POOL_SIZE,
+                max_overflow=POOL_SIZE,
+                connect_args={"check_same_thread": False},
+            )
+        return _engines[key]
+
+
+def create_database(db_path=None):
+    """Create every table of the SQLModel schema in the local database"""
+    import system_info.models  # noqa: F401 - registers the tables on SQLModel.metadata
+
+    engine = get_engine(db_path, read_only=False)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def data_version(db_path=None):
+    """Version stamp of the local database that changes whenever data is written"""
+    db_path = os.path.abspath(db_path or HEALTH_DB_PATH)
+    stamps = []
+    for path in (db_path, db_path + "-wal"):
+        if os.path.exists(path):
+            stat = os.stat(path)
+            # Readers only create an empty WAL file (and remove it when the last one closes);
+            # once it holds frames, only writers touch it. Its size alone is not enough: after a
+            # checkpoint, writers restart it from the top without shrinking it
+            if stat.st_size:
+                stamps.append(f"{stat.st_mtime_ns}-{stat.st_size}")
+    return "local:" + (":".join(stamps) or "missing")
+
+
+def run_query(sql_query, db_path=None, max_rows=None):
+    """Execute a query on the local database and return (up to max_rows) rows as dicts"""
+    with get_engine(db_path).connect() as connection:
+        result = connection.exec_driver_sql(sql_query)
+        if not result.returns_rows:
+            return []
+        rows = result.fetchmany(max_rows) if max_rows else result.fetchall()
+        return [dict(row._mapping) for row in rows]
+
+
+@tool
+def health_data_real_mcp_execute_sql_query(sql_query: str) -> str:
+    """Executes a read-only SQL query on the personal Apple Health database and returns the rows.
+
+    Args:
+        sql_query: The SQLite query to execute.
+
+    Returns:
+        The resulting rows as a JSON list of objects, or an error message if the query fails.
+    """
+    try:
+        rows = run_query(sql_query, max_rows=MAX_RESULT_ROWS + 1)
+        truncated = len(rows) > MAX_RESULT_ROWS
+        text = json.dumps(rows[:MAX_RESULT_ROWS], default=str)
+        if truncated or len(text) > MAX_RESULT_BYTES:
+            return (
+                f"{text[:MAX_RESULT_BYTES]}\n[Result truncated to {MAX_RESULT_ROWS} rows / "
+                f"{MAX_RESULT_BYTES} bytes: aggregate in SQL or use the analytical tools instead]"
+            )
+        return text
+    except Exception as e:
+        return f"Error executing SQL query: {str(e)}"
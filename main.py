@@ -1,45 +1,58 @@
 import gradio as gr
+import asyncio
+import contextlib
+import html
 import os
+import threading
+import time
+import uuid
 from pathlib import Path
-from multi_agent import create_main_agent
-from smolagents import MCPClient
-from sql_agent import SERVER_PARAMETERS
-import base64
+from sql_agent import SQL_BACKEND, get_sql_tools, health_data_version, get_mcp_manager
+from answer_cache import create_answer_cache
+from job_queue import FairJobQueue, current_job, install_progress_callbacks
+from agent_pool import AgentPool
+from budget import (
+    RESPONSE_BUDGETS,
+    best_effort_answer,
+    budget_scope,
+    budget_stats,
+    install_budget_callbacks,
+)
+from artifacts import ARTIFACTS_URL_PREFIX, artifact_registry, artifact_routes
+from router import (
+    SQL_AGENT_NAME,
+    SQL_ROUTE_INSTRUCTIONS,
+    answer_with_tool,
+    route_question,
+    router_stats,
+)
+from scheduler import PRIORITIES, request_priority, scheduler_stats
+from streaming import STREAM_ANSWERS, run_streaming
+from tracing import install_tracing, tracer
+
+# Build the agents and load the chart fonts in the background when the server starts
+AGENT_WARM_UP = os.getenv("AGENT_WARM_UP", "1") == "1"
 
 RESPONSE_INSTRUCTIONS = {
     "Short Answer": "Provide a short, concise answer to the user's question.",
     "Detailed Report": """
-1. Use the sql_query_agent_health managed agent to get a detailed view of the user's health data.
-2. Use the web search managed agent to include benchmark comparisons to the general population and other relevant data.
-3. Use the visual_agent to create a visualization to help the user understand the data.
+1. Use the sql_query_agent_health managed agent to get a detailed view of the user's health data, including their date_of_birth and biological_sex.
+2. Include benchmark comparisons to the general population from lookup_reference_norms (by metric, age and biological sex).
+   Only use the web search managed agent for benchmarks or other relevant data it does not cover; such searches are
+   independent of step 1, so run them together with run_parallel.
+3. Create a visualization to help the user understand the data (chart tools first, otherwise the visual_agent).
 """,
 }
 
+answer_cache = create_answer_cache()
 
-def chat_with_agent(message, history, response_mode):
-    """
-    Simple chat function that runs the user's query through the multi-agent system
-    """
-    if not message.strip():
-        return history, ""
+PROGRESS_POLL_INTERVAL = 0.25
+# Shorter while the final answer is streaming in
+STREAM_POLL_INTERVAL = 0.05
+STREAM_CURSOR = " ▌"
 
-    # Add user message to history
-    history = history + [
-        {"role": "user", "content": message},
-        {"role": "assistant", "content": None},
-    ]
 
-    try:
-        # Step 1: Starting analysis with animation
-        history[-1]["content"] = """
-        <div style="text-align: center; padding: 3rem; background: linear-gradient(135deg, #f0f9ff 0%, #e0f2fe 100%); border-radius: 16px; margin: 1rem 0;">
-            <div style="display: inline-block; position: relative;">
-                <div style="font-size: 4rem; animation: bounce 1s ease-in-out infinite;">🚀</div>
-                <div style="position: absolute; bottom: -10px; left: 50%; transform: translateX(-50%); width: 60px; height: 4px; background: #6366f1; border-radius: 2px; animation: pulse 1s ease-in-out infinite;"></div>
-            </div>
-            <h2 style="margin-top: 2rem; color: #1e293b;">Initializing Health Analysis</h2>
-            <p style="color: #64748b;">Preparing to analyze your health data...</p>
-        </div>
+PROGRESS_ANIMATIONS = """
         <style>
             @keyframes bounce {
                 0%, 100% { transform: translateY(0); }
@@ -51,91 +64,266 @@ def chat_with_agent(message, history, response_mode):
             }
         </style>
         """
-        yield history, ""
 
-        # Step 2: Searching database
-        history[-1]["content"] = """
-        <div style="text-align: center; padding: 3rem; background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%); border-radius: 16px; margin: 1rem 0;">
-            <div style="display: inline-block; position: relative;">
-                <div style="font-size: 4rem; animation: bounce 1s ease-in-out infinite;">🔍</div>
-                <div style="position: absolute; bottom: -10px; left: 50%; transform: translateX(-50%); width: 60px; height: 4px; background: #f59e0b; border-radius: 2px; animation: pulse 1s ease-in-out infinite;"></div>
-            </div>
-            <h2 style="margin-top: 2rem; color: #1e293b;">Searching Health Database</h2>
-            <p style="color: #64748b;">Querying your health records and metrics...</p>
-        </div>
-        """
-        yield history, ""
+# Progress card (icon, title, subtitle, gradient start, gradient end, accent) per running agent
+PROGRESS_STAGES = {
+    "queued": ("⏳", "Waiting for an Available Analyst", "{detail}", "#f1f5f9", "#e2e8f0", "#64748b"),
+    "start": ("🚀", "Initializing Health Analysis", "Preparing to analyze your health data...", "#f0f9ff", "#e0f2fe", "#6366f1"),
+    "sql_query_agent_health": ("🔍", "Searching Health Database", "Querying your health records and metrics... {detail}", "#fef3c7", "#fde68a", "#f59e0b"),
+    "web_search_agent": ("🌐", "Researching Benchmarks", "Looking up reference values for comparison... {detail}", "#e0f2fe", "#bae6fd", "#0ea5e9"),
+    "visual_agent": ("📊", "Creating Visualizations", "Generating charts and visual insights... {detail}", "#d1fae5", "#a7f3d0", "#10b981"),
+    "manager": ("🧠", "Analyzing Health Patterns", "Processing data and generating insights... {detail}", "#ede9fe", "#ddd6fe", "#8b5cf6"),
+}
 
-        # Step 3: Analyzing data
-        history[-1]["content"] = """
-        <div style="text-align: center; padding: 3rem; background: linear-gradient(135deg, #ede9fe 0%, #ddd6fe 100%); border-radius: 16px; margin: 1rem 0;">
-            <div style="display: inline-block; position: relative;">
-                <div style="font-size: 4rem; animation: bounce 1s ease-in-out infinite;">🧠</div>
-                <div style="position: absolute; bottom: -10px; left: 50%; transform: translateX(-50%); width: 60px; height: 4px; background: #8b5cf6; border-radius: 2px; animation: pulse 1s ease-in-out infinite;"></div>
-            </div>
-            <h2 style="margin-top: 2rem; color: #1e293b;">Analyzing Health Patterns</h2>
-            <p style="color: #64748b;">Processing data and generating insights...</p>
-        </div>
-        """
-        yield history, ""
+job_queue = FairJobQueue()
 
-        # Add mode instruction to the message
-        modified_message = f"{message}\n\n{RESPONSE_INSTRUCTIONS[response_mode]}"
-
-        # Debug: Print the modified message
-        print(f"\n🔍 DEBUG - Modified message being sent to manager_agent:")
-        print(f"{modified_message}\n")
-
-        # Run the user's query directly through the manager agent
-        try:
-            result = demo.manager_agent.run(modified_message)
-            print(f"\n✅ DEBUG - Manager agent returned result of type: {type(result)}")
-            print(f"Result preview: {str(result)[:200]}...\n")
-        except Exception as e:
-            print(f"\n❌ DEBUG - Manager agent error: {str(e)}")
-            raise
-
-        # Step 4: Creating visualizations
-        history[-1]["content"] = """
-        <div style="text-align: center; padding: 3rem; background: linear-gradient(135deg, #d1fae5 0%, #a7f3d0 100%); border-radius: 16px; margin: 1rem 0;">
+
+def progress_card(stage, detail="", thought=""):
+    icon, title, subtitle, start, end, accent = PROGRESS_STAGES.get(stage, PROGRESS_STAGES["manager"])
+    # The manager's reasoning for its current step, as it streams in
+    thought_html = (
+        f'<p style="color: #475569; font-style: italic; max-width: 40rem; margin: 1rem auto 0;">{html.escape(thought[-300:])}</p>'
+        if thought
+        else ""
+    )
+    return f"""
+        <div style="text-align: center; padding: 3rem; background: linear-gradient(135deg, {start} 0%, {end} 100%); border-radius: 16px; margin: 1rem 0;">
             <div style="display: inline-block; position: relative;">
-                <div style="font-size: 4rem; animation: bounce 1s ease-in-out infinite;">📊</div>
-                <div style="position: absolute; bottom: -10px; left: 50%; transform: translateX(-50%); width: 60px; height: 4px; background: #10b981; border-radius: 2px; animation: pulse 1s ease-in-out infinite;"></div>
+                <div style="font-size: 4rem; animation: bounce 1s ease-in-out infinite;">{icon}</div>
+                <div style="position: absolute; bottom: -10px; left: 50%; transform: translateX(-50%); width: 60px; height: 4px; background: {accent}; border-radius: 2px; animation: pulse 1s ease-in-out infinite;"></div>
             </div>
-            <h2 style="margin-top: 2rem; color: #1e293b;">Creating Visualizations</h2>
-            <p style="color: #64748b;">Generating charts and visual insights...</p>
+            <h2 style="margin-top: 2rem; color: #1e293b;">{title}</h2>
+            <p style="color: #64748b;">{subtitle.format(detail=detail)}</p>
+            {thought_html}
         </div>
+        {PROGRESS_ANIMATIONS}
         """
-        yield history, ""
 
-        # Check if any image files were created
-        image_files = []
-        for ext in ["*.png", "*.jpg", "*.jpeg", "*.svg", "*.pdf"]:
-            image_files.extend(Path(".").glob(ext))
 
-        # Prepare final response with inline image
-        final_response = result
+def run_manager_agent(
+    modified_message, run_id, session_id, response_mode="Short Answer", route="manager"
+):
+    """Runs on a job-queue worker thread; charts are saved in the run's own directory.
+    The "sql" route runs the SQL agent of a pooled manager instead of the manager itself"""
+    from smolagents.utils import AgentError
+
+    with tracer.span("run", "run", run_id=run_id, session_id=session_id, route=route) as span:
+        with artifact_registry.run(run_id, session_id):
+            with demo.agent_pool.checkout() as manager_agent:
+                span.set(pool_wait_ms=(time.time_ns() - span.start_time) / 1e6)
+                agent = manager_agent
+                if route == "sql":
+                    agent = manager_agent.managed_agents[SQL_AGENT_NAME]
+                budget = RESPONSE_BUDGETS[response_mode]
+                priority = request_priority(PRIORITIES[response_mode])
+                with budget_scope(budget, agent) as spent, priority:
+                    try:
+                        result = _run_within_budget(agent, modified_message, span, budget)
+                    except AgentError:
+                        # The agents were interrupted because a budget ran out
+                        if spent.exhausted is None:
+                            raise
+                        result = best_effort_answer(agent, modified_message, spent)
+                        job = current_job()
+                        if job is not None:
+                            job.best_effort = True
+                    finally:
+                        budget_stats.finish(spent)
+                        router_stats.record(
+                            route,
+                            response_mode,
+                            spent.elapsed,
+                            model_calls=spent.steps,
+                            hops=len(spent.agents),
+                        )
+                        span.set(
+                            budget_hit=spent.exhausted,
+                            budget_tokens=spent.tokens,
+                            model_calls=spent.steps,
+                            agent_hops=len(spent.agents),
+                            compacted_steps=spent.compacted,
+                        )
+                return result
+
+
+def run_tool_route(route, message, run_id, session_id, response_mode="Short Answer"):
+    """Answer from a canned analytical tool, or from the SQL agent when it has no data"""
+    with tracer.span("run", "run", run_id=run_id, session_id=session_id, route="tool") as span:
+        start = time.perf_counter()
+        answer = answer_with_tool(route)
+        span.set(intent=route.intent, model_calls=0, agent_hops=0, no_data=answer is None)
+    if answer is None:
+        return run_manager_agent(
+            f"{message}\n\n{SQL_ROUTE_INSTRUCTIONS}", run_id, session_id, response_mode, "sql"
+        )
+    router_stats.record("tool", response_mode, time.perf_counter() - start)
+    return answer
+
+
+def _run_within_budget(agent, modified_message, span, budget):
+    job = current_job()
+    if not STREAM_ANSWERS or job is None or not agent.stream_outputs:
+        return agent.run(modified_message, max_steps=budget.max_steps)
+    result, job.first_token_at = run_streaming(
+        agent,
+        modified_message,
+        lambda **event: job.report(agent="manager", stream=True, **event),
+        max_steps=budget.max_steps,
+    )
+    if job.first_token_at is not None:
+        # From submission, like the latency the user sees, so queueing is included
+        span.set(time_to_first_token_ms=(job.first_token_at - job.submitted_at) * 1000)
+    return result
+
+
+def cached_answer(message, response_mode, data_version):
+    """The cached answer to ``message``, or None; the cache is best-effort, so a failing lookup
+    (e.g. of the embedding model) only means a miss"""
+    try:
+        return answer_cache.get(message, response_mode, data_version)
+    except Exception as e:
+        print(f"⚠️  Answer cache lookup failed: {e}")
+        return None
+
+
+def cache_answer(message, response_mode, data_version, answer):
+    try:
+        answer_cache.put(message, response_mode, data_version, answer)
+    except Exception as e:
+        print(f"⚠️  Could not cache the answer: {e}")
+
 
-        if image_files:
-            latest_image = max(image_files, key=os.path.getctime)
-            image_path = str(latest_image)
+async def chat_with_agent(message, history, response_mode, user_id="anonymous"):
+    """
+    Simple chat function that runs the user's query through the multi-agent system
+    """
+    if not message.strip():
+        yield history, ""
+        return
 
-            # Create HTML img tag for inline display
-            try:
-                # Convert image to base64 for inline display
-                with open(image_path, "rb") as img_file:
-                    img_data = base64.b64encode(img_file.read()).decode()
-                    img_html = f'<img src="data:image/png;base64,{img_data}" style="max-width: 100%; height: auto; margin: 10px 0; border-radius: 8px;">'
+    # Add user message to history
+    history = history + [
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": None},
+    ]
 
-                final_response += f"\n\n📊 I've created a visualization:\n\n{img_html}"
-            except Exception as e:
-                final_response += (
-                    f"\n\n📊 I've created a visualization saved as: {latest_image.name}"
-                )
+    try:
+        # Repeat questions on unchanged data are answered from the cache
+        data_version = health_data_version()
+        # Off the event loop: the lookup may call the embedding model
+        cached_response = await asyncio.to_thread(
+            cached_answer, message, response_mode, data_version
+        )
+        if cached_response is not None:
+            print(f"\n💾 DEBUG - Answer cache hit (stats: {answer_cache.stats()})")
+            router_stats.record("cache", response_mode, 0.0)
+            history[-1]["content"] = cached_response
+            yield history, ""
+            return
+
+        # Short lookups skip the manager (and the model, for the canned tools)
+        route = route_question(message, response_mode)
+        print(f"\n🧭 DEBUG - {route}")
+        requested_at = time.perf_counter()
+        run_id = uuid.uuid4().hex
+        if route.kind == "tool":
+            job = job_queue.submit(
+                user_id, run_tool_route, route, message, run_id, user_id, response_mode
+            )
+        else:
+            # Add mode instruction to the message
+            instructions = RESPONSE_INSTRUCTIONS[response_mode]
+            if route.kind == "sql":
+                instructions = SQL_ROUTE_INSTRUCTIONS
+            modified_message = f"{message}\n\n{instructions}"
+
+            # Debug: Print the modified message
+            print(f"\n🔍 DEBUG - Modified message being sent to the {route.kind} agent:")
+            print(f"{modified_message}\n")
+
+            # Run the user's query on a worker thread and stream its real progress
+            job = job_queue.submit(
+                user_id,
+                run_manager_agent,
+                modified_message,
+                run_id,
+                user_id,
+                response_mode,
+                route.kind,
+            )
+        stage, detail, thought, answer, last_content = None, "", "", None, None
+        while not job.done.is_set():
+            events = job.drain_events()
+            for event in events:
+                if event.get("stream"):
+                    thought, answer = event["thought"], event["answer"]
+                else:
+                    stage = event["agent"]
+                    detail = f"(step {event['step']})" if event.get("step") else ""
+                    if stage == "manager":
+                        # A manager step ended without finishing the run
+                        thought, answer = "", None
+            if not events and job.started_at is None:
+                stage = "queued"
+                ahead = job_queue.position(job)
+                detail = f"{ahead} request(s) ahead of you" if ahead else "Starting shortly..."
+            elif stage in (None, "queued"):
+                stage, detail = "start", ""
+            # The final answer replaces the progress card as soon as its first words are written
+            content = answer + STREAM_CURSOR if answer else progress_card(stage, detail, thought)
+            if content != last_content:
+                last_content = content
+                history[-1]["content"] = content
+                yield history, ""
+            await asyncio.sleep(STREAM_POLL_INTERVAL if answer else PROGRESS_POLL_INTERVAL)
+
+        if job.error is not None:
+            print(f"\n❌ DEBUG - Manager agent error: {str(job.error)}")
+            raise job.error
+        result = job.result
+        print(f"\n✅ DEBUG - Manager agent returned result of type: {type(result)}")
+        print(f"Result preview: {str(result)[:200]}...")
+        if job.first_token_at is not None:
+            print(
+                f"⏱️ DEBUG - First answer token after {job.first_token_at - requested_at:.1f}s, "
+                f"answer complete after {time.perf_counter() - requested_at:.1f}s"
+            )
+        from sql_cache import sql_result_cache
+        from tool import fetch_stats
+
+        print(f"SQL result cache: {sql_result_cache.stats()}")
+        print(f"Job queue: {job_queue.stats()} (waited {job.wait_time:.1f}s)")
+        print(f"Agent pool: {demo.agent_pool.stats()}")
+        print(f"Budgets: {budget_stats.stats()}")
+        print(f"Routes: {router_stats.stats()}")
+        print(f"Model schedulers: {scheduler_stats()}")
+        print(f"Artifacts: {artifact_registry.stats()}")
+        print(f"Web fetches: {fetch_stats.stats()}")
+        if SQL_BACKEND == "mcp":
+            print(f"MCP tool calls: {get_mcp_manager().stats()}")
+        print()
+
+        # Prepare final response with the chart this run created, if any
+        final_response = str(result)
+        latest_image = artifact_registry.latest_image(run_id)
+
+        if latest_image is not None:
+            # Inline the downscaled preview by URL, linking to the full-resolution file
+            img_html = f'<a href="{latest_image.url}" target="_blank"><img src="{latest_image.preview_url}" alt="{latest_image.name}" style="max-width: 100%; height: auto; margin: 10px 0; border-radius: 8px;"></a>'
+            download_html = f'<a href="{latest_image.url}" download="{latest_image.name}">Download full resolution</a>'
+            final_response += (
+                f"\n\n📊 I've created a visualization:\n\n{img_html}\n\n{download_html}"
+            )
 
         # Update with final result
         history[-1]["content"] = final_response
         yield history, ""
+        # Without the chart: its URL is only served while the run's artifacts are registered.
+        # Answers cut short by a budget are not worth repeating
+        if not job.best_effort:
+            await asyncio.to_thread(
+                cache_answer, message, response_mode, data_version, str(result)
+            )
 
     except Exception as e:
         history[-1]["content"] = f"""
@@ -151,140 +339,167 @@ def chat_with_agent(message, history, response_mode):
         yield history, ""
 
 
-def get_latest_image():
-    """Get the most recently created image file"""
-    image_files = []
-    for ext in ["*.png", "*.jpg", "*.jpeg", "*.svg", "*.pdf"]:
-        image_files.extend(Path(".").glob(ext))
+def get_latest_image(session_id="anonymous"):
+    """Get the most recent image created for this session, at full resolution: the side panel
+    offers it for download (the WebP preview is only for inline display in the chat)"""
+    latest_image = artifact_registry.latest_for_session(session_id)
+    return latest_image.path if latest_image is not None else None
 
-    if image_files:
-        return str(max(image_files, key=os.path.getctime))
-    return None
 
+def session_id_of(request):
+    # Jobs and charts are tracked per browser session
+    return getattr(request, "session_hash", None) or "anonymous"
 
-# Create simple interface
-with gr.Blocks(title="Apple Health Assistant") as demo:
-    with MCPClient(SERVER_PARAMETERS) as mcp_client:
-        manager_agent = create_main_agent(mcp_client)
 
-        gr.HTML(
-            """
-        <div style="text-align: center; margin-bottom: 20px;">
-            <h1>🍏 Health Assistant</h1>
-            <p>Ask me anything about your health! I'll help you understand your health data and create a health improvement plan.</p>
-        </div>
-        """
-        )
+def build_manager_agent():
+    # The agents, the model client and the SQL tools are only imported when the first agent is built
+    from multi_agent import create_main_agent
 
-        with gr.Row():
-            with gr.Column(scale=3):
-                # Response mode selection
-                response_mode = gr.Radio(
-                    choices=["Short Answer", "Detailed Report"],
-                    value="Short Answer",
-                    label="Response Mode",
-                    info="Choose how detailed you want the response to be",
-                )
-
-                # Chat interface with HTML support for inline images
-                chatbot = gr.Chatbot(
-                    label="Chat",
-                    height=600,
-                    type="messages",
-                    show_copy_button=True,
-                    elem_classes=["chat-container"],
-                )
-
-                msg = gr.Textbox(
-                    label="Message",
-                    placeholder="Ask me to research something and create a visualization...",
-                    lines=2,
-                    scale=4,
-                )
-
-                with gr.Row():
-                    submit_btn = gr.Button("Send 📤", variant="primary", scale=1)
-                    clear_btn = gr.Button("Clear 🗑️", scale=1)
-
-            with gr.Column(scale=1):
-                # Status and backup image display
-                gr.HTML(
-                    """
-                <div style="background: #f8f9fa; padding: 15px; border-radius: 8px; margin-bottom: 10px;">
-                    <h4>📊 Latest Visualization</h4>
-                    <p style="font-size: 12px; color: #666;">Images also appear inline in the chat</p>
-                </div>
-                """
-                )
-
-                image_display = gr.Image(
-                    label="Backup Image View",
-                    show_download_button=True,
-                    height=300,
-                    show_label=False,
-                )
-
-                refresh_img_btn = gr.Button("🔄 Refresh Image", size="sm")
-
-        # Example buttons
-        gr.HTML("<h3>💡 Try these examples:</h3>")
-        with gr.Row():
-            ex1 = gr.Button("💓 Heart Health", size="sm")
-            ex2 = gr.Button("💤 Sleep Health", size="sm")
-            ex3 = gr.Button("🏃 Activity Level", size="sm")
-
-        def submit_and_refresh(message, history, response_mode):
-            """Submit message and refresh image"""
-            # Process the chat
-            for updated_history, _ in chat_with_agent(message, history, response_mode):
-                yield updated_history, "", get_latest_image()
-
-        def clear_chat():
-            return [], ""
-
-        def refresh_image():
-            return get_latest_image()
-
-        # Store manager_agent as demo attribute for access in functions
-        demo.manager_agent = manager_agent
-
-        # Event handlers
-        submit_btn.click(
-            submit_and_refresh,
-            inputs=[msg, chatbot, response_mode],
-            outputs=[chatbot, msg, image_display],
-        )
+    manager_agent = create_main_agent(get_sql_tools())
+    install_progress_callbacks(manager_agent)
+    install_budget_callbacks(manager_agent)
+    install_tracing(manager_agent)
+    return manager_agent
 
-        msg.submit(
-            submit_and_refresh,
-            inputs=[msg, chatbot, response_mode],
-            outputs=[chatbot, msg, image_display],
-        )
 
-        clear_btn.click(clear_chat, outputs=[chatbot, msg])
+def warm_up():
+    """Build the agent pool and load the chart renderer so the first question does not wait"""
+    start = time.perf_counter()
+    try:
+        demo.agent_pool.warm_up()
+        from charts import warm_up as warm_up_charts
 
-        refresh_img_btn.click(refresh_image, outputs=[image_display])
+        warm_up_charts()
+        print(f"🔥 Agents ready in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        print(f"⚠️  Warm-up failed, agents will be built on first use: {e}")
 
-        # Example button events
-        ex1.click(
-            lambda: "How is my heart health, compared to people in my age group?", outputs=msg
-        )
-        ex2.click(lambda: "How well am I sleeping?", outputs=msg)
-        ex3.click(lambda: "How can I improve my activity level?", outputs=msg)
-
-        # Add custom CSS for better image display in chat
-        demo.css = """
-        .chat-container .message img {
-            max-width: 100% !important;
-            height: auto !important;
-            border-radius: 8px !important;
-            margin: 10px 0 !important;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1) !important;
-        }
-        .chat-container {
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-        }
+
+# Create simple interface
+with gr.Blocks(title="Apple Health Assistant") as demo:
+    agent_pool = AgentPool(build_manager_agent)
+
+    gr.HTML(
         """
+    <div style="text-align: center; margin-bottom: 20px;">
+        <h1>🍏 Health Assistant</h1>
+        <p>Ask me anything about your health! I'll help you understand your health data and create a health improvement plan.</p>
+    </div>
+    """
+    )
+
+    with gr.Row():
+        with gr.Column(scale=3):
+            # Response mode selection
+            response_mode = gr.Radio(
+                choices=["Short Answer", "Detailed Report"],
+                value="Short Answer",
+                label="Response Mode",
+                info="Choose how detailed you want the response to be",
+            )
+
+            # Chat interface with HTML support for inline images
+            chatbot = gr.Chatbot(
+                label="Chat",
+                height=600,
+                type="messages",
+                show_copy_button=True,
+                elem_classes=["chat-container"],
+            )
+
+            msg = gr.Textbox(
+                label="Message",
+                placeholder="Ask me to research something and create a visualization...",
+                lines=2,
+                scale=4,
+            )
+
+            with gr.Row():
+                submit_btn = gr.Button("Send 📤", variant="primary", scale=1)
+                clear_btn = gr.Button("Clear 🗑️", scale=1)
+
+        with gr.Column(scale=1):
+            # Status and backup image display
+            gr.HTML(
+                """
+            <div style="background: #f8f9fa; padding: 15px; border-radius: 8px; margin-bottom: 10px;">
+                <h4>📊 Latest Visualization</h4>
+                <p style="font-size: 12px; color: #666;">Images also appear inline in the chat</p>
+            </div>
+            """
+            )
+
+            image_display = gr.Image(
+                label="Backup Image View",
+                show_download_button=True,
+                height=300,
+                show_label=False,
+            )
+
+            refresh_img_btn = gr.Button("🔄 Refresh Image", size="sm")
+
+    # Example buttons
+    gr.HTML("<h3>💡 Try these examples:</h3>")
+    with gr.Row():
+        ex1 = gr.Button("💓 Heart Health", size="sm")
+        ex2 = gr.Button("💤 Sleep Health", size="sm")
+        ex3 = gr.Button("🏃 Activity Level", size="sm")
+
+    async def submit_and_refresh(message, history, response_mode, request: gr.Request):
+        """Submit message and refresh image"""
+        # Jobs are queued per browser session so users are served fairly
+        user_id = session_id_of(request)
+        async for updated_history, _ in chat_with_agent(
+            message, history, response_mode, user_id
+        ):
+            yield updated_history, "", get_latest_image(user_id)
+
+    def clear_chat():
+        return [], ""
+
+    def refresh_image(request: gr.Request):
+        return get_latest_image(session_id_of(request))
+
+    # Store the agent pool as demo attribute for access in functions
+    demo.agent_pool = agent_pool
+
+    # Event handlers
+    submit_btn.click(
+        submit_and_refresh,
+        inputs=[msg, chatbot, response_mode],
+        outputs=[chatbot, msg, image_display],
+    )
+
+    msg.submit(
+        submit_and_refresh,
+        inputs=[msg, chatbot, response_mode],
+        outputs=[chatbot, msg, image_display],
+    )
+
+    clear_btn.click(clear_chat, outputs=[chatbot, msg])
+
+    refresh_img_btn.click(refresh_image, outputs=[image_display])
+
+    # Example button events
+    ex1.click(
+        lambda: "How is my heart health, compared to people in my age group?", outputs=msg
+    )
+    ex2.click(lambda: "How well am I sleeping?", outputs=msg)
+    ex3.click(lambda: "How can I improve my activity level?", outputs=msg)
+
+    # Add custom CSS for better image display in chat
+    demo.css = """
+    .chat-container .message img {
+        max-width: 100% !important;
+        height: auto !important;
+        border-radius: 8px !important;
+        margin: 10px 0 !important;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.1) !important;
+    }
+    .chat-container {
+        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+    }
+    """
 
 if __name__ == "__main__":
     # Ensure we have write permissions in current directory
@@ -305,5 +520,17 @@ if __name__ == "__main__":
     print("💬 Chat interface with inline image display!")
     print("📊 Images will appear both in chat and in the side panel")
 
-    # Launch the app
-    demo.launch(server_name="0.0.0.0", server_port=7860, share=False, show_error=True)
+    # Serve the UI next to the chart endpoint
+    import uvicorn
+    from fastapi import FastAPI
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        if AGENT_WARM_UP:
+            threading.Thread(target=warm_up, name="agent-warm-up", daemon=True).start()
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(artifact_routes(), prefix=ARTIFACTS_URL_PREFIX)
+    app = gr.mount_gradio_app(app, demo, path="/", show_error=True)
+    uvicorn.run(app, host="0.0.0.0", port=7860)
@@ -0,0 +1,290 @@
+"""Long-lived, self-healing connections to the remote health data MCP server.
+
+Opening an ``MCPClient`` per app start (and launching ``npx mcp-remote@latest``
+for it) made every start pay an npm resolve, and a dropped SSE link killed the
+app until restart. ``MCPConnectionManager`` keeps a small pool of connected
+clients for concurrent tool calls, probes idle ones in the background (which
+also keeps the link alive), and replaces broken ones with exponential backoff.
+Agents get stable proxy tools that borrow a connection per call, retry once on
+a fresh connection if the call fails at the transport level (errors of the
+tool itself, such as bad SQL, are raised as they are), and record their
+latency. A connection that cannot be reopened leaves a placeholder in the pool
+that the next call or health check reconnects.
+"""
+import os
+import queue
+import random
+import shutil
+import statistics
+import threading
+import time
+from collections import deque
+
+from smolagents import MCPClient, Tool
+
+MCP_SERVER_URL = os.getenv(
+    "MCP_SERVER_URL", "https://grlll-health-data-real-mcp.hf.space/gradio_api/mcp/sse"
+)
+# "sse": the Python MCP client installed with smolagents[mcp]; "mcp-remote": the pinned npm bridge
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "sse")
+MCP_REMOTE_VERSION = os.getenv("MCP_REMOTE_VERSION", "0.1.29")
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", "30"))
+MCP_CONNECT_ATTEMPTS = int(os.getenv("MCP_CONNECT_ATTEMPTS", "5"))
+MCP_MAX_BACKOFF = float(os.getenv("MCP_MAX_BACKOFF", "30"))
+# Seconds a tool call waits for a free pooled connection before failing
+MCP_ACQUIRE_TIMEOUT = float(os.getenv("MCP_ACQUIRE_TIMEOUT", "60"))
+# JSON-RPC codes of the MCP errors raised when the session closed or a request timed out
+# (408 in older MCP clients)
+MCP_TRANSPORT_ERROR_CODES = (-32000, -32001, 408)
+
+
+def server_parameters(transport=MCP_TRANSPORT, url=MCP_SERVER_URL, token=None):
+    """Connection parameters for the MCP server, without resolving anything from npm"""
+    token = token if token is not None else os.getenv("HF_TOKEN")
+    if transport == "sse":
+        return {"url": url, "transport": "sse", "headers": {"Authorization": f"Bearer {token}"}}
+    if transport == "mcp-remote":
+        from mcp import StdioServerParameters
+
+        # Prefer a pre-installed bridge (npm install -g mcp-remote@<version>), else the pinned
+        # version from the npx cache
+        installed = shutil.which("mcp-remote")
+        command, args = (
+            (installed, [])
+            if installed
+            else ("npx", ["--yes", "--prefer-offline", f"mcp-remote@{MCP_REMOTE_VERSION}"])
+        )
+        return StdioServerParameters(
+            command=command,
+            args=[
+                *args,
+                url,
+                "--transport",
+                "sse-only",
+                "--header",
+                f"Authorization: Bearer {token}",
+            ],
+            env={**os.environ},
+        )
+    raise ValueError(f"Unknown MCP_TRANSPORT: {transport!r} (expected 'sse' or 'mcp-remote')")
+
+
+def is_transport_error(error):
+    """Whether a call failed because the connection did, rather than in the remote tool"""
+    import anyio
+    import httpx
+
+    if isinstance(
+        error,
+        (
+            OSError,
+            EOFError,
+            TimeoutError,
+            anyio.ClosedResourceError,
+            anyio.BrokenResourceError,
+            anyio.EndOfStream,
+            httpx.TransportError,
+        ),
+    ):
+        return True
+    return (
+        type(error).__name__ in ("MCPError", "McpError")
+        and getattr(error, "code", None) in MCP_TRANSPORT_ERROR_CODES
+    )
+
+
+class LatencyStats:
+    """Latency percentiles of the most recent calls"""
+
+    def __init__(self, size=1000):
+        self.timings = deque(maxlen=size)
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self.timings.append(seconds)
+            self.calls += 1
+            self.errors += error
+
+    def stats(self):
+        with self._lock:
+            timings = sorted(self.timings)
+            calls, errors = self.calls, self.errors
+        if not timings:
+            return {"calls": calls, "errors": errors}
+
+        def percentile(fraction):
+            return timings[min(len(timings) - 1, int(fraction * len(timings)))]
+
+        return {
+            "calls": calls,
+            "errors": errors,
+            "p50_ms": statistics.median(timings) * 1000,
+            "p95_ms": percentile(0.95) * 1000,
+            "p99_ms": percentile(0.99) * 1000,
+        }
+
+
+class MCPConnection:
+    """One connected MCPClient and its tools by name"""
+
+    def __init__(self, parameters):
+        self.client = MCPClient(parameters, structured_output=False)
+        self.tools = {tool.name: tool for tool in self.client.get_tools()}
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.client.disconnect()
+        except Exception as e:
+            print(f"⚠️  MCP disconnect failed: {e}")
+
+
+class MCPConnectionManager:
+    """Pool of MCP connections with background health checks and reconnects"""
+
+    def __init__(
+        self,
+        parameters=None,
+        pool_size=MCP_POOL_SIZE,
+        probe=None,
+        health_interval=MCP_HEALTH_INTERVAL,
+        connect_attempts=MCP_CONNECT_ATTEMPTS,
+        max_backoff=MCP_MAX_BACKOFF,
+        acquire_timeout=MCP_ACQUIRE_TIMEOUT,
+        connection_factory=MCPConnection,
+    ):
+        self.parameters = parameters if parameters is not None else server_parameters()
+        self.pool_size = pool_size
+        self.probe = probe
+        self.health_interval = health_interval
+        self.connect_attempts = connect_attempts
+        self.max_backoff = max_backoff
+        self.acquire_timeout = acquire_timeout
+        self.connection_factory = connection_factory
+        self.latency = LatencyStats()
+        self.reconnects = 0
+        self._idle = queue.Queue()
+        self._closed = threading.Event()
+        connections = [self._connect() for _ in range(pool_size)]
+        self.tools = [MCPToolProxy(self, tool) for tool in connections[0].tools.values()]
+        for connection in connections:
+            self._idle.put(connection)
+        if health_interval > 0:
+            threading.Thread(target=self._health_loop, name="mcp-health", daemon=True).start()
+
+    def _connect(self):
+        """Open a connection, retrying with exponential backoff and jitter"""
+        delay = 1.0
+        for attempt in range(1, self.connect_attempts + 1):
+            try:
+                return self.connection_factory(self.parameters)
+            except Exception as e:
+                if attempt == self.connect_attempts:
+                    raise ConnectionError(f"Could not connect to the MCP server: {e}") from e
+                print(f"⚠️  MCP connect attempt {attempt} failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.max_backoff)
+
+    def _reconnect(self):
+        self.reconnects += 1
+        return self._connect()
+
+    def _acquire(self):
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"No MCP connection became free within {self.acquire_timeout:g}s"
+            ) from None
+
+    def call(self, name, *args, **kwargs):
+        """Call a remote tool on a pooled connection, reconnecting once on transport failure"""
+        # None is the placeholder of a connection that could not be reopened yet
+        connection = self._acquire()
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = self._reconnect()
+            try:
+                result = connection.tools[name](*args, **kwargs)
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                print(f"⚠️  MCP call to {name} failed ({e}), reconnecting")
+                connection.close()
+                # If reconnecting fails the placeholder goes back, not the closed connection
+                connection = None
+                connection = self._reconnect()
+                result = connection.tools[name](*args, **kwargs)
+            self.latency.record(time.perf_counter() - start)
+            return result
+        except Exception:
+            self.latency.record(time.perf_counter() - start, error=True)
+            raise
+        finally:
+            if connection is not None:
+                connection.last_used = time.monotonic()
+            self._idle.put(connection)
+
+    def _health_loop(self):
+        while not self._closed.wait(self.health_interval):
+            # Probe each connection that sat idle for a whole interval, without blocking callers
+            for _ in range(self.pool_size):
+                try:
+                    connection = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if connection is None:
+                        connection = self._reconnect()
+                    elif time.monotonic() - connection.last_used >= self.health_interval:
+                        if self.probe is not None:
+                            self.probe(connection.tools)
+                        connection.last_used = time.monotonic()
+                except Exception as e:
+                    print(f"⚠️  MCP health check failed ({e}), reconnecting")
+                    if connection is not None:
+                        connection.close()
+                    connection = None
+                    try:
+                        connection = self._reconnect()
+                    except ConnectionError as error:
+                        print(f"❌ {error}")
+                finally:
+                    self._idle.put(connection)
+
+    def stats(self):
+        return {**self.latency.stats(), "pool_size": self.pool_size, "reconnects": self.reconnects}
+
+    def close(self):
+        self._closed.set()
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if connection is not None:
+                connection.close()
+
+
+class MCPToolProxy(Tool):
+    """Stand-in for a remote MCP tool that routes calls through the connection manager"""
+
+    skip_forward_signature_validation = True
+
+    def __init__(self, manager, tool):
+        self.manager = manager
+        self.name = tool.name
+        self.description = tool.description
+        self.inputs = tool.inputs
+        self.output_type = tool.output_type
+        self.output_schema = getattr(tool, "output_schema", None)
+        super().__init__()
+        self.is_initialized = True
+
+    def forward(self, *args, **kwargs):
+        return self.manager.call(self.name, *args, **kwargs)
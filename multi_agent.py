@@ -1,29 +1,82 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
 from smolagents import (
     CodeAgent,
     ToolCallingAgent,
     WebSearchTool,
-    MCPClient,
-    LiteLLMModel,
+    Tool,
 )
+from code_executor import MANAGER_CODE_TIMEOUT_SECONDS, code_executor
+from llm import get_model
+from streaming import STREAM_ANSWERS
 from tool import visit_webpage
-from sql_agent import create_sql_agent, SERVER_PARAMETERS
-from visual_agent import visual_agent
+from sql_agent import create_sql_agent, open_sql_tools
+from visual_agent import create_visual_agent
+from charts import CHART_TOOLS
+from reference_norms import lookup_reference_norms
 
-model = LiteLLMModel(model_id="anthropic/claude-sonnet-4-20250514", temperature=0.2)
 
-web_agent = ToolCallingAgent(
-    tools=[WebSearchTool(), visit_webpage],
-    model=model,
-    max_steps=1,
-    name="web_search_agent",
-    description="Runs web searches for you.",
-)
-web_agent.prompt_templates["system_prompt"] = (
-    """You are a web search agent. Your job is to run web searches and visit webpages to find information for the user. When you make a websearch, make sure to ONLY use a few keywords."""
-)
+def create_web_agent():
+    web_agent = ToolCallingAgent(
+        tools=[WebSearchTool(), visit_webpage],
+        model=get_model("web_search_agent"),
+        max_steps=1,
+        name="web_search_agent",
+        description="Runs web searches for you.",
+    )
+    web_agent.prompt_templates["system_prompt"] = (
+        """You are a web search agent. Your job is to run web searches and visit webpages to find information for the user. When you make a websearch, make sure to ONLY use a few keywords."""
+    )
+    return web_agent
+
+
+class ParallelAgentsTool(Tool):
+    name = "run_parallel"
+    description = (
+        "Runs several managed agents at the same time and returns their answers. "
+        "Use it for independent lookups, e.g. the health database and a web search."
+    )
+    inputs = {
+        "tasks": {
+            "type": "object",
+            "description": "Mapping of managed agent name to the task to give it, "
+            'e.g. {"sql_query_agent_health": "...", "web_search_agent": "..."}',
+        }
+    }
+    output_type = "object"
+
+    def __init__(self, managed_agents):
+        super().__init__()
+        self.managed_agents = {agent.name: agent for agent in managed_agents}
+
+    def forward(self, tasks: dict):
+        unknown = set(tasks) - set(self.managed_agents)
+        if unknown:
+            raise ValueError(
+                f"Unknown agents {sorted(unknown)}, expected some of {sorted(self.managed_agents)}"
+            )
+        with ThreadPoolExecutor(max_workers=len(tasks) or 1) as executor:
+            # Each branch runs in a copy of the caller's context so progress reaches the same job
+            futures = {
+                name: executor.submit(
+                    contextvars.copy_context().run, self.managed_agents[name], task
+                )
+                for name, task in tasks.items()
+            }
+            results = {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = f"Error from {name}: {str(e)}"
+        return results
 
 
 def create_main_agent(tools):
+    # Each manager gets its own managed agents: agents hold per-run memory
+    web_agent = create_web_agent()
+    visual_agent = create_visual_agent()
     sql_query_agent = create_sql_agent(tools)
     
     # Debug: Print managed agents being created
@@ -32,11 +85,16 @@ def create_main_agent(tools):
     print(f"  - visual_agent: {visual_agent.name}")
     print(f"  - sql_query_agent: {sql_query_agent.name}")
 
+    managed_agents = [web_agent, visual_agent, sql_query_agent]
+    imports = ["time", "numpy", "pandas"]
     manager_agent = CodeAgent(
-        tools=[],
-        model=model,
-        managed_agents=[web_agent, visual_agent, sql_query_agent],
-        additional_authorized_imports=["time", "numpy", "pandas"],
+        tools=[ParallelAgentsTool(managed_agents), lookup_reference_norms, *CHART_TOOLS],
+        model=get_model("manager"),
+        managed_agents=managed_agents,
+        additional_authorized_imports=imports,
+        executor=code_executor(imports, timeout_seconds=MANAGER_CODE_TIMEOUT_SECONDS),
+        # Token deltas let the UI show the final answer while it is being written
+        stream_outputs=STREAM_ANSWERS,
     )
 
     manager_agent.prompt_templates[
@@ -61,14 +119,54 @@ def create_main_agent(tools):
     visual_result = visual_agent("Create a chart showing heart rate over time using this data: " + str(data))
     ```
 
+    TO RUN INDEPENDENT AGENTS AT THE SAME TIME:
+    When the tasks do not depend on each other's results (e.g. the health database and a web search),
+    run them concurrently with the run_parallel tool; it returns a dict of results keyed by agent name:
+    ```python
+    results = run_parallel({
+        "sql_query_agent_health": "Query the database for resting heart rate over the last year",
+        "web_search_agent": "Search for normal resting heart rate ranges by age",
+    })
+    sql_result = results["sql_query_agent_health"]
+    web_result = results["web_search_agent"]
+    ```
+    Tasks that need another agent's output (e.g. visual_agent charting SQL data) must run afterwards.
+
+    POPULATION BENCHMARKS WITHOUT A WEB SEARCH:
+    lookup_reference_norms(metric, age, biological_sex="", value=None) returns offline reference ranges
+    (JSON, with the user's rating when `value` is given) for resting_heart_rate, vo2max, sleep_duration,
+    daily_steps, weekly_exercise_minutes and oxygen_saturation, by age band and biological sex
+    (date_of_birth and biological_sex are in the healthdata table). Only when it answers
+    "No offline reference data" should you ask web_search_agent for that benchmark.
+    ```python
+    norms = lookup_reference_norms(metric="resting_heart_rate", age=42, biological_sex="HKBiologicalSexFemale", value=64)
+    ```
+
+    STANDARD CHARTS WITHOUT THE VISUAL AGENT:
+    These chart tools render a chart directly from data in one call (no extra agent run) and return
+    "Chart saved as <path>". `data` is a list of row dicts, a JSON string, or the JSON summary
+    returned by the SQL agent's analytical tools:
+    - heart_rate_chart(data, max_heart_rate=190.0, title="Heart Rate"): heart rate over time with training zones
+    - sleep_hypnogram(data, title="Sleep Stages"): sleep stages from start_date/end_date/value rows, or nightly totals
+    - activity_rings_chart(data, title="Activity Rings"): Move/Exercise/Stand % of goal from activitysummary rows
+    - workout_distribution_chart(data, metric="count", title="Workouts"): workouts per activity type
+    - hrv_trend_chart(data, title="Heart Rate Variability"): HRV measurements with 7-day average and trend
+    ```python
+    rows = sql_query_agent_health("Return the daily heart rate statistics for March 2024 as JSON")
+    chart = heart_rate_chart(data=rows, max_heart_rate=220 - 45)
+    ```
+
     IMPORTANT RULES:
     1. ALWAYS delegate database queries to sql_query_agent_health
-    2. ALWAYS delegate web searches to web_search_agent
-    3. ALWAYS delegate visualization creation to visual_agent
+    2. ALWAYS delegate web searches to web_search_agent, after lookup_reference_norms for population benchmarks
+    3. Use the chart tools for the standard charts above; delegate every other visualization to visual_agent
     4. DO NOT try to perform these tasks yourself - use the specialized agents
     5. Combine results from multiple agents to provide comprehensive answers
     6. NEVER create synthetic data or make up information
     7. Always format code blocks properly with ```python
+    8. Once you have everything you need, write the answer itself as a string literal inside the
+       call, e.g. final_answer('''Your resting heart rate...'''), not as a variable built earlier:
+       the user sees the literal while you write it
 
     Pass all relevant context and instructions to the managed agents when delegating.
     """
@@ -76,7 +174,7 @@ def create_main_agent(tools):
 
 
 if __name__ == "__main__":
-    with MCPClient(SERVER_PARAMETERS) as tools:
+    with open_sql_tools() as tools:
         manager_agent = create_main_agent(tools)
 
         answer = manager_agent.run("""How is my heart health?""")
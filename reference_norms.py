@@ -0,0 +1,158 @@
+"""Offline population reference values for comparing a user's health metrics.
+
+The dataset in ``system_info/reference_norms.json`` is versioned and cites a
+source for every entry (resting heart rate and VO2max by age and sex, sleep
+duration, step count, activity and SpO2 guidelines). It is loaded once and
+indexed by metric and biological sex, with age bands found by bisection, so
+the manager only needs the web search agent for metrics it does not cover.
+"""
+import bisect
+import json
+import os
+from functools import lru_cache
+
+from smolagents import tool
+
+REFERENCE_NORMS_PATH = os.getenv(
+    "REFERENCE_NORMS_PATH",
+    os.path.join(os.path.dirname(__file__), "system_info", "reference_norms.json"),
+)
+
+
+def normalize_sex(value):
+    """'male', 'female' or None for HealthKit values such as 'HKBiologicalSexFemale'"""
+    value = (value or "").lower().replace("hkbiologicalsex", "")
+    if value in ("male", "m", "man"):
+        return "male"
+    if value in ("female", "f", "woman"):
+        return "female"
+    return None
+
+
+class ReferenceNorms:
+    """Reference dataset indexed by (metric, sex), with entries sorted by age band"""
+
+    def __init__(self, path=REFERENCE_NORMS_PATH):
+        with open(path) as file:
+            data = json.load(file)
+        self.version = data["version"]
+        self.sources = data["sources"]
+        self.aliases = {}
+        for metric, info in data["metrics"].items():
+            self.aliases[metric] = metric
+            for alias in info.get("aliases", []):
+                self.aliases[alias.lower()] = metric
+        entries = {}
+        for norm in data["norms"]:
+            entries.setdefault((norm["metric"], norm["sex"]), []).append(norm)
+        self.index = {}
+        for key, norms in entries.items():
+            norms.sort(key=lambda norm: norm["age_min"])
+            self.index[key] = ([norm["age_min"] for norm in norms], norms)
+
+    @property
+    def metrics(self):
+        return sorted({metric for metric, _ in self.index})
+
+    def metric_name(self, metric):
+        return self.aliases.get(metric.strip().lower().replace(" ", "_")) or self.aliases.get(
+            metric.strip().lower()
+        )
+
+    def _band(self, metric, sex, age):
+        ages, norms = self.index.get((metric, sex), ([], []))
+        position = bisect.bisect_right(ages, age) - 1
+        if position < 0:
+            return None
+        norm = norms[position]
+        if norm["age_max"] is None:
+            return norm
+        # Bands are in whole years: a band ends where the next one starts (25.5 is
+        # in 18-25), or a year after its age_max if there is a gap or none follows
+        end = norm["age_max"] + 1
+        if position + 1 < len(ages):
+            end = min(end, ages[position + 1])
+        return norm if age < end else None
+
+    def lookup(self, metric, age, sex=None):
+        """Entries for the sex-specific band (when the sex is known) and the general one"""
+        metric = self.metric_name(metric)
+        if metric is None:
+            return []
+        sexes = [sex, "any"] if sex else ["male", "female", "any"]
+        return [norm for norm in (self._band(metric, each, age) for each in sexes) if norm]
+
+    @staticmethod
+    def in_unit(norm, value):
+        """The value in the entry's unit: HealthKit stores percentages such as SpO2 as fractions"""
+        if norm["unit"] == "%" and 0 < value <= 1:
+            return value * 100
+        return value
+
+    @classmethod
+    def rate(cls, norm, value):
+        value = cls.in_unit(norm, value)
+        for label, low, high in norm["categories"]:
+            if (low is None or value >= low) and (high is None or value < high):
+                return label
+        return None
+
+
+@lru_cache(maxsize=1)
+def load_reference_norms():
+    return ReferenceNorms()
+
+
+def _describe(norm, reference, value):
+    age_band = (
+        f"{norm['age_min']}+" if norm["age_max"] is None else f"{norm['age_min']}-{norm['age_max']}"
+    )
+    entry = {
+        "sex": norm["sex"],
+        "age_band": age_band,
+        "unit": norm["unit"],
+        "lower_is_better": norm["lower_is_better"],
+        "categories": {
+            label: f"< {high}" if low is None else f">= {low}" if high is None else f"{low}-{high}"
+            for label, low, high in norm["categories"]
+        },
+        "source": reference.sources[norm["source"]],
+    }
+    if value is not None:
+        entry["user_value"] = reference.in_unit(norm, value)
+        entry["user_rating"] = reference.rate(norm, value)
+    return entry
+
+
+@tool
+def lookup_reference_norms(
+    metric: str, age: float, biological_sex: str = "", value: float = None
+) -> str:
+    """Population reference ranges for a health metric, by age band and biological sex, from an offline dataset.
+
+    Args:
+        metric: One of 'resting_heart_rate', 'vo2max', 'sleep_duration', 'daily_steps', 'weekly_exercise_minutes', 'oxygen_saturation' (HealthKit type identifiers also work).
+        age: The user's age in years.
+        biological_sex: The user's biological sex, e.g. 'HKBiologicalSexFemale' from the healthdata table; empty if unknown.
+        value: Optional user value to rate against the ranges, in the metric's unit: bpm, mL/min/kg, hours per night, steps per day, minutes per week, or % for oxygen_saturation (HealthKit fractions such as 0.97 are read as 97%).
+
+    Returns:
+        A JSON object with the matching reference ranges, or a message saying no offline data matched.
+    """
+    reference = load_reference_norms()
+    sex = normalize_sex(biological_sex)
+    norms = reference.lookup(metric, age, sex)
+    if not norms:
+        return (
+            f"No offline reference data for {metric!r} (age {age}, sex {sex or 'unknown'}). "
+            f"Known metrics: {', '.join(reference.metrics)}. Use web_search_agent for this one."
+        )
+    return json.dumps(
+        {
+            "metric": reference.metric_name(metric),
+            "dataset_version": reference.version,
+            "age": age,
+            "biological_sex": sex,
+            "reference": [_describe(norm, reference, value) for norm in norms],
+        }
+    )
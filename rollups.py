@@ -0,0 +1,88 @@
+"""Numeric record values and hourly/daily rollups for the local health database.
+
+``record.value`` is text, so aggregates written against it cast every row at query
+time. The importer fills ``record.value_numeric`` as it loads, and the
+``recordrollup`` table keeps count/average/min/max/sum per record type and
+hour/day bucket so that long-range questions only touch a few thousand rows.
+"""
+import sqlite3
+
+# SQLite expressions truncating record.start_date to the bucket of each period
+PERIODS = {
+    "day": "substr(start_date, 1, 10)",
+    "hour": "substr(start_date, 1, 13) || ':00:00'",
+}
+
+
+def bucket_start(period, start_date):
+    """Truncate a start_date string to the beginning of its bucket"""
+    return start_date[:10] if period == "day" else start_date[:13] + ":00:00"
+
+
+def parse_numeric(value):
+    """Return the record value as a float, or None for category/text values"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def ensure_numeric_values(connection):
+    """Add and backfill record.value_numeric on databases created before it existed"""
+    columns = {row[1] for row in connection.execute("PRAGMA table_info(record)")}
+    if "value_numeric" in columns:
+        return
+    connection.create_function("parse_numeric", 1, parse_numeric, deterministic=True)
+    connection.execute("ALTER TABLE record ADD COLUMN value_numeric FLOAT")
+    connection.execute("UPDATE record SET value_numeric = parse_numeric(value)")
+    connection.commit()
+
+
+def refresh_rollups(connection, since=None):
+    """Recompute the rollup buckets from ``since`` (a record start_date) onwards.
+
+    Without ``since`` every bucket is rebuilt. With it, only the buckets that may
+    have received new records are deleted and recomputed, so refreshing after an
+    incremental import costs about as much as the new data.
+    """
+    for period, bucket in PERIODS.items():
+        params = {"period": period}
+        where = "value_numeric IS NOT NULL"
+        if since:
+            params["since"] = bucket_start(period, since)
+            where += " AND start_date >= :since"
+            connection.execute(
+                "DELETE FROM recordrollup WHERE period = :period AND bucket >= :since", params
+            )
+        else:
+            connection.execute("DELETE FROM recordrollup WHERE period = :period", params)
+        connection.execute(
+            f"""
+            INSERT INTO recordrollup (type, period, bucket, unit, count, average, minimum, maximum, sum)
+            SELECT type, :period, {bucket}, MAX(unit), COUNT(*),
+                   AVG(value_numeric), MIN(value_numeric), MAX(value_numeric), SUM(value_numeric)
+            FROM record
+            WHERE {where}
+            GROUP BY type, {bucket}
+            """,
+            params,
+        )
+    connection.commit()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from local_sql import HEALTH_DB_PATH
+
+    parser = argparse.ArgumentParser(description="Rebuild the record rollup tables")
+    parser.add_argument("--db", default=HEALTH_DB_PATH)
+    parser.add_argument("--since", help="only refresh buckets from this start_date onwards")
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.db)
+    ensure_numeric_values(connection)
+    refresh_rollups(connection, since=args.since)
+    connection.close()
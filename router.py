@@ -0,0 +1,371 @@
+"""Routing of chat questions to the cheapest pipeline that can answer them.
+
+The manager agent is two LLM layers deep before any SQL runs: it plans a step,
+then delegates to the SQL agent, which plans its own. Most short answers need
+neither. ``route_question`` classifies a question with rules, no model call:
+
+- ``tool``: a short answer about one metric that a canned analytical tool covers
+  (sleep, heart rate, resting heart rate, steps, workouts) is answered from the
+  tool's summary with a template, without any model call, when the question
+  asks for what the template reports (e.g. an average or a total) and nothing
+  more specific (a peak, a minimum, when or during what). Local backend only.
+- ``sql``: other short answers about the user's own data go straight to the SQL
+  agent.
+- ``manager``: detailed reports, comparisons and benchmarks, charts, advice and
+  general questions keep the full multi-agent pipeline.
+
+Cached answers are served before routing. ``router_stats`` counts every route
+with its latency, model calls and agent hops (agents that ran at least one
+step), and estimates the time and hops saved against the manager's short
+answers.
+"""
+import datetime
+import os
+import re
+import threading
+
+ROUTING = os.getenv("ROUTING", "1") == "1"
+
+SQL_AGENT_NAME = "sql_query_agent_health"
+# Appended to questions sent straight to the SQL agent, whose answer goes to the user as is
+SQL_ROUTE_INSTRUCTIONS = (
+    "Answer the user's question directly in two or three sentences, with the numbers you found "
+    "and their units. Do not return raw rows or JSON."
+)
+
+# Questions that need several agents, reference data, a chart or more than a lookup
+MANAGER_WORDS = re.compile(
+    r"compar|benchmark|normal|typical|age group|population|peers|other people|chart|graph|plot|"
+    r"visuali|diagram|dashboard|web|search|research|recommend|improve|should i|advice|tips?\b|"
+    r"why|guideline|risk|\bhealth|overall|assess|evaluat|summar|report|plan\b|explain",
+    re.IGNORECASE,
+)
+PERSONAL_WORDS = re.compile(r"\b(my|mine|me|i|i'm|i've|i'd)\b", re.IGNORECASE)
+
+PERIOD_UNITS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+
+class Route:
+    """Where a question goes: 'tool' (with its intent and period), 'sql' or 'manager'"""
+
+    def __init__(self, kind, reason, intent=None, period=None):
+        self.kind = kind
+        self.reason = reason
+        self.intent = intent
+        self.period = period
+
+    def __repr__(self):
+        intent = f", intent={self.intent!r}" if self.intent else ""
+        return f"Route({self.kind!r}{intent}, reason={self.reason!r})"
+
+
+def _latest_day(sql):
+    from local_sql import run_query
+
+    latest = next(iter(run_query(sql)[0].values()))
+    return datetime.date.fromisoformat(latest[:10]) if latest else datetime.date.today()
+
+
+def _latest_rollup_day(record_type):
+    return _latest_day(
+        "SELECT MAX(bucket) AS latest FROM recordrollup "
+        f"WHERE type = '{record_type}' AND period = 'day'"
+    )
+
+
+def _minutes(value):
+    hours, minutes = divmod(round(value or 0), 60)
+    return f"{hours} h {minutes:02d} min" if hours else f"{minutes} min"
+
+
+def _span(start, end):
+    last = (datetime.date.fromisoformat(end) - datetime.timedelta(days=1)).isoformat()
+    return f"on {start}" if last == start else f"from {start} to {last}"
+
+
+def _heart_rate_answer(start, end):
+    import json
+
+    from analytics import time_bucket_stats
+
+    summary = json.loads(
+        time_bucket_stats("HKQuantityTypeIdentifierHeartRate", start, end, bucket="week")
+    )
+    if not summary.get("count"):
+        return None
+    series = summary["series"]
+    answer = (
+        f"Your average heart rate {_span(start, end)} was {summary['mean']:.0f} bpm "
+        f"(lowest {summary['minimum']:.0f}, highest {summary['maximum']:.0f} bpm, "
+        f"{summary['count']:,} measurements)."
+    )
+    if len(series) > 1:
+        first, last = series[0][2], series[-1][2]
+        answer += (
+            f" Your weekly average went from {first:.0f} bpm in the week of {series[0][0]} "
+            f"to {last:.0f} bpm in the week of {series[-1][0]}."
+        )
+    return answer
+
+
+def _resting_heart_rate_answer(start, end):
+    import json
+
+    from analytics import resting_heart_rate_trend
+
+    summary = json.loads(resting_heart_rate_trend(start, end))
+    if not summary.get("days_with_data"):
+        return None
+    trend = summary["trend_bpm_per_month"]
+    direction = "about flat" if abs(trend) < 0.5 else ("rising" if trend > 0 else "falling")
+    return (
+        f"Your resting heart rate {_span(start, end)} averaged {summary['mean_bpm']:.0f} bpm "
+        f"over {summary['days_with_data']} days with data. It went from "
+        f"{summary['first_week_bpm']:.0f} bpm in the first week to {summary['last_week_bpm']:.0f} "
+        f"bpm in the last, a trend that is {direction} ({trend:+.1f} bpm per month)."
+    )
+
+
+def _sleep_answer(start, end):
+    import json
+
+    from analytics import sleep_stage_totals
+
+    # The nights dated start to end - 1 day: sleep_stage_totals dates a night by its evening
+    summary = json.loads(sleep_stage_totals(f"{start} 12:00:00", f"{end} 12:00:00"))
+    if not summary.get("nights"):
+        return None
+    average = summary["average_minutes_per_night"]
+    stages = ", ".join(
+        f"{stage} {_minutes(average[stage])}"
+        for stage in ("deep", "core", "rem")
+        if stage in average
+    )
+    nights = summary["nights"]
+    answer = f"{_span(start, end).capitalize()} you slept {_minutes(average['total_asleep'])}"
+    if nights > 1:
+        answer += (
+            f" per night on average over {nights} nights (shortest "
+            f"{_minutes(summary['shortest_night_minutes'])}, longest "
+            f"{_minutes(summary['longest_night_minutes'])})"
+        )
+    answer += "."
+    night = "An average night" if nights > 1 else "The night"
+    if stages:
+        answer += f" {night} had {stages}."
+    if average.get("awake"):
+        answer += f" {night} had {_minutes(average['awake'])} awake."
+    return answer
+
+
+def _steps_answer(start, end):
+    import json
+
+    from analytics import time_bucket_stats
+
+    summary = json.loads(time_bucket_stats("HKQuantityTypeIdentifierStepCount", start, end))
+    if not summary.get("count"):
+        return None
+    # time_bucket_stats coarsens long periods, so daily totals are averaged over the days covered
+    days = (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days
+    total = sum(row[5] or 0 for row in summary["series"])
+    busiest = max(summary["series"], key=lambda row: row[5] or 0)
+    return (
+        f"{_span(start, end).capitalize()} you walked {total:,.0f} steps, "
+        f"{total / days:,.0f} per day on average. Your most active {summary['bucket']} was "
+        f"{busiest[0]} with {busiest[5]:,.0f} steps."
+    )
+
+
+def _workouts_answer(start, end):
+    import json
+
+    from analytics import workout_summary
+
+    summary = json.loads(workout_summary(start, end))
+    if not summary.get("workouts"):
+        return None
+    activities = "; ".join(
+        f"{activity}: {row['count']:.0f} ({_minutes(row['total_minutes'])} in total)"
+        for activity, row in list(summary["per_activity"].items())[:5]
+    )
+    return (
+        f"{_span(start, end).capitalize()} you logged {summary['workouts']} workouts. "
+        f"By activity: {activities}."
+    )
+
+
+# Intent: (question pattern, default period in days, latest day with data, answer template)
+TOOL_INTENTS = {
+    "resting_heart_rate": (
+        r"resting (heart rate|hr|pulse)|\brhr\b",
+        90,
+        lambda: _latest_rollup_day("HKQuantityTypeIdentifierRestingHeartRate"),
+        _resting_heart_rate_answer,
+    ),
+    "heart_rate": (
+        r"heart ?rate|pulse|\bbpm\b",
+        30,
+        lambda: _latest_rollup_day("HKQuantityTypeIdentifierHeartRate"),
+        _heart_rate_answer,
+    ),
+    "sleep": (
+        r"\bsleep|\bslept\b",
+        30,
+        lambda: _latest_day(
+            # Nights are dated by the evening they start, as in sleep_stage_totals
+            "SELECT MAX(date(start_date, '-12 hours')) AS latest FROM record "
+            "WHERE type = 'HKCategoryTypeIdentifierSleepAnalysis'"
+        ),
+        _sleep_answer,
+    ),
+    "steps": (
+        r"\bsteps?\b",
+        30,
+        lambda: _latest_rollup_day("HKQuantityTypeIdentifierStepCount"),
+        _steps_answer,
+    ),
+    "workouts": (
+        r"workouts?|exercis|training",
+        90,
+        lambda: _latest_day("SELECT MAX(start_date) AS latest FROM workout"),
+        _workouts_answer,
+    ),
+}
+
+
+# What each template reports, in the words a question asks for it with
+TOOL_QUESTIONS = {
+    "resting_heart_rate": r"\b(average|avg|mean|trend\w*|chang\w*|usually|been)\b",
+    "heart_rate": r"\b(average|avg|mean|trend\w*|chang\w*|usually)\b",
+    "sleep": r"\b(average|avg|mean|how (much|long)|how many hours|hours)\b",
+    "steps": r"\b(average|avg|mean|total|how many|per day|a day|daily)\b",
+    "workouts": r"\b(how many|how often|number of|total|count)\b",
+}
+# Questions about a particular value or moment, which the templates do not single out
+SPECIFIC_WORDS = re.compile(
+    r"\b(when|which|what day|what time|during|while|after|before|peak\w*|highest|lowest|max\w*|"
+    r"min|minimum|best|worst|longest|shortest|most|least|fastest|slowest|record)\b",
+    re.IGNORECASE,
+)
+
+
+def _intents(question):
+    intents = [
+        name
+        for name, (pattern, *_) in TOOL_INTENTS.items()
+        if re.search(pattern, question, re.IGNORECASE)
+    ]
+    # A resting heart rate question is not also a heart rate one
+    if "resting_heart_rate" in intents and "heart_rate" in intents:
+        intents.remove("heart_rate")
+    return intents
+
+
+def parse_period(question):
+    """The period a question asks about: ("days", n), ("year", yyyy), ("year_to_date", None)
+    or None for the intent's default"""
+    question = question.lower()
+    match = re.search(r"\b(?:last|past|previous) (\d+) (day|week|month|year)s?\b", question)
+    if match:
+        return "days", int(match.group(1)) * PERIOD_UNITS[match.group(2)]
+    if re.search(r"\bthis year\b", question):
+        return "year_to_date", None
+    match = re.search(r"\b(?:last|past|previous|this) (day|week|month|year)\b", question)
+    if match:
+        return "days", PERIOD_UNITS[match.group(1)]
+    if re.search(r"\b(today|yesterday|last night)\b", question):
+        return "days", 1
+    match = re.search(r"\b(?:in|during) (20\d\d)\b", question)
+    if match:
+        return "year", int(match.group(1))
+    return None
+
+
+def route_question(question, response_mode, backend=None):
+    """Pick the route of a question; cheap enough to run on the event loop"""
+    from sql_agent import SQL_BACKEND
+
+    backend = backend or SQL_BACKEND
+    if not ROUTING:
+        return Route("manager", "routing disabled")
+    if response_mode != "Short Answer":
+        return Route("manager", f"{response_mode} mode")
+    if MANAGER_WORDS.search(question):
+        return Route("manager", "needs benchmarks, a chart or advice")
+    if not PERSONAL_WORDS.search(question):
+        return Route("manager", "not about the user's data")
+    intents = _intents(question)
+    if (
+        backend == "local"
+        and len(intents) == 1
+        and re.search(TOOL_QUESTIONS[intents[0]], question, re.IGNORECASE)
+        and not SPECIFIC_WORDS.search(question)
+    ):
+        return Route("tool", "single metric summary", intents[0], parse_period(question))
+    return Route("sql", "lookup in the user's data")
+
+
+def period_dates(route):
+    """Inclusive start and exclusive end date of a tool route, anchored on the latest data"""
+    _, default_days, latest_day, _ = TOOL_INTENTS[route.intent]
+    kind, value = route.period or ("days", default_days)
+    if kind == "year":
+        return datetime.date(value, 1, 1).isoformat(), datetime.date(value + 1, 1, 1).isoformat()
+    latest = latest_day()
+    end = latest + datetime.timedelta(days=1)
+    if kind == "year_to_date":
+        start = datetime.date(latest.year, 1, 1)
+    else:
+        start = end - datetime.timedelta(days=value)
+    return start.isoformat(), end.isoformat()
+
+
+def answer_with_tool(route):
+    """The templated answer of a tool route, or None when the period has no data"""
+    start, end = period_dates(route)
+    return TOOL_INTENTS[route.intent][3](start, end)
+
+
+class RouterStats:
+    """Per-route counts, latency, model calls and agent hops, and what the cheap routes saved"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, kind, response_mode, seconds, model_calls=0, hops=0):
+        with self._lock:
+            route = self.routes.setdefault(
+                (kind, response_mode), {"count": 0, "seconds": 0.0, "model_calls": 0, "hops": 0}
+            )
+            route["count"] += 1
+            route["seconds"] += seconds
+            route["model_calls"] += model_calls
+            route["hops"] += hops
+
+    def stats(self):
+        with self._lock:
+            routes = {
+                f"{kind} ({mode})": {
+                    "count": route["count"],
+                    "average_seconds": route["seconds"] / route["count"],
+                    "average_model_calls": route["model_calls"] / route["count"],
+                    "average_hops": route["hops"] / route["count"],
+                }
+                for (kind, mode), route in self.routes.items()
+            }
+        stats = {"routes": routes}
+        # Short answers that skipped the manager, against the short answers it did run
+        baseline = routes.get("manager (Short Answer)")
+        if baseline is not None:
+            for key in ("seconds", "hops", "model_calls"):
+                stats[f"{key}_saved"] = sum(
+                    route["count"] * (baseline[f"average_{key}"] - route[f"average_{key}"])
+                    for name, route in routes.items()
+                    if name.endswith("(Short Answer)") and not name.startswith("manager")
+                )
+        return stats
+
+
+router_stats = RouterStats()
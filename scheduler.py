@@ -0,0 +1,344 @@
+"""Scheduling of model calls under the provider's rate limits.
+
+All agents of all users share one API key, and the provider limits it per
+model, so the calls to each model are admitted by that model's
+``ModelScheduler``: token buckets hold the requests, input tokens and output
+tokens per minute the provider allows for the model, and at most
+``LLM_MAX_CONCURRENCY`` calls are in flight. Input tokens are estimated from
+the prompt before a call and the buckets are corrected with the actual usage
+afterwards (prompt-cache reads do not count towards the input tokens limit,
+so they are left out of it by the caller). Waiting calls
+are admitted by priority, so interactive short answers go ahead of detailed
+reports (``request_priority``); a call gains one priority level for every
+``LLM_PRIORITY_AGING`` seconds it waits, so reports are never starved. A call
+rejected with a rate-limit or overload error is retried with jittered
+exponential backoff, instead of failing the whole agent run; a rate-limit
+error (429) also pauses admission to the model for its Retry-After, since the
+key's quota is spent, while an overloaded provider only delays the call.
+"""
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Provider limits of the API key for each model; 0 disables a bucket
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "50"))
+LLM_INPUT_TOKENS_PER_MINUTE = int(os.getenv("LLM_INPUT_TOKENS_PER_MINUTE", "30000"))
+LLM_OUTPUT_TOKENS_PER_MINUTE = int(os.getenv("LLM_OUTPUT_TOKENS_PER_MINUTE", "8000"))
+# Limits of specific models, e.g. {"anthropic/claude-haiku-4-5-20251001": {"itpm": 50000}};
+# "rpm", "itpm" and "otpm" not given use the limits above
+LLM_RATE_LIMITS = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+# Output tokens reserved for a call before its actual usage is known
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "400"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "30"))
+LLM_PRIORITY_AGING = float(os.getenv("LLM_PRIORITY_AGING", "20"))
+
+# Lower goes first
+PRIORITIES = {"Short Answer": 0, "Detailed Report": 1}
+# Rate limited, unavailable and overloaded (Anthropic's 529)
+RETRY_STATUS_CODES = {429, 503, 529}
+RATE_LIMIT_STATUS_CODE = 429
+
+_current_priority = contextvars.ContextVar("model_priority", default=0)
+
+
+@contextmanager
+def request_priority(priority):
+    """Give the model calls made in this context (and in managed agents) ``priority``"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def estimate_tokens(messages):
+    """Rough input token count of a prompt, about 4 characters per token"""
+    return len(str(messages)) // 4
+
+
+def _status(error):
+    return getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+
+
+def is_rate_limited(error):
+    """Whether the call was rejected because the key's quota for the model is spent"""
+    if _status(error) == RATE_LIMIT_STATUS_CODE:
+        return True
+    text = str(error).lower()
+    return "rate limit" in text or "rate_limit" in text
+
+
+def is_retryable(error):
+    if _status(error) in RETRY_STATUS_CODES or is_rate_limited(error):
+        return True
+    return "overloaded" in str(error).lower()
+
+
+def retry_after(error):
+    """Seconds the provider asked to wait, from the Retry-After header, or None"""
+    headers = getattr(error, "headers", None) or getattr(
+        getattr(error, "response", None), "headers", None
+    )
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refills ``per_minute`` units a minute, holding at most one minute's worth"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        """Seconds until ``amount`` units are available"""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        # A call larger than the whole bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount):
+        if self.capacity:
+            self.level -= amount
+
+    def drain(self):
+        if self.capacity:
+            self.level = min(self.level, 0.0)
+
+
+class _Ticket:
+    def __init__(self, priority, input_tokens, output_tokens):
+        self.priority = priority
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.queued_at = time.monotonic()
+
+    def rank(self, now):
+        aged = int((now - self.queued_at) / LLM_PRIORITY_AGING) if LLM_PRIORITY_AGING else 0
+        return self.priority - aged, self.queued_at
+
+
+class Attempt:
+    """One try of a model call, holding a slot; see ``ModelScheduler.attempts``"""
+
+    def __init__(self, scheduler, number, ticket):
+        self.scheduler = scheduler
+        self.number = number
+        self.ticket = ticket
+        self.usage = None
+        # Part of a streamed response already reached the caller: it cannot be retried
+        self.delivered = False
+        self.succeeded = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.scheduler._release(self.ticket, self.usage)
+        if error is None:
+            self.succeeded = True
+            return False
+        if (
+            not is_retryable(error)
+            or self.delivered
+            or self.number >= self.scheduler.max_retries
+        ):
+            self.scheduler._count("failed")
+            return False
+        rate_limited = is_rate_limited(error)
+        wait = self.scheduler._backoff(self.number, retry_after(error), rate_limited)
+        reason = "rate limited" if rate_limited else "rejected"
+        print(f"⏳ Model call {reason} ({type(error).__name__}), retrying in {wait:.1f}s")
+        time.sleep(wait)
+        return True
+
+
+class ModelScheduler:
+    """Admits model calls by priority within the rate limits and a concurrency cap"""
+
+    def __init__(
+        self,
+        requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+        input_tokens_per_minute=LLM_INPUT_TOKENS_PER_MINUTE,
+        output_tokens_per_minute=LLM_OUTPUT_TOKENS_PER_MINUTE,
+        max_concurrency=None,
+        max_retries=LLM_MAX_RETRIES,
+    ):
+        if max_concurrency is None:
+            from llm import LLM_MAX_CONCURRENCY
+
+            max_concurrency = LLM_MAX_CONCURRENCY
+        self.requests = TokenBucket(requests_per_minute)
+        self.input_tokens = TokenBucket(input_tokens_per_minute)
+        self.output_tokens = TokenBucket(output_tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self._waiting = []
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+        # (time, input tokens, output tokens) of the calls of the last minute
+        self._recent = deque()
+        self._counts = {"calls": 0, "retries": 0, "failed": 0}
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._waits_by_priority = {}
+
+    def _delay(self, ticket, now):
+        return max(
+            self._paused_until - now,
+            self.requests.delay(1, now),
+            self.input_tokens.delay(ticket.input_tokens, now),
+            self.output_tokens.delay(ticket.output_tokens, now),
+        )
+
+    def _acquire(self, ticket):
+        with self._condition:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    first = min(self._waiting, key=lambda waiting: waiting.rank(now))
+                    timeout = None
+                    if first is ticket and self.in_flight < self.max_concurrency:
+                        timeout = self._delay(ticket, now)
+                        if timeout <= 0:
+                            break
+                    elif LLM_PRIORITY_AGING:
+                        # Ranks change as tickets age
+                        timeout = LLM_PRIORITY_AGING
+                    self._condition.wait(timeout)
+                self.requests.take(1)
+                self.input_tokens.take(ticket.input_tokens)
+                self.output_tokens.take(ticket.output_tokens)
+                self.in_flight += 1
+                wait = time.monotonic() - ticket.queued_at
+                self._counts["calls"] += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+                waits = self._waits_by_priority.setdefault(ticket.priority, [0, 0.0])
+                waits[0] += 1
+                waits[1] += wait
+            finally:
+                self._waiting.remove(ticket)
+                # The next ticket in line may be admissible now
+                self._condition.notify_all()
+        return wait
+
+    def _release(self, ticket, usage):
+        with self._condition:
+            self.in_flight -= 1
+            if usage is not None:
+                # Correct the reservation with what the call actually used
+                input_tokens, output_tokens = usage
+                self.input_tokens.take(input_tokens - ticket.input_tokens)
+                self.output_tokens.take(output_tokens - ticket.output_tokens)
+            else:
+                input_tokens, output_tokens = ticket.input_tokens, ticket.output_tokens
+            self._recent.append((time.monotonic(), input_tokens, output_tokens))
+            self._condition.notify_all()
+
+    def _backoff(self, number, retry_after_seconds, rate_limited=True):
+        with self._condition:
+            self._counts["retries"] += 1
+            # Exponential backoff with full jitter, never less than what the provider asked for
+            wait = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2**number))
+            if retry_after_seconds is not None:
+                wait = max(wait, retry_after_seconds)
+            if rate_limited:
+                # The key's window is spent: admit no more calls until it refills. An overloaded
+                # provider says nothing about the quota, so only the rejected call waits
+                self.requests.drain()
+                if retry_after_seconds is not None:
+                    self._paused_until = max(
+                        self._paused_until, time.monotonic() + retry_after_seconds
+                    )
+            return wait
+
+    def _count(self, key):
+        with self._condition:
+            self._counts[key] += 1
+
+    def attempts(self, messages, priority=None):
+        """Tries of one model call, each admitted by the scheduler; use as
+        ``for attempt in scheduler.attempts(messages): with attempt: ...``. A retryable error
+        inside the ``with`` block is swallowed and the call tried again after a backoff."""
+        priority = _current_priority.get() if priority is None else priority
+        for number in range(self.max_retries + 1):
+            ticket = _Ticket(priority, estimate_tokens(messages), LLM_EXPECTED_OUTPUT_TOKENS)
+            queue_seconds = self._acquire(ticket)
+            attempt = Attempt(self, number, ticket)
+            attempt.queue_seconds = queue_seconds
+            yield attempt
+            if attempt.succeeded:
+                return
+
+    def stats(self):
+        with self._condition:
+            now = time.monotonic()
+            while self._recent and self._recent[0][0] < now - 60:
+                self._recent.popleft()
+            calls = self._counts["calls"]
+            return {
+                **self._counts,
+                "in_flight": self.in_flight,
+                "queued": len(self._waiting),
+                "requests_last_minute": len(self._recent),
+                "input_tokens_last_minute": sum(entry[1] for entry in self._recent),
+                "output_tokens_last_minute": sum(entry[2] for entry in self._recent),
+                "average_wait": self._total_wait / calls if calls else 0.0,
+                "max_wait": self._max_wait,
+                "average_wait_by_priority": {
+                    priority: total / count
+                    for priority, (count, total) in sorted(self._waits_by_priority.items())
+                },
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(model_id):
+    """The process-wide scheduler of the calls to ``model_id``, with that model's limits"""
+    with _schedulers_lock:
+        if model_id not in _schedulers:
+            limits = LLM_RATE_LIMITS.get(model_id, {})
+            _schedulers[model_id] = ModelScheduler(
+                limits.get("rpm", LLM_REQUESTS_PER_MINUTE),
+                limits.get("itpm", LLM_INPUT_TOKENS_PER_MINUTE),
+                limits.get("otpm", LLM_OUTPUT_TOKENS_PER_MINUTE),
+            )
+        return _schedulers[model_id]
+
+
+def set_scheduler(model_id, scheduler):
+    """Admit the calls to ``model_id`` through ``scheduler`` from now on, e.g. with other limits"""
+    with _schedulers_lock:
+        _schedulers[model_id] = scheduler
+
+
+def scheduler_stats():
+    """Stats of the scheduler of every model called so far"""
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {model_id: scheduler.stats() for model_id, scheduler in schedulers.items()}
@@ -0,0 +1,256 @@
+"""Compact catalog of the health database schema, with full DDL on demand.
+
+``system_info/schema.txt`` holds the CREATE TABLE and CREATE INDEX statements
+of every table of the remote (MCP) database (about 12 KB). The local database
+is created by ``health_importer.py`` from the SQLModel models, with typed
+values, the ``recordrollup`` table and other indexes, so its statements are
+generated from ``SQLModel.metadata`` instead. Instead of pasting all of it into the SQL
+agent's system prompt, which is paid again on every step, the prompt gets a
+one-line-per-table catalog and the agent fetches the full DDL of the tables a
+question needs with the ``get_table_schema`` tool. Tables are matched to a
+question by keywords, or by embedding similarity when
+``SCHEMA_EMBEDDING_MODEL`` names a LiteLLM embedding model. The schema is
+parsed once per process and backend.
+"""
+import json
+import os
+import re
+from functools import lru_cache
+
+from smolagents import tool
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "system_info", "schema.txt")
+SCHEMA_EMBEDDING_MODEL = os.getenv("SCHEMA_EMBEDDING_MODEL", "")
+# Tables returned for a question when none are named
+SCHEMA_MAX_TABLES = int(os.getenv("SCHEMA_MAX_TABLES", "3"))
+# Tables that answer most questions, returned when nothing matches
+DEFAULT_TABLES = ("record", "healthdata")
+# Bookkeeping columns shared by most tables; left out of the catalog and of keyword matching
+GENERIC_COLUMNS = {
+    "id",
+    "health_data_id",
+    "creation_date",
+    "source_version",
+    "device",
+}
+
+# What each table holds, in the words users ask with
+TABLE_DESCRIPTIONS = {
+    "activitysummary": (
+        "daily Activity rings: move (active energy), exercise minutes and stand hours with goals",
+        "activity rings move exercise stand calories energy goal daily",
+    ),
+    "audiogram": ("hearing test results", "hearing audiogram ear"),
+    "clinicalrecord": (
+        "FHIR clinical records imported from health providers",
+        "clinical lab medical doctor hospital fhir",
+    ),
+    "correlation": (
+        "grouped samples such as blood pressure and food entries",
+        "blood pressure systolic diastolic food nutrition meal correlation",
+    ),
+    "correlationrecord": ("links correlations to their records", "blood pressure food correlation"),
+    "eyeprescription": ("eyeglass and contact lens prescriptions", "eye glasses lens vision"),
+    "healthdata": (
+        "the owner of the export: date of birth, biological sex, blood type, skin type",
+        "age birth sex gender profile blood type user",
+    ),
+    "heartratevariabilitymetadatalist": (
+        "beat-to-beat lists attached to HRV records",
+        "hrv variability beat heart",
+    ),
+    "instantaneousbeatsperminute": (
+        "beat-to-beat heart rate inside an HRV list",
+        "hrv beat bpm heart",
+    ),
+    "metadataentry": (
+        "key/value metadata of records, workouts and other samples",
+        "metadata key value",
+    ),
+    "record": (
+        "every HealthKit sample by type: heart rate, resting heart rate, HRV, steps, distance, "
+        "energy, sleep, weight, SpO2, VO2max, respiratory rate",
+        "heart rate resting hrv variability steps walking running distance energy calories sleep "
+        "weight body mass oxygen spo2 saturation vo2max respiratory sample record trend",
+    ),
+    "recordrollup": (
+        "pre-aggregated count, average, minimum, maximum and sum of numeric records per type "
+        "and hour or day",
+        "rollup daily hourly average total sum minimum maximum trend aggregate",
+    ),
+    "sensitivitypoint": ("frequency points of an audiogram", "hearing audiogram frequency"),
+    "visionattachment": ("files attached to vision prescriptions", "vision eye attachment"),
+    "visionprescription": ("vision prescriptions", "vision eye glasses lens"),
+    "workout": (
+        "workouts with activity type, duration, distance and energy",
+        "workout exercise training run running walk cycling swim swimming duration distance",
+    ),
+    "workoutevent": ("pause, resume, lap and segment events of a workout", "workout lap segment"),
+    "workoutroute": ("GPS routes of workouts", "workout route gps location map"),
+    "workoutstatistics": (
+        "per-workout statistics by type, e.g. average heart rate or energy during a workout",
+        "workout statistics heart rate energy average",
+    ),
+}
+
+
+class Table:
+    """One table of the schema, with its DDL, indexes and column names"""
+
+    def __init__(self, name, ddl):
+        self.name = name
+        self.ddl = ddl
+        self.indexes = []
+        self.columns = [
+            column
+            for column in re.findall(r"^\s*(\w+) [A-Z]+", ddl.split("(", 1)[1], re.MULTILINE)
+            if column not in ("PRIMARY", "FOREIGN", "UNIQUE", "CHECK", "CONSTRAINT")
+        ]
+        self.description, keywords = TABLE_DESCRIPTIONS.get(name, ("", ""))
+        self.keywords = set(_words(f"{name} {keywords} {' '.join(self.main_columns)}"))
+
+    @property
+    def main_columns(self):
+        """Columns other than bookkeeping and units"""
+        return [
+            column
+            for column in self.columns
+            if column not in GENERIC_COLUMNS and not column.endswith("_unit")
+        ]
+
+    @property
+    def full_ddl(self):
+        return "\n".join([self.ddl, *self.indexes])
+
+    @property
+    def summary(self):
+        description = f" -- {self.description}" if self.description else ""
+        return f"{self.name}({', '.join(self.main_columns)}){description}"
+
+
+def _words(text):
+    # Column names are snake_case; crude singulars so 'workouts' matches 'workout'
+    words = re.findall(r"[a-z0-9]+", text.lower().replace("_", " "))
+    return [word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words]
+
+
+class SchemaCatalog:
+    """The parsed schema: tables by name with a compact catalog and relevance ranking"""
+
+    def __init__(self, statements, embed=None):
+        self.tables = {}
+        for statement in statements:
+            match = re.match(r"CREATE TABLE (\w+)", statement)
+            if match:
+                self.tables[match.group(1)] = Table(match.group(1), statement)
+        for statement in statements:
+            match = re.match(r"CREATE (?:UNIQUE )?INDEX \w+ ON (\w+)", statement)
+            if match and match.group(1) in self.tables:
+                self.tables[match.group(1)].indexes.append(statement)
+        self.embed = embed
+        self._table_vectors = None
+
+    @classmethod
+    def from_file(cls, path=SCHEMA_PATH, embed=None):
+        """The schema dumped from the remote database"""
+        with open(path) as file:
+            return cls([next(iter(entry.values())) for entry in json.load(file)], embed)
+
+    @classmethod
+    def from_models(cls, embed=None):
+        """The schema the local database is created with"""
+        from sqlalchemy.dialects import sqlite
+        from sqlalchemy.schema import CreateIndex, CreateTable
+        from sqlmodel import SQLModel
+
+        import system_info.models  # noqa: F401 - registers the tables on SQLModel.metadata
+
+        dialect = sqlite.dialect()
+        statements = []
+        for table in SQLModel.metadata.sorted_tables:
+            statements.append(str(CreateTable(table).compile(dialect=dialect)).strip() + ";")
+            statements.extend(
+                str(CreateIndex(index).compile(dialect=dialect)).strip() + ";"
+                for index in sorted(table.indexes, key=lambda index: index.name)
+            )
+        return cls(statements, embed)
+
+    def catalog(self):
+        """One line per table: its main columns and what it holds"""
+        return "\n".join(f"- {table.summary}" for table in self.tables.values())
+
+    def ddl(self, names):
+        return "\n\n".join(self.tables[name].full_ddl for name in names)
+
+    def _keyword_scores(self, question):
+        words = set(_words(question))
+        return {
+            name: len(words & table.keywords) + 2 * (table.name in words)
+            for name, table in self.tables.items()
+        }
+
+    def _embedding_scores(self, question):
+        from answer_cache import _cosine
+
+        if self._table_vectors is None:
+            self._table_vectors = {
+                name: self.embed(f"{table.summary}\n{' '.join(sorted(table.keywords))}")
+                for name, table in self.tables.items()
+            }
+        vector = self.embed(question)
+        return {name: _cosine(vector, table) for name, table in self._table_vectors.items()}
+
+    def relevant_tables(self, question, limit=SCHEMA_MAX_TABLES):
+        """Names of the tables that best match ``question``, best first"""
+        scores = (
+            self._embedding_scores(question) if self.embed else self._keyword_scores(question)
+        )
+        # Ties go to the tables that answer most questions
+        ranked = sorted(
+            (name for name, score in scores.items() if score > 0),
+            key=lambda name: (-scores[name], name not in DEFAULT_TABLES),
+        )
+        return ranked[:limit] or list(DEFAULT_TABLES)
+
+
+def load_schema_catalog(backend=None):
+    """The catalog of the database of ``backend`` (HEALTH_SQL_BACKEND by default)"""
+    from sql_agent import SQL_BACKEND
+
+    return _load_schema_catalog(backend or SQL_BACKEND)
+
+
+@lru_cache(maxsize=None)
+def _load_schema_catalog(backend):
+    embed = None
+    if SCHEMA_EMBEDDING_MODEL:
+        from answer_cache import litellm_embedding
+
+        embed = litellm_embedding(SCHEMA_EMBEDDING_MODEL)
+    if backend == "local":
+        return SchemaCatalog.from_models(embed=embed)
+    return SchemaCatalog.from_file(embed=embed)
+
+
+@tool
+def get_table_schema(tables: str = "", question: str = "") -> str:
+    """Full CREATE TABLE statements, column types and indexes of health database tables.
+
+    Args:
+        tables: Comma-separated table names from the table catalog, e.g. 'record, workout'.
+        question: When no tables are given, the tables that best match this question are returned.
+
+    Returns:
+        The DDL of the requested tables, or a message listing the known tables.
+    """
+    catalog = load_schema_catalog()
+    names = [name.strip().lower() for name in tables.split(",") if name.strip()]
+    unknown = [name for name in names if name not in catalog.tables]
+    if unknown:
+        return (
+            f"Unknown table(s): {', '.join(unknown)}. "
+            f"Known tables: {', '.join(catalog.tables)}."
+        )
+    if not names:
+        names = catalog.relevant_tables(question)
+    return catalog.ddl(names)
@@ -1,55 +1,137 @@
-from smolagents import CodeAgent, LiteLLMModel, MCPClient
-from mcp import StdioServerParameters
+from contextlib import contextmanager
+import atexit
+import threading
 import os
 from dotenv import load_dotenv
+from llm import get_model
 
 load_dotenv()
 
-model = LiteLLMModel(model_id="anthropic/claude-sonnet-4-20250514", temperature=0.2)
+SQL_TOOL_NAME = "health_data_real_mcp_execute_sql_query"
 
-SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "system_info", "schema.txt")
+# Extra columns and tables only present in the database built by health_importer.py
+LOCAL_SCHEMA_NOTES = """
+    The database also provides typed values and pre-aggregated rollups. Prefer them for aggregates:
+    - record.value_numeric (FLOAT): record.value parsed as a number, NULL for category values.
+      Use it instead of CAST(value AS REAL).
+    - recordrollup(type, period, bucket, unit, count, average, minimum, maximum, sum): one row per
+      record type and bucket, with period 'day' (bucket 'YYYY-MM-DD') or 'hour' (bucket 'YYYY-MM-DD HH:00:00').
+      Example, weekly average resting heart rate:
+      SELECT strftime('%Y-%W', bucket) AS week, SUM(sum) / SUM(count) AS avg_bpm FROM recordrollup
+      WHERE type = 'HKQuantityTypeIdentifierRestingHeartRate' AND period = 'day' AND bucket >= '2024-01-01'
+      GROUP BY week
+"""
 
 
-def load_schema():
-    with open(SCHEMA_PATH, "r") as file:
-        schema = file.read()
-    return schema
+ANALYTICS_NOTES = """
+    You also have analytical tools that aggregate inside the database and return compact JSON summaries.
+    ALWAYS prefer them over SQL that returns raw rows, and never return more than a few dozen rows:
+    {tools}
+"""
+
+
+def get_analytics_notes():
+    from analytics import ANALYTICS_TOOLS
+
+    tools = "\n\n".join(tool.to_code_prompt() for tool in ANALYTICS_TOOLS)
+    return ANALYTICS_NOTES.format(tools=tools)
+
+
+SCHEMA_NOTES = """
+    The tables of the database, with their main columns (the id primary keys, bookkeeping and unit columns omitted):
+
+    {catalog}
+
+    Before querying a table whose exact columns, types or indexes you are not sure of, get its full
+    CREATE TABLE statement and indexes with this tool (several tables in one call):
+    {tool}
+"""
+
+
+def get_schema_notes():
+    from schema_catalog import get_table_schema, load_schema_catalog
+
+    return SCHEMA_NOTES.format(
+        catalog=load_schema_catalog().catalog(), tool=get_table_schema.to_code_prompt()
+    )
 
 
 def get_schema_description():
-    schema = load_schema()
+    local_notes = LOCAL_SCHEMA_NOTES + get_analytics_notes() if SQL_BACKEND == "local" else ""
     return f"""
     You are a SQL explorer. Your job is to perform SQL queries on a personal apple health database.
 
-    **IMPORTANT** ALWAYS USE the following tool to query the database: health_data_real_mcp_execute_sql_query.
+    **IMPORTANT** ALWAYS USE the following tool to query the database: {SQL_TOOL_NAME}.
+    {get_schema_notes()}
+    {local_notes}
+    """
+
 
-    The schema of the database is defined as follow:
+_mcp_manager = None
+_mcp_manager_lock = threading.Lock()
 
-    {schema}
-    """
+
+def get_mcp_manager():
+    """The process-wide MCP connection manager, connected on first use"""
+    global _mcp_manager
+    with _mcp_manager_lock:
+        if _mcp_manager is None:
+            from mcp_manager import MCPConnectionManager
+
+            _mcp_manager = MCPConnectionManager(
+                probe=lambda tools: tools[SQL_TOOL_NAME](sql_query="SELECT 1")
+            )
+            atexit.register(_mcp_manager.close)
+        return _mcp_manager
+
+
+# "mcp" connects to the remote Space, "local" queries HEALTH_DB_PATH in-process
+SQL_BACKEND = os.getenv("HEALTH_SQL_BACKEND", "mcp")
 
 
-HF_TOKEN = os.getenv("HF_TOKEN")
+def health_data_version():
+    """Version stamp of the health data behind the configured backend"""
+    if SQL_BACKEND == "local":
+        from local_sql import data_version
 
-SERVER_PARAMETERS = StdioServerParameters(
-    command="npx",  # Using uvx ensures dependencies are available
-    args=[
-        "-y",
-        "mcp-remote@latest",
-        "https://grlll-health-data-real-mcp.hf.space/gradio_api/mcp/sse",
-        "--transport",
-        "sse-only",
-        "--header",
-        f"Authorization: Bearer {HF_TOKEN}",
-    ],
-    env={**os.environ},
-)
+        return data_version()
+    # The remote database changes out of our sight; deployments bump this when it is refreshed
+    return "mcp:" + os.getenv("HEALTH_DATA_VERSION", "0")
+
+
+def get_sql_tools(backend=None):
+    """The SQL tools for the configured backend, imported or connected on first use"""
+    backend = backend or SQL_BACKEND
+    if backend == "local":
+        from analytics import ANALYTICS_TOOLS
+        from local_sql import health_data_real_mcp_execute_sql_query
+
+        return [health_data_real_mcp_execute_sql_query, *ANALYTICS_TOOLS]
+    if backend == "mcp":
+        # The connections are shared by every agent and closed at exit
+        return get_mcp_manager().tools
+    raise ValueError(f"Unknown HEALTH_SQL_BACKEND: {backend!r} (expected 'mcp' or 'local')")
+
+
+@contextmanager
+def open_sql_tools(backend=None):
+    """Yield the SQL tools for the configured backend"""
+    yield get_sql_tools(backend)
 
 
 def create_sql_agent(tools):
+    from smolagents import CodeAgent
+    from code_executor import code_executor
+    from schema_catalog import get_table_schema
+    from sql_cache import with_sql_cache
+
     agent = CodeAgent(
-        tools=tools,
-        model=model,
+        tools=[
+            *with_sql_cache(tools, SQL_TOOL_NAME, data_version=health_data_version),
+            get_table_schema,
+        ],
+        model=get_model("sql_query_agent_health"),
+        executor=code_executor(),
         name="sql_query_agent_health",
         description="A SQL query agent that can query the database with comprehensive personal health data.",
     )
@@ -58,7 +140,7 @@ def create_sql_agent(tools):
 
 
 if __name__ == "__main__":
-    with MCPClient(SERVER_PARAMETERS) as tools:
+    with open_sql_tools() as tools:
         agent = create_sql_agent(tools)
 
         result = agent.run("What is my heart health?")
@@ -0,0 +1,160 @@
+"""LRU cache of SQL tool results shared by every SQL agent.
+
+Queries are keyed on their canonical text (comments stripped, whitespace collapsed
+and keywords lowercased outside string literals), results are kept within a byte
+budget, and the cache is cleared whenever the data version changes or a query
+that writes to the database goes through the tool.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from smolagents import Tool
+
+SQL_CACHE_MAX_BYTES = int(os.getenv("SQL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+READ_ONLY_STATEMENTS = ("select", "with", "explain", "values")
+
+# Quoted literals/identifiers, then comments; everything else is normalized
+_TOKENS = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|(--[^\n]*|/\*.*?\*/)", re.S)
+
+
+def _normalize_code(segment):
+    segment = re.sub(r"\s+", " ", segment).lower()
+    return re.sub(r" ?([(),=<>]) ?", r"\1", segment)
+
+
+def canonicalize_sql(sql):
+    """Canonical form of a query, used as the cache key"""
+    parts = []
+    code = ""
+    position = 0
+    for match in _TOKENS.finditer(sql):
+        code += sql[position : match.start()]
+        position = match.end()
+        if match.group(1):
+            # Literals are kept verbatim
+            parts.append(_normalize_code(code))
+            parts.append(match.group(1))
+            code = ""
+        else:
+            code += " "
+    parts.append(_normalize_code(code + sql[position:]))
+    return "".join(parts).strip().rstrip("; ")
+
+
+def _size(result):
+    return len(result.encode()) if isinstance(result, str) else len(repr(result))
+
+
+class SQLResultCache:
+    """Thread-safe LRU mapping canonical SQL to tool results, bounded in bytes"""
+
+    def __init__(self, max_bytes=SQL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.data_version = None
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        size = _size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (result, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.invalidations += 1
+
+    def check_version(self, data_version):
+        """Clear the cache when the underlying data has changed"""
+        if data_version != self.data_version:
+            if self.data_version is not None:
+                self.invalidate()
+            self.data_version = data_version
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+sql_result_cache = SQLResultCache()
+
+
+class CachedSQLTool(Tool):
+    """Wraps a SQL tool (MCP or local) and serves repeated read queries from the cache"""
+
+    skip_forward_signature_validation = True
+
+    def __init__(self, tool, cache=sql_result_cache, data_version=None):
+        self.tool = tool
+        self.sql_argument = next(iter(tool.inputs), None)
+        self.cache = cache
+        self.data_version = data_version
+        self.name = tool.name
+        self.description = tool.description
+        self.inputs = tool.inputs
+        self.output_type = tool.output_type
+        self.output_schema = getattr(tool, "output_schema", None)
+        super().__init__()
+        self.is_initialized = True
+
+    def forward(self, *args, **kwargs):
+        sql = kwargs.get(self.sql_argument, args[0] if args else None)
+        if not isinstance(sql, str) or self.cache.max_bytes <= 0:
+            return self.tool(*args, **kwargs)
+        if self.data_version is not None:
+            self.cache.check_version(self.data_version())
+
+        key = canonicalize_sql(sql)
+        if not key.startswith(READ_ONLY_STATEMENTS):
+            self.cache.invalidate()
+            return self.tool(*args, **kwargs)
+
+        result = self.cache.get(key)
+        if result is None:
+            result = self.tool(*args, **kwargs)
+            if not (isinstance(result, str) and result.startswith("Error")):
+                self.cache.put(key, result)
+        return result
+
+
+def with_sql_cache(tools, sql_tool_name, data_version=None):
+    """Return ``tools`` with the SQL tool wrapped in a CachedSQLTool"""
+    return [
+        CachedSQLTool(tool, data_version=data_version) if tool.name == sql_tool_name else tool
+        for tool in tools
+    ]
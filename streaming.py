@@ -0,0 +1,82 @@
+"""Incremental text of a streaming manager run, for the chat UI.
+
+With ``stream_outputs`` the manager's model output arrives token by token as
+``ChatMessageStreamDelta`` events. Each step is a thought followed by a code
+block, and the answer is the string literal passed to ``final_answer(...)``
+in the last one. ``run_streaming`` runs an agent with ``stream=True`` and
+reports the current step's thought and the part of the final answer written
+so far, so the UI can show them before the run returns.
+"""
+import os
+import re
+import time
+
+STREAM_ANSWERS = os.getenv("STREAM_ANSWERS", "1") == "1"
+
+CODE_START = re.compile(r"<code>|```(?:py|python)?\n")
+FINAL_ANSWER_CALL = re.compile(r"final_answer\(\s*(?:answer\s*=\s*)?([rRfF]{0,2})(\"\"\"|'''|\"|')")
+ESCAPES = {"n": "\n", "t": "\t", '"': '"', "'": "'", "\\": "\\"}
+
+
+def thought_text(output):
+    """The reasoning before the code block of a step, without the 'Thought:' prefix"""
+    thought = CODE_START.split(output, maxsplit=1)[0]
+    return re.sub(r"^\s*Thought:\s*", "", thought).strip()
+
+
+def final_answer_text(output):
+    """The part of the string literal passed to final_answer() written so far, or None"""
+    match = FINAL_ANSWER_CALL.search(output)
+    if match is None:
+        return None
+    prefix, quote = match.group(1).lower(), match.group(2)
+    raw, formatted = "r" in prefix, "f" in prefix
+    text, position = [], match.end()
+    while position < len(output):
+        if output.startswith(quote, position):
+            break
+        character = output[position]
+        # Placeholders are only known once the code runs: stop at the first one
+        if formatted and character == "{":
+            if output.startswith("{{", position):
+                text.append("{")
+                position += 2
+                continue
+            break
+        if character == "\\" and not raw:
+            if position + 1 == len(output):
+                break
+            text.append(ESCAPES.get(output[position + 1], output[position : position + 2]))
+            position += 2
+            continue
+        text.append(character)
+        position += 1
+    return "".join(text)
+
+
+def run_streaming(agent, task, report, **run_kwargs):
+    """Run ``agent`` on ``task`` with streaming and call ``report(thought=..., answer=...)``
+    whenever the visible text changes; returns the final answer and the time of its first token
+    """
+    from smolagents import ActionStep, ChatMessageStreamDelta, FinalAnswerStep
+
+    output, last, first_token_at = "", (None, None), None
+    final_answer = None
+    # Read the stream to its end, so that the run (and its trace span) finishes normally
+    for event in agent.run(task, stream=True, **run_kwargs):
+        if isinstance(event, ChatMessageStreamDelta):
+            output += event.content or ""
+            answer = final_answer_text(output)
+            visible = (thought_text(output), answer or None)
+            if visible != last:
+                last = visible
+                if answer and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                report(thought=visible[0], answer=visible[1])
+        elif isinstance(event, ActionStep):
+            output = ""
+        elif isinstance(event, FinalAnswerStep):
+            final_answer = event
+    if final_answer is None:
+        raise RuntimeError("The agent run ended without a final answer")
+    return final_answer.output, first_token_at
@@ -2,6 +2,7 @@ from datetime import datetime
 from enum import Enum
 from typing import TYPE_CHECKING, Optional
 
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import Field, Relationship, SQLModel
 
 if TYPE_CHECKING:
@@ -78,13 +79,18 @@ class HealthData(SQLModel, table=True):
 class MetadataEntry(SQLModel, table=True):
     """Key-value metadata entries with proper polymorphic pattern"""
 
+    __table_args__ = (
+        # Lookup of all metadata of one parent, optionally for a given key
+        Index("ix_metadataentry_parent", "parent_type", "parent_id", "key"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     key: str = Field(index=True)
     value: str
 
     # Polymorphic discriminator and ID
-    parent_type: str = Field(index=True)  # 'record', 'correlation', 'workout', etc.
-    parent_id: int = Field(index=True)
+    parent_type: str  # 'record', 'correlation', 'workout', etc.
+    parent_id: int
 
 
 class CorrelationRecord(SQLModel, table=True):
@@ -97,10 +103,16 @@ class CorrelationRecord(SQLModel, table=True):
 class Record(SourcedBase, table=True):
     """Generic health record"""
 
+    __table_args__ = (
+        # Covering index for "type = ? AND start_date BETWEEN ?" scans and aggregates
+        Index("ix_record_type_start_date", "type", "start_date", "value", "value_numeric"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    type: str = Field(index=True)  # Indexed for filtering
+    type: str  # Indexed for filtering through ix_record_type_start_date
     unit: str | None = None
     value: str | None = None
+    value_numeric: float | None = None  # value parsed at import time, NULL for categories
 
     # Foreign key
     health_data_id: int | None = Field(default=None, foreign_key="healthdata.id", index=True)
@@ -117,6 +129,23 @@ class Record(SourcedBase, table=True):
     )
 
 
+class RecordRollup(SQLModel, table=True):
+    """Pre-aggregated numeric record values per type and hour/day bucket"""
+
+    __table_args__ = (UniqueConstraint("type", "period", "bucket"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    type: str
+    period: str  # 'hour' or 'day'
+    bucket: str  # 'YYYY-MM-DD' for days, 'YYYY-MM-DD HH:00:00' for hours
+    unit: str | None = None
+    count: int
+    average: float | None = None
+    minimum: float | None = None
+    maximum: float | None = None
+    sum: float | None = None
+
+
 class Correlation(SourcedBase, table=True):
     """Groups related records together"""
 
@@ -161,8 +190,12 @@ class InstantaneousBeatsPerMinute(SQLModel, table=True):
 class Workout(SourcedBase, table=True):
     """Workout activity record"""
 
+    __table_args__ = (
+        Index("ix_workout_activity_type_start_date", "workout_activity_type", "start_date"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    workout_activity_type: str = Field(index=True)
+    workout_activity_type: str  # Indexed through ix_workout_activity_type_start_date
     duration: float | None = None
     duration_unit: str | None = None
     total_distance: float | None = None
@@ -1,8 +1,272 @@
+"""Web page fetching for the web search agent.
+
+Pages are fetched through one shared, connection-pooled session with connect/read
+timeouts, an overall deadline and a byte cap on the streamed body. Converted
+pages are kept in an on-disk cache and revalidated with ETag/Last-Modified once
+they are older than ``WEB_CACHE_TTL``; pages cut off by the byte cap or the
+deadline are only kept for ``WEB_CACHE_TRUNCATED_TTL`` and then fetched again.
+The least recently used pages are evicted past ``WEB_CACHE_MAX_BYTES``. Only
+the main content of a page is converted to Markdown, truncated to
+``WEB_MAX_MARKDOWN_CHARS``.
+"""
+import hashlib
+import json
+import os
 import re
+import statistics
+import threading
+import time
+from collections import deque
+
 import requests
+from bs4 import BeautifulSoup
 from markdownify import markdownify
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 from smolagents import tool
+from urllib3.util.retry import Retry
+
+WEB_CONNECT_TIMEOUT = float(os.getenv("WEB_CONNECT_TIMEOUT", "5"))
+WEB_READ_TIMEOUT = float(os.getenv("WEB_READ_TIMEOUT", "15"))
+WEB_FETCH_DEADLINE = float(os.getenv("WEB_FETCH_DEADLINE", "20"))
+WEB_MAX_BYTES = int(os.getenv("WEB_MAX_BYTES", str(2 * 1024 * 1024)))
+WEB_MAX_MARKDOWN_CHARS = int(os.getenv("WEB_MAX_MARKDOWN_CHARS", "20000"))
+WEB_POOL_SIZE = int(os.getenv("WEB_POOL_SIZE", "16"))
+WEB_CACHE_DIR = os.getenv("WEB_CACHE_DIR", os.path.join(os.path.dirname(__file__), ".web_cache"))
+WEB_CACHE_TTL = float(os.getenv("WEB_CACHE_TTL", str(3600)))
+WEB_CACHE_TRUNCATED_TTL = float(os.getenv("WEB_CACHE_TRUNCATED_TTL", "300"))
+WEB_CACHE_MAX_BYTES = int(os.getenv("WEB_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+USER_AGENT = "Mozilla/5.0 (compatible; HealthAssistant/1.0)"
+
+# Page chrome that is never part of the main content
+BOILERPLATE_TAGS = [
+    "script",
+    "style",
+    "noscript",
+    "svg",
+    "iframe",
+    "form",
+    "nav",
+    "header",
+    "footer",
+    "aside",
+]
+
+
+def _create_session():
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+    adapter = HTTPAdapter(
+        pool_connections=WEB_POOL_SIZE, pool_maxsize=WEB_POOL_SIZE, max_retries=retry
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+session = _create_session()
+
+
+class FetchStats:
+    """Latency and size of the most recent fetches"""
+
+    def __init__(self, size=1000):
+        self.calls = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, url, status, seconds, size):
+        with self._lock:
+            self.calls.append({"url": url, "status": status, "seconds": seconds, "bytes": size})
+
+    def stats(self):
+        with self._lock:
+            calls = list(self.calls)
+        if not calls:
+            return {"calls": 0}
+        timings = sorted(call["seconds"] for call in calls)
+        statuses = {}
+        for call in calls:
+            statuses[call["status"]] = statuses.get(call["status"], 0) + 1
+        return {
+            "calls": len(calls),
+            "p50_seconds": statistics.median(timings),
+            "p95_seconds": timings[min(len(timings) - 1, int(0.95 * len(timings)))],
+            "bytes": sum(call["bytes"] for call in calls),
+            "statuses": statuses,
+        }
+
+
+fetch_stats = FetchStats()
+
+
+class PageCache:
+    """On-disk LRU cache of converted pages with their validators"""
+
+    def __init__(
+        self,
+        directory=WEB_CACHE_DIR,
+        ttl=WEB_CACHE_TTL,
+        truncated_ttl=WEB_CACHE_TRUNCATED_TTL,
+        max_bytes=WEB_CACHE_MAX_BYTES,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.truncated_ttl = truncated_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(entry.stat().st_size for entry in self._entries())
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with open(path) as file:
+                entry = json.load(file)
+            # The modification time orders entries for eviction
+            os.utime(path)
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, entry):
+        # Write then rename, so concurrent readers never see a partial file
+        path = self._path(url)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(entry, file)
+        size = os.path.getsize(temporary)
+        os.replace(temporary, path)
+        with self._lock:
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Remove the least recently used pages until the cache is back under 90% of max_bytes"""
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        self._bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._bytes <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._bytes -= size
+
+    def is_fresh(self, entry):
+        ttl = self.truncated_ttl if entry.get("truncated") else self.ttl
+        return time.time() - entry["fetched_at"] < ttl
+
+
+page_cache = PageCache()
+
+
+def _read_body(response):
+    """Stream the body up to WEB_MAX_BYTES and the overall deadline"""
+    deadline = time.monotonic() + WEB_FETCH_DEADLINE
+    chunks, size, truncated = [], 0, False
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= WEB_MAX_BYTES or time.monotonic() > deadline:
+            truncated = True
+            break
+    body = b"".join(chunks)[:WEB_MAX_BYTES]
+    return body, truncated
+
+
+def html_to_markdown(html):
+    """Markdown of the main content of a page, without navigation and other chrome"""
+    # Given bytes, BeautifulSoup detects the encoding from the page itself
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    content = soup.find("main") or soup.find("article") or soup.body or soup
+    markdown_content = markdownify(str(content)).strip()
+    # Remove multiple line breaks
+    return re.sub(r"\n{3,}", "\n\n", markdown_content)
+
+
+def _truncate(markdown_content):
+    if len(markdown_content) <= WEB_MAX_MARKDOWN_CHARS:
+        return markdown_content
+    return markdown_content[:WEB_MAX_MARKDOWN_CHARS] + "\n\n[Page truncated]"
+
+
+def fetch_markdown(url):
+    """Fetch ``url`` (from the cache when possible) and return its content as Markdown"""
+    start = time.perf_counter()
+    cached = page_cache.get(url)
+    if cached is not None and page_cache.is_fresh(cached):
+        fetch_stats.record(url, "cached", time.perf_counter() - start, 0)
+        return cached["markdown"]
+
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        response = session.get(
+            url, headers=headers, stream=True, timeout=(WEB_CONNECT_TIMEOUT, WEB_READ_TIMEOUT)
+        )
+    except RequestException:
+        fetch_stats.record(url, "error", time.perf_counter() - start, 0)
+        raise
+    with response:
+        if response.status_code == 304 and cached is not None:
+            cached["fetched_at"] = time.time()
+            page_cache.put(url, cached)
+            fetch_stats.record(url, 304, time.perf_counter() - start, 0)
+            return cached["markdown"]
+        if not response.ok:
+            fetch_stats.record(url, response.status_code, time.perf_counter() - start, 0)
+        response.raise_for_status()  # Raise an exception for bad status codes
+        body, truncated = _read_body(response)
+        content_type = response.headers.get("Content-Type", "")
+        if "html" in content_type or not content_type:
+            markdown_content = html_to_markdown(body)
+        elif content_type.startswith("text/") or "json" in content_type:
+            markdown_content = body.decode(response.encoding or "utf-8", errors="replace").strip()
+        else:
+            markdown_content = f"Unsupported content type {content_type!r}"
+        markdown_content = _truncate(markdown_content)
+        if truncated:
+            markdown_content += "\n\n[Download stopped at the size or time limit]"
+
+        page_cache.put(
+            url,
+            {
+                "url": url,
+                # An incomplete page is fetched again rather than revalidated
+                "etag": None if truncated else response.headers.get("ETag"),
+                "last_modified": None if truncated else response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+                "truncated": truncated,
+                "markdown": markdown_content,
+            },
+        )
+        fetch_stats.record(url, response.status_code, time.perf_counter() - start, len(body))
+        return markdown_content
+
 
 @tool
 def visit_webpage(url: str) -> str:
@@ -15,20 +279,9 @@ def visit_webpage(url: str) -> str:
         The content of the webpage converted to Markdown, or an error message if the request fails.
     """
     try:
-        # Send a GET request to the URL
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an exception for bad status codes
-
-        # Convert the HTML content to Markdown
-        markdown_content = markdownify(response.text).strip()
-
-        # Remove multiple line breaks
-        markdown_content = re.sub(r"\n{3,}", "\n\n", markdown_content)
-
-        return markdown_content
+        return fetch_markdown(url)
 
     except RequestException as e:
         return f"Error fetching the webpage: {str(e)}"
     except Exception as e:
         return f"An unexpected error occurred: {str(e)}"
-    
\ No newline at end of file
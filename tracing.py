@@ -0,0 +1,323 @@
+"""Per-run tracing of the agents, exported as OpenTelemetry-style JSONL spans.
+
+Every chat run is one trace. ``install_tracing`` wraps an agent tree so that
+each agent run (the manager and every managed-agent call), each agent step,
+each tool call and each model request becomes a span nested under the one
+that was active when it started. Spans record their duration, token counts
+and payload sizes, and are appended to ``TRACE_PATH`` as one JSON object per
+line, with the field names of the OpenTelemetry span model. Run this module to
+print p50/p95 latency per stage:
+
+    python tracing.py [traces/spans.jsonl]
+"""
+import contextvars
+import functools
+import json
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from llm import cached_input_tokens
+
+TRACING = os.getenv("TRACING", "1") == "1"
+TRACE_PATH = os.getenv(
+    "TRACE_PATH", os.path.join(os.path.dirname(__file__), "traces", "spans.jsonl")
+)
+# The file is rotated to TRACE_PATH + ".1" past this size
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation of a trace"""
+
+    def __init__(self, name, kind, parent=None, **attributes):
+        self.name = name
+        self.kind = kind
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        # Spans inherit the agent they run in, so model and tool calls can be grouped by agent
+        self.attributes = {"agent": parent.attributes.get("agent")} if parent else {}
+        self.attributes.update(attributes)
+        self.status = "OK"
+        self.start_time = time.time_ns()
+        self.end_time = None
+
+    def set(self, **attributes):
+        self.attributes.update(
+            {key: value for key, value in attributes.items() if value is not None}
+        )
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "duration_ms": (self.end_time - self.start_time) / 1e6,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Appends finished spans to a JSONL file"""
+
+    def __init__(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+            except OSError:
+                pass
+            with open(self.path, "a") as file:
+                file.write(line)
+
+
+class Tracer:
+    """Creates nested spans in the current context and exports them when they end"""
+
+    def __init__(self, exporter=None, enabled=TRACING):
+        self.enabled = enabled
+        self._exporter = exporter
+
+    @property
+    def exporter(self):
+        # Created on first use so importing this module never touches the disk
+        if self._exporter is None:
+            self._exporter = SpanExporter()
+        return self._exporter
+
+    @contextmanager
+    def span(self, name, kind="internal", **attributes):
+        if not self.enabled:
+            yield Span(name, kind)
+            return
+        span = Span(name, kind, _current_span.get(), **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "ERROR"
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time_ns()
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                print(f"⚠️  Could not export span {name}: {e}")
+
+
+tracer = Tracer()
+
+
+def current_span():
+    return _current_span.get()
+
+
+def _size(value):
+    return len(str(value)) if value is not None else 0
+
+
+def _token_usage(message):
+    usage = getattr(message, "token_usage", None)
+    if usage is None:
+        return {}
+    return {"input_tokens": usage.input_tokens, "output_tokens": usage.output_tokens}
+
+
+def _cached_tokens(message):
+    """Input tokens read from the provider's prompt cache, when the raw response reports them"""
+    return cached_input_tokens(getattr(getattr(message, "raw", None), "usage", None))
+
+
+def _trace_model(model):
+    """Wrap the model's generate methods in "model" spans; the model is shared by all agents"""
+    if getattr(model, "_traced", False):
+        return
+    generate = model.generate
+
+    @functools.wraps(generate)
+    def traced_generate(messages, *args, **kwargs):
+        with tracer.span("model.generate", "model", model=model.model_id) as span:
+            span.set(input_chars=_size(messages), messages=len(messages))
+            response = generate(messages, *args, **kwargs)
+            span.set(
+                output_chars=_size(response.content),
+                cached_input_tokens=_cached_tokens(response),
+                **_token_usage(response),
+            )
+            return response
+
+    model.generate = traced_generate
+    generate_stream = getattr(model, "generate_stream", None)
+    if generate_stream is not None:
+
+        @functools.wraps(generate_stream)
+        def traced_generate_stream(messages, *args, **kwargs):
+            with tracer.span("model.generate_stream", "model", model=model.model_id) as span:
+                span.set(input_chars=_size(messages), messages=len(messages))
+                output_chars, usage = 0, {}
+                for delta in generate_stream(messages, *args, **kwargs):
+                    output_chars += _size(delta.content)
+                    usage = _token_usage(delta) or usage
+                    yield delta
+                span.set(output_chars=output_chars, **usage)
+
+        model.generate_stream = traced_generate_stream
+    model._traced = True
+
+
+def _trace_tool(tool):
+    """Wrap a tool's forward in a "tool" span; tools may be shared between agents"""
+    if getattr(tool, "_traced", False):
+        return
+    forward = tool.forward
+
+    @functools.wraps(forward)
+    def traced_forward(*args, **kwargs):
+        with tracer.span(f"tool.{tool.name}", "tool", tool=tool.name) as span:
+            span.set(input_chars=_size(args) + _size(kwargs))
+            result = forward(*args, **kwargs)
+            span.set(output_chars=_size(result))
+            return result
+
+    tool.forward = traced_forward
+    tool._traced = True
+
+
+def _trace_agent(agent, name):
+    run = agent.run
+
+    def finish(span, result):
+        usage = agent.monitor.get_total_token_counts()
+        span.set(
+            steps=len(agent.memory.steps) - 1,
+            output_chars=_size(result),
+            input_tokens=getattr(usage, "input_tokens", None),
+            output_tokens=getattr(usage, "output_tokens", None),
+        )
+
+    def traced_stream(task, *args, **kwargs):
+        # The span covers the consumption of the stream, where the steps actually run
+        with tracer.span(f"agent.{name}", "agent", agent=name, stream=True) as span:
+            span.set(input_chars=_size(task))
+            event = None
+            try:
+                for event in run(task, *args, **kwargs):
+                    yield event
+            except GeneratorExit:
+                # The consumer stopped reading (usually at the final answer): not a failed run
+                finish(span, getattr(event, "output", None))
+                return
+            finish(span, getattr(event, "output", None))
+
+    @functools.wraps(run)
+    def traced_run(task, *args, **kwargs):
+        if kwargs.get("stream"):
+            return traced_stream(task, *args, **kwargs)
+        with tracer.span(f"agent.{name}", "agent", agent=name) as span:
+            span.set(input_chars=_size(task))
+            result = run(task, *args, **kwargs)
+            finish(span, result)
+            return result
+
+    agent.run = traced_run
+
+    step_stream = getattr(agent, "_step_stream", None)
+    if step_stream is None:
+        return
+
+    @functools.wraps(step_stream)
+    def traced_step_stream(memory_step):
+        with tracer.span("agent.step", "step", step=memory_step.step_number) as span:
+            yield from step_stream(memory_step)
+            span.set(
+                tools=[call.name for call in memory_step.tool_calls or []],
+                observation_chars=_size(memory_step.observations),
+                error=str(memory_step.error) if memory_step.error else None,
+                **_token_usage(memory_step),
+            )
+
+    agent._step_stream = traced_step_stream
+
+
+def install_tracing(agent, name="manager"):
+    """Trace an agent, its tools, its model and, recursively, its managed agents"""
+    if getattr(agent, "_tracing_installed", False):
+        return
+    _trace_agent(agent, name)
+    _trace_model(agent.model)
+    for tool in agent.tools.values():
+        _trace_tool(tool)
+    agent._tracing_installed = True
+    for managed_name, managed_agent in getattr(agent, "managed_agents", {}).items():
+        install_tracing(managed_agent, managed_name)
+
+
+def _stage(span):
+    agent = span["attributes"].get("agent") or "-"
+    if span["kind"] == "tool":
+        return f"tool {span['attributes'].get('tool')}"
+    if span["kind"] in ("model", "step"):
+        return f"{span['kind']} ({agent})"
+    return span["name"]
+
+
+def read_spans(path=TRACE_PATH):
+    with open(path) as file:
+        return [json.loads(line) for line in file]
+
+
+def trace_report(path=TRACE_PATH):
+    """Latency percentiles, token and payload totals per stage, from an exported trace file"""
+    stages = {}
+    for span in read_spans(path):
+        stages.setdefault(_stage(span), []).append(span)
+    report = {}
+    for stage, spans in stages.items():
+        durations = sorted(span["duration_ms"] for span in spans)
+        report[stage] = {
+            "count": len(spans),
+            "errors": sum(span["status"] == "ERROR" for span in spans),
+            "p50_ms": statistics.median(durations),
+            "p95_ms": durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+            "total_ms": sum(durations),
+            "input_tokens": sum(span["attributes"].get("input_tokens") or 0 for span in spans),
+            "output_tokens": sum(span["attributes"].get("output_tokens") or 0 for span in spans),
+            "output_chars": sum(span["attributes"].get("output_chars") or 0 for span in spans),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    report = trace_report(sys.argv[1] if len(sys.argv) > 1 else TRACE_PATH)
+    print(
+        f"{'stage':<44} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'total s':>8} {'tokens in/out':>16} {'out chars':>10}"
+    )
+    for stage, row in sorted(report.items(), key=lambda item: -item[1]["total_ms"]):
+        tokens = f"{row['input_tokens']}/{row['output_tokens']}"
+        print(
+            f"{stage:<44} {row['count']:>6} {row['errors']:>4} {row['p50_ms']:>9.1f} "
+            f"{row['p95_ms']:>9.1f} {row['total_ms'] / 1000:>8.1f} {tokens:>16} "
+            f"{row['output_chars']:>10}"
+        )
@@ -1,21 +1,39 @@
 import os
-from smolagents import CodeAgent, LiteLLMModel, tool
+import re
+from functools import lru_cache
+
+from smolagents import CodeAgent, tool
+from artifacts import current_run_dir
+from code_executor import code_executor
+from llm import get_model
 
 VISUAL_SYSTEM_PROMPT_PATH = os.path.join(
     os.path.dirname(__file__), "system_info", "visual_prompt.txt"
 )
 
-model = LiteLLMModel(model_id="anthropic/claude-sonnet-4-20250514", temperature=0.2)
 
+@lru_cache(maxsize=1)
+def load_visual_prompt():
+    """Custom system prompt for the visual agent, read on first use"""
+    with open(VISUAL_SYSTEM_PROMPT_PATH) as file:
+        return file.read()
+
+
+@tool
+def artifact_path(filename: str) -> str:
+    """Returns the path where a generated file (chart, image, report) must be saved.
+
+    Args:
+        filename: A short file name with its extension, e.g. 'heart_rate_trend.png'.
+    """
+    name = re.sub(r"[^\w.-]", "_", os.path.basename(filename)) or "chart.png"
+    return os.path.join(current_run_dir(), name)
 
-# Create a custom system prompt for the visual agent
-custom_visual_prompt = open(VISUAL_SYSTEM_PROMPT_PATH).read()
 
+def create_visual_agent():
+    from charts import CHART_TOOLS
 
-visual_agent = CodeAgent(
-    tools=[],
-    model=model,
-    additional_authorized_imports=[
+    imports = [
         "matplotlib",
         "matplotlib.pyplot",
         "seaborn",
@@ -29,11 +47,16 @@ visual_agent = CodeAgent(
         "datetime",
         "math",
         "random",
-    ],
-    name="visual_agent",
-    description="Creates beautiful, professional visualizations and saves them locally. Always uses proper code format and saves files correctly.",
-)
-
-
-# Modify the system prompt after initialization
-visual_agent.prompt_templates["system_prompt"] = custom_visual_prompt
+    ]
+    visual_agent = CodeAgent(
+        tools=[artifact_path, *CHART_TOOLS],
+        model=get_model("visual_agent"),
+        executor=code_executor(imports),
+        additional_authorized_imports=imports,
+        name="visual_agent",
+        description="Creates beautiful, professional visualizations and saves them locally. Always uses proper code format and saves files correctly.",
+    )
+
+    # Modify the system prompt after initialization
+    visual_agent.prompt_templates["system_prompt"] = load_visual_prompt()
+    return visual_agent